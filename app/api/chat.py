@@ -1,26 +1,65 @@
 # app/api/chat.py
 # /chat 엔드포인트. 에이전트 실행 → DB 로그 저장 → 벡터메모리(Qdrant)에도 동시 기록.
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+# /chat/stream 은 같은 흐름을 SSE로 흘려보내고, 벡터 저장은 스트림 종료 후 백그라운드로 처리.
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime, timedelta, timezone
-import inspect
+from datetime import datetime
+from typing import Any, Dict, Optional
+import json
 
 from app.models.schemas import ChatRequest, ChatResponse
-from app.graph.runner import run_chat_agent
-from app.models.chat_log import ChatLog
-from app.core.db import get_db
+from app.graph.runner import run_chat_agent, stream_chat_agent
+from app.models.chat_log import KST, ChatLog
+from app.core.db import get_async_db, AsyncSessionLocal
 from app.services.memory import add_chat_memory
-from app.services.emotion_service import predict_emotion
+from app.services.summary import refresh_summary
+from app.services.emotion_service import EmotionResult, apredict_emotion
 
-# KST 고정: 서버/컨테이너 TZ와 무관하게 한국시간 기준 기록용
-KST = timezone(timedelta(hours=9))
 router = APIRouter()
 
+async def _save_chat_log(db: AsyncSession, member_id: int, user_text: str, bot_text: str, created: datetime) -> ChatLog:
+    """관계형 DB에 대화 로그 저장. 실패 시 롤백 후 예외 전파."""
+    try:
+        chat_log = ChatLog(
+            member_id=member_id,
+            user_text=user_text,
+            bot_text=bot_text,
+            created_at=created,
+        )
+        db.add(chat_log)
+        await db.commit()
+        await db.refresh(chat_log)
+        return chat_log
+    except SQLAlchemyError:
+        await db.rollback()
+        raise
+
+async def _save_vector_memory(member_id: int, user_text: str, bot_text: str, chat_id: int, created: datetime) -> None:
+    """벡터 메모리 저장 요청(write-behind 큐 적재, 검색/회상용). 실패해도 서비스 흐름은 유지."""
+    try:
+        add_chat_memory(member_id, user_text, "user", chat_id, created)
+        add_chat_memory(member_id, bot_text, "bot", chat_id, created)
+    except Exception as e:
+        # 메모리 저장 경고만 출력(치명적 오류 아님)
+        print(f"[memory] save warn: {e}")
+
+async def _user_emotion_label(text: str, precomputed: Optional[EmotionResult]) -> Optional[str]:
+    """사용자 발화 감정 라벨. preload에서 계산된 값이 있으면 재사용(실패해도 서비스 흐름 유지)"""
+    if precomputed:
+        return precomputed["label"]
+    try:
+        if text and text.strip():
+            return await apredict_emotion(text)
+    except Exception as e:
+        print(f"[emotion] user predict warn: {e}")
+    return None
+
 @router.post("/", response_model=ChatResponse)
-async def chat(req: ChatRequest, db: Session = Depends(get_db)):
+async def chat(req: ChatRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     # 1) 에이전트 실행: LLM이 도구 사용을 자율 판단. force_summary는 힌트 성격.
-    output_text: str = await run_chat_agent(
+    output_text, agent_emotion = await run_chat_agent(
         user_input=req.input,
         user_id=req.member_id,
         db=db,  # state에는 넣지 않지만, 호출측 인터페이스는 유지
@@ -29,43 +68,80 @@ async def chat(req: ChatRequest, db: Session = Depends(get_db)):
         disable_preload=req.disable_preload or False,
         debug_trace=req.debug_trace or False,
     )
-    # 사용자 발화 감정 분류(실패해도 서비스 흐름 유지)
-    user_emotion = None
-    try:
-        if req.input and req.input.strip():
-            user_emotion = predict_emotion(req.input)
-    except Exception as e:
-        print(f"[emotion] user predict warn: {e}")
-
+    user_emotion = await _user_emotion_label(req.input, agent_emotion)
 
     # 2) 관계형 DB에 대화 로그 저장
     created = datetime.now(KST)
     try:
-        chat_log = ChatLog(
-            member_id=req.member_id,
-            user_text=req.input,
-            bot_text=output_text,
-            created_at=created,
-        )
-        db.add(chat_log)
-        db.commit()
-        db.refresh(chat_log)
+        chat_log = await _save_chat_log(db, req.member_id, req.input, output_text, created)
     except SQLAlchemyError as e:
-        # DB 오류 시 롤백 후 500 반환
-        db.rollback()
+        # DB 오류 시 500 반환
         raise HTTPException(status_code=500, detail=f"DB error: {e}")
 
     # 3) 벡터 메모리에 동시 저장(검색/회상용). 실패해도 서비스 흐름은 유지.
-    try:
-        if inspect.iscoroutinefunction(add_chat_memory):
-            await add_chat_memory(req.member_id, req.input, "user", chat_log.chat_id, created)
-            await add_chat_memory(req.member_id, output_text, "bot", chat_log.chat_id, created)
-        else:
-            add_chat_memory(req.member_id, req.input, "user", chat_log.chat_id, created)
-            add_chat_memory(req.member_id, output_text, "bot", chat_log.chat_id, created)
-    except Exception as e:
-        # 메모리 저장 경고만 출력(치명적 오류 아님)
-        print(f"[memory] save warn: {e}")
+    await _save_vector_memory(req.member_id, req.input, output_text, chat_log.chat_id, created)
 
-    # 4) 최종 응답
+    # 4) 누적 요약 캐시 갱신은 응답 전송 후 백그라운드로(새 턴만 접어 넣음)
+    background_tasks.add_task(refresh_summary, req.member_id)
+
+    # 5) 최종 응답
     return ChatResponse(output=output_text, user_emotion=user_emotion)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@router.post("/stream")
+async def chat_stream(req: ChatRequest, background_tasks: BackgroundTasks):
+    """
+    SSE 스트리밍 버전의 /chat.
+      event: token      → 답변 본문 토큰
+      event: tool_start → 도구 실행 시작
+      event: tool_end   → 도구 실행 종료
+      event: final      → {output, user_emotion, chat_id}
+      event: error      → {detail}
+    DB 저장은 토큰 스트림이 끝난 뒤(chat_id 확정용), 벡터 저장/요약 갱신은 응답 종료 후 백그라운드로 실행.
+    """
+    async def event_stream():
+        output_text = ""
+        agent_emotion: Optional[EmotionResult] = None
+        try:
+            async for ev in stream_chat_agent(
+                user_input=req.input,
+                user_id=req.member_id,
+                session_id=req.session_id,
+                force_summary=req.force_summary or False,
+                disable_preload=req.disable_preload or False,
+                debug_trace=req.debug_trace or False,
+            ):
+                kind = ev.pop("event")
+                if kind == "response":
+                    output_text = ev.get("text", "")
+                    agent_emotion = ev.get("user_emotion")
+                    continue
+                yield _sse(kind, ev)
+        except Exception as e:
+            yield _sse("error", {"detail": f"agent error: {e}"})
+            return
+
+        user_emotion = await _user_emotion_label(req.input, agent_emotion)
+
+        # 스트림 이후 DB 저장: 스트리밍 응답에서는 요청 스코프 세션 대신 전용 세션 사용
+        created = datetime.now(KST)
+        try:
+            async with AsyncSessionLocal() as db:
+                chat_log = await _save_chat_log(db, req.member_id, req.input, output_text, created)
+                chat_id = chat_log.chat_id
+        except SQLAlchemyError as e:
+            yield _sse("error", {"detail": f"DB error: {e}"})
+            return
+
+        background_tasks.add_task(_save_vector_memory, req.member_id, req.input, output_text, chat_id, created)
+        background_tasks.add_task(refresh_summary, req.member_id)
+        yield _sse("final", {"output": output_text, "user_emotion": user_emotion, "chat_id": chat_id})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
@@ -1,14 +1,23 @@
 import os
+import json
+import asyncio
+import logging
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import List, Optional
-from app.core.client import qdrant_client, embedding
+from typing import Dict, List, Optional, Tuple
+from app.core import metrics
+from app.core.client import ensure_payload_indexes, get_async_qdrant_client, embedding
+from app.core.config import settings
+from app.services.policy_cache import PolicyResultCache
+from app.services.policy_index import LocalPolicyIndex
 from qdrant_client.http import models as qmodels
 
 router = APIRouter()
 
 COLLECTION_NAME = os.getenv("COLLECTION_NAME2", "policy_embeddings")
 
+log = logging.getLogger("policy")
+
 # 요청/응답 모델 
 class RecommendRequest(BaseModel):
     region: str
@@ -22,27 +31,13 @@ class RecommendResponse(BaseModel):
     policy_id: int
     title: str
 
-# --- 인덱스 보장 함수 ---
+# --- 인덱스 보장 함수 (app.main lifespan에서 1회, 없는 인덱스만 비대기 생성) ---
 def ensure_policy_indexes():
-    fields_to_index = [
+    ensure_payload_indexes(COLLECTION_NAME, [
         ("region", qmodels.PayloadSchemaType.KEYWORD),
         ("childbirth_status", qmodels.PayloadSchemaType.INTEGER),
         ("marriage_status", qmodels.PayloadSchemaType.INTEGER),
-    ]
-    for name, schema in fields_to_index:
-        try:
-            qdrant_client.create_payload_index(
-                collection_name=COLLECTION_NAME,
-                field_name=name,
-                field_schema=schema,
-                wait=True,
-            )
-        except Exception:
-            # 이미 있으면 무시
-            pass
-
-# API 초기화 시 인덱스 보장
-ensure_policy_indexes()
+    ])
 
 # 쿼리 텍스트 생성 
 def build_query_text(req: RecommendRequest) -> str:
@@ -61,14 +56,38 @@ def build_query_text(req: RecommendRequest) -> str:
         conds.append(f"중위소득={req.income}%")
     return " ".join(conds)
 
-# 정책 추천 API 
-@router.post("/recommend", response_model=List[RecommendResponse])
-def recommend(req: RecommendRequest):
-    # 1. 사용자 입력 임베딩
-    query_text = build_query_text(req)
-    query_vector = embedding.embed_query(query_text)
+# 로컬 인덱스용 조건(build_policy_filter와 같은 의미)
+def policy_conditions(req: RecommendRequest) -> List[Tuple[str, object]]:
+    conds: List[Tuple[str, object]] = []
+    if req.region:
+        conds.append(("region", req.region))
+    if req.childbirth_status:
+        conds.append(("childbirth_status", req.childbirth_status))
+    if req.marriage_status:
+        conds.append(("marriage_status", req.marriage_status))
+    return conds
 
-    # 2. 필터 조건
+# 요청 정규화: 같은 조건이면 같은 키/같은 쿼리 텍스트(상태 정렬·중복 제거, 소득 구간화)
+def canonical_request(req: RecommendRequest) -> RecommendRequest:
+    income = req.income
+    bucket = settings.policy_income_bucket
+    if income is not None and bucket > 1:
+        income = (income // bucket) * bucket
+    return RecommendRequest(
+        region=(req.region or "").strip(),
+        current_status=sorted({s.strip() for s in req.current_status if s and s.strip()}),
+        childbirth_status=req.childbirth_status or 0,
+        marriage_status=req.marriage_status or 0,
+        children_count=req.children_count,
+        income=income,
+    )
+
+def request_cache_key(req: RecommendRequest) -> str:
+    # canonical_request 결과에만 사용
+    return req.model_dump_json()
+
+# 페이로드 필터
+def build_policy_filter(req: RecommendRequest) -> Optional[qmodels.Filter]:
     filters = []
     if req.region:
         filters.append(qmodels.FieldCondition(
@@ -82,19 +101,165 @@ def recommend(req: RecommendRequest):
         filters.append(qmodels.FieldCondition(
             key="marriage_status", match=qmodels.MatchValue(value=req.marriage_status)
         ))
+    return qmodels.Filter(must=filters) if filters else None
 
-    query_filter = qmodels.Filter(must=filters) if filters else None
+# 컬렉션 버전: 정책 적재/삭제 시 points_count가 바뀌면 결과 캐시 무효화
+async def _collection_version():
+    info = await get_async_qdrant_client().get_collection(COLLECTION_NAME)
+    return info.points_count
 
-    # 3. Qdrant 검색
-    results = qdrant_client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=5,
-        query_filter=query_filter,
-    )
+result_cache = PolicyResultCache(
+    ttl_s=settings.policy_cache_ttl_s,
+    max_entries=settings.policy_cache_size,
+    version_check_s=settings.policy_cache_version_check_s,
+    version_fn=_collection_version,
+)
+
+# 로컬 정책 인덱스(선택): 스냅샷이 신선하면 프로세스 내 검색, 아니면 Qdrant 원격 검색으로 폴백
+policy_index = LocalPolicyIndex(
+    COLLECTION_NAME,
+    path=settings.policy_index_path,
+    max_age_s=settings.policy_index_max_age_s,
+    refresh_s=settings.policy_index_refresh_s,
+) if settings.policy_index_enabled else None
+
+def _use_local_index() -> bool:
+    if policy_index is None:
+        return False
+    if policy_index.usable:
+        policy_index.local_hits += 1
+        return True
+    policy_index.fallbacks += 1
+    return False
+
+async def _search_policies(req: RecommendRequest) -> List[RecommendResponse]:
+    # 1. 사용자 입력 임베딩(자주 쓰는 프로필은 기동 시 미리 계산 → 임베딩 캐시 히트)
+    query_text = build_query_text(req)
+    query_vector = await embedding.aembed_query(query_text)
+
+    if _use_local_index():
+        return [
+            RecommendResponse(policy_id=pid, title=title)
+            for pid, title in policy_index.search(query_vector, policy_conditions(req), 5)
+        ]
+
+    # 2. 필터 조건
+    query_filter = build_policy_filter(req)
+
+    # 3. Qdrant 검색(비동기 클라이언트: 워커 스레드 점유 없음)
+    with metrics.QDRANT_SECONDS.labels("policy_search").time():
+        results = await get_async_qdrant_client().query_points(
+            collection_name=COLLECTION_NAME,
+            query=query_vector,
+            limit=5,
+            query_filter=query_filter,
+            with_payload=True,
+        )
 
     # 4. 응답 변환
+    return _to_responses(results.points)
+
+def _to_responses(points) -> List[RecommendResponse]:
     return [
         RecommendResponse(policy_id=r.payload["policy_id"], title=r.payload["title"])
-        for r in results
+        for r in points
     ]
+
+def _filter_key(req: RecommendRequest) -> Tuple[str, int, int]:
+    # build_policy_filter가 보는 필드만
+    return (req.region, req.childbirth_status or 0, req.marriage_status or 0)
+
+async def _search_policies_batch(todo: Dict[str, RecommendRequest]) -> Dict[str, List[RecommendResponse]]:
+    """
+    정규화 키 → 요청 묶음을 일괄 검색.
+    - 쿼리 텍스트 임베딩은 embed_documents 1회(캐시 미스만 API 호출)
+    - 필터가 같은 요청끼리 이어 붙여 query_batch_points 청크로 전송(청크당 필터 1회 구성)
+    """
+    keys = list(todo)
+    vectors = await embedding.aembed_documents([build_query_text(todo[k]) for k in keys])
+
+    if _use_local_index():
+        found = policy_index.search_many(vectors, [policy_conditions(todo[k]) for k in keys], 5)
+        return {
+            k: [RecommendResponse(policy_id=pid, title=title) for pid, title in hits]
+            for k, hits in zip(keys, found)
+        }
+
+    groups: Dict[Tuple[str, int, int], List[int]] = {}
+    for i, k in enumerate(keys):
+        groups.setdefault(_filter_key(todo[k]), []).append(i)
+    filters = {fk: build_policy_filter(todo[keys[idxs[0]]]) for fk, idxs in groups.items()}
+    order = [(i, fk) for fk, idxs in groups.items() for i in idxs]
+
+    size = max(1, settings.policy_batch_chunk_size)
+    chunks = [order[n:n + size] for n in range(0, len(order), size)]
+    sem = asyncio.Semaphore(max(1, settings.policy_batch_concurrency))
+    client = get_async_qdrant_client()
+    out: Dict[str, List[RecommendResponse]] = {}
+
+    async def run(chunk):
+        async with sem:
+            with metrics.QDRANT_SECONDS.labels("policy_batch").time():
+                resp = await client.query_batch_points(
+                    collection_name=COLLECTION_NAME,
+                    requests=[
+                        qmodels.QueryRequest(query=vectors[i], filter=filters[fk], limit=5, with_payload=True)
+                        for i, fk in chunk
+                    ],
+                )
+        for (i, _), r in zip(chunk, resp):
+            out[keys[i]] = _to_responses(r.points)
+
+    await asyncio.gather(*[run(c) for c in chunks])
+    return out
+
+# --- 자주 쓰는 프로필 임베딩 선계산 (app.main lifespan, 파일이 설정된 경우만) ---
+def load_warm_profiles(path: str) -> List[RecommendRequest]:
+    """JSON 배열 또는 JSONL(줄마다 RecommendRequest)"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read().strip()
+    items = json.loads(raw) if raw.startswith("[") else [json.loads(l) for l in raw.splitlines() if l.strip()]
+    return [RecommendRequest(**it) for it in items]
+
+async def warm_policy_embeddings() -> int:
+    path = settings.policy_warm_profiles_path
+    if not path:
+        return 0
+    texts = sorted({build_query_text(canonical_request(r)) for r in load_warm_profiles(path)})
+    if texts:
+        await embedding.aembed_documents(texts)   # 1회 배치 호출 → LRU/디스크 캐시 적재
+    log.info("[policy] warmed %d profile embeddings", len(texts))
+    return len(texts)
+
+# 정책 추천 API 
+@router.post("/recommend", response_model=List[RecommendResponse])
+async def recommend(req: RecommendRequest):
+    # 정규화된 요청 단위로 결과 캐시(동일 프로필 동시 요청은 검색 1회)
+    creq = canonical_request(req)
+    return await result_cache.get_or_load(request_cache_key(creq), lambda: _search_policies(creq))
+
+# 정책 추천 일괄 API(야간 알림 배치 등): 결과는 입력 순서대로
+@router.post("/recommend/batch", response_model=List[List[RecommendResponse]])
+async def recommend_batch(reqs: List[RecommendRequest]):
+    keys = []
+    results: Dict[str, List[RecommendResponse]] = {}
+    todo: Dict[str, RecommendRequest] = {}
+    for req in reqs:
+        creq = canonical_request(req)
+        key = request_cache_key(creq)
+        keys.append(key)
+        if key in results or key in todo:
+            continue  # 같은 프로필은 1회만
+        found, value = await result_cache.lookup(key)
+        if found:
+            results[key] = value
+        else:
+            todo[key] = creq
+
+    if todo:
+        fetched = await _search_policies_batch(todo)
+        for key, value in fetched.items():
+            result_cache.store(key, value)
+        results.update(fetched)
+
+    return [results[k] for k in keys]
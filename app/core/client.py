@@ -2,13 +2,16 @@
 # OpenAI LLM/임베딩, Qdrant 클라이언트 및 벡터스토어 초기화.
 import os
 import logging
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from qdrant_client import QdrantClient
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models as qmodels
 from langchain_community.vectorstores import Qdrant as QdrantVectorStore
-from app.core.config import settings
+from app.core.config import client_factory, settings
+from app.core.embedding_cache import CachedEmbeddings
 
 log = logging.getLogger("infra.qdrant")
 
@@ -25,78 +28,140 @@ if settings.langsmith_tracing:
     if settings.langsmith_project:
         os.environ["LANGCHAIN_PROJECT"] = settings.langsmith_project
 
+def _factory(name: str):
+    """settings.client_factory 대역의 생성 메서드(없으면 None → 원격 클라이언트)."""
+    return getattr(client_factory(), name, None)
+
+def _chat_model(run_name: str, **kwargs):
+    make = _factory("chat_model")
+    model = make(run_name) if make is not None else ChatOpenAI(**kwargs)
+    return model.with_config({"run_name": run_name})
+
 # 기본 LLM (요약 등에 사용) — 스트리밍 ON
-llm = ChatOpenAI(
+llm = _chat_model(
+    "BaseLLM",
     model="gpt-4.1-mini",
     temperature=0.6,
     timeout=30,
     streaming=True,                 # ← 스트리밍 활성화
-).with_config({"run_name": "BaseLLM"})
+    stream_usage=True,              # 스트리밍에서도 토큰 사용량 수신(지표)
+)
 
 # 에이전트용 LLM — 스트리밍 ON
 def agent_llm():
-    return ChatOpenAI(
+    return _chat_model(
+        "AgentLLM",
         model="gpt-4.1-mini",
         temperature=0.4,
         timeout=30,
         streaming=True,             # ← 스트리밍 활성화
-    ).with_config({"run_name": "AgentLLM"})
+        stream_usage=True,          # 스트리밍에서도 토큰 사용량 수신(지표)
+    )
 
 # --- Embedding / Qdrant ---
-embedding = OpenAIEmbeddings(model="text-embedding-3-small")
+# 모든 임베딩 호출(벡터스토어 포함)은 캐시를 거친다: LRU + (선택) 로컬 SQLite
+EMBEDDING_MODEL = "text-embedding-3-small"
 VECTOR_SIZE = 1536
+_make_embeddings = _factory("embeddings")
+embedding = CachedEmbeddings(
+    _make_embeddings(VECTOR_SIZE) if _make_embeddings is not None else OpenAIEmbeddings(model=EMBEDDING_MODEL),
+    model_name=EMBEDDING_MODEL,
+    max_entries=settings.embedding_cache_size,
+    sqlite_path=settings.embedding_cache_path,
+)
+
+# Qdrant 클라이언트/벡터스토어는 지연 생성(임포트 시 네트워크 I/O 없음). 컬렉션/인덱스 보장은 app.main lifespan에서.
+@lru_cache(maxsize=None)
+def get_qdrant_client() -> QdrantClient:
+    make = _factory("qdrant_client")
+    if make is not None:
+        return make()
+    return QdrantClient(url=settings.qdrant_url, api_key=settings.qdrant_api_key)
 
-qdrant_client = QdrantClient(url=settings.qdrant_url, api_key=settings.qdrant_api_key)
+# 요청 경로용 비동기 클라이언트: gRPC(선택) 또는 HTTP/2 + 상한 있는 커넥션 풀.
+# 벡터 I/O가 워커 스레드를 점유하지 않고 LLM 호출과 동시에 진행된다.
+@lru_cache(maxsize=None)
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    make = _factory("async_qdrant_client")
+    if make is not None:
+        return make()
+    return AsyncQdrantClient(
+        url=settings.qdrant_url,
+        api_key=settings.qdrant_api_key,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        grpc_port=settings.qdrant_grpc_port,
+        timeout=settings.qdrant_timeout,
+        http2=settings.qdrant_http2,
+        limits=httpx.Limits(
+            max_connections=settings.qdrant_pool_max_connections,
+            max_keepalive_connections=settings.qdrant_pool_max_keepalive,
+        ),
+    )
 
-def _payload_schema(name: str) -> Optional[qmodels.PayloadSchemaType]:
-    try:
-        info = qdrant_client.get_collection(settings.collection_name)
-        schema: Dict[str, qmodels.PayloadSchemaInfo] = getattr(info, "payload_schema", {}) or {}
-        if name in schema and getattr(schema[name], "data_type", None):
-            return schema[name].data_type
-    except Exception as e:
-        log.debug(f"[Qdrant] read schema warn: {e}")
-    return None
+@lru_cache(maxsize=None)
+def get_vectorstore() -> QdrantVectorStore:
+    return QdrantVectorStore(
+        client=get_qdrant_client(),
+        collection_name=settings.collection_name,
+        embeddings=embedding,
+    )
+
+async def aclose_qdrant_clients() -> None:
+    """생성된 Qdrant 클라이언트만 닫는다(앱 shutdown)."""
+    if get_async_qdrant_client.cache_info().currsize:
+        await get_async_qdrant_client().close()
+    if get_qdrant_client.cache_info().currsize:
+        get_qdrant_client().close()
+
+def ensure_payload_indexes(
+    collection: str,
+    fields: List[Tuple[str, qmodels.PayloadSchemaType]],
+) -> List[str]:
+    """
+    없는 payload 인덱스만 생성(wait=False → 서버가 백그라운드 인덱싱). 반환: 생성 요청한 필드.
+    - 이미 있는 인덱스는 타입이 달라도 지우지 않는다(운영 중 인덱스 공백 방지) → 경고만.
+    """
+    client = get_qdrant_client()
+    info = client.get_collection(collection)
+    schema: Dict[str, qmodels.PayloadSchemaInfo] = getattr(info, "payload_schema", {}) or {}
+    created: List[str] = []
+    for name, want in fields:
+        cur = getattr(schema.get(name), "data_type", None)
+        if cur is None:
+            try:
+                client.create_payload_index(
+                    collection_name=collection,
+                    field_name=name,
+                    field_schema=want,
+                    wait=False,
+                )
+                created.append(name)
+            except Exception as e:
+                # 다른 레플리카가 먼저 만든 경우 등 → 무시
+                log.warning(f"[Qdrant] index create warn for {collection}.{name}: {e}")
+        elif cur != want:
+            log.warning(f"[Qdrant] index {collection}.{name} is {cur}, expected {want} (left as is)")
+    if created:
+        log.info(f"[Qdrant] index requested (non-blocking): {collection} {created}")
+    return created
 
-def _ensure_collection_and_indexes():
+def ensure_collection_and_indexes() -> None:
+    """대화 메모리 컬렉션/인덱스 보장(멱등). 앱 시작 시 1회."""
     col = settings.collection_name
-    try:
-        cols = qdrant_client.get_collections().collections
-        if not any(c.name == col for c in cols):
-            qdrant_client.create_collection(
+    client = get_qdrant_client()
+    if not client.collection_exists(col):
+        try:
+            client.create_collection(
                 collection_name=col,
                 vectors_config=qmodels.VectorParams(size=VECTOR_SIZE, distance=qmodels.Distance.COSINE),
             )
             log.info(f"[Qdrant] created collection: {col}")
-    except Exception as e:
-        log.warning(f"[Qdrant] ensure collection warn: {e}")
+        except Exception as e:
+            log.warning(f"[Qdrant] ensure collection warn: {e}")
 
-    for name, schema in [
+    ensure_payload_indexes(col, [
         ("member_id", qmodels.PayloadSchemaType.KEYWORD),
+        ("metadata.member_id", qmodels.PayloadSchemaType.KEYWORD),   # write-behind 이전에 저장된 점(회원 필터가 둘 다 봄)
         ("role", qmodels.PayloadSchemaType.KEYWORD),
         ("created_at", qmodels.PayloadSchemaType.KEYWORD),
-    ]:
-        try:
-            cur = _payload_schema(name)
-            if cur != schema:
-                try:
-                    qdrant_client.delete_payload_index(collection_name=col, field_name=name)
-                except Exception:
-                    pass
-                qdrant_client.create_payload_index(
-                    collection_name=col,
-                    field_name=name,
-                    field_schema=schema,
-                    wait=True,       # ← 인덱싱 완료까지 대기
-                )
-                log.info(f"[Qdrant] ensured index: {name} -> {schema}")
-        except Exception as e:
-            log.warning(f"[Qdrant] index ensure warn for {name}: {e}")
-
-_ensure_collection_and_indexes()
-
-vectorstore = QdrantVectorStore(
-    client=qdrant_client,
-    collection_name=settings.collection_name,
-    embeddings=embedding,
-)
+    ])
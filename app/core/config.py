@@ -1,5 +1,9 @@
 # app/core/config.py
 # 환경변수 기반 설정. DB URL 조합 포함.
+import importlib
+from functools import lru_cache
+from typing import Any, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,6 +15,16 @@ class Settings(BaseSettings):
     qdrant_api_key: str
     collection_name: str = "jamjam_history"
     collection_name2 :str = "policy_embeddings"
+    qdrant_prefer_grpc: bool = False              # 비동기 클라이언트 gRPC 우선(서버 gRPC 포트 개방 시)
+    qdrant_grpc_port: int = 6334
+    qdrant_http2: bool = True                     # REST 경로 HTTP/2(멀티플렉싱)
+    qdrant_timeout: int = 10                      # 요청 타임아웃(s)
+    qdrant_pool_max_connections: int = 32         # 비동기 REST 커넥션 풀 상한
+    qdrant_pool_max_keepalive: int = 16           # 유지할 keep-alive 커넥션 수
+
+    # 임베딩 캐시
+    embedding_cache_size: int = 10000             # 프로세스 내 LRU 최대 항목 수(0=끔)
+    embedding_cache_path: str | None = None       # 예: data/embedding_cache.sqlite (비우면 디스크 캐시 끔)
 
     # LangSmith
     langsmith_tracing: bool = False
@@ -24,22 +38,136 @@ class Settings(BaseSettings):
     mysql_user: str
     mysql_password: str
     mysql_db: str
+    # DB URL 직접 지정(선택): 로컬/벤치에서 MySQL 대신 SQLite 등. 지정하면 mysql_* 조합보다 우선
+    database_url_override: str | None = None          # 예: sqlite:///data/bench.sqlite
+    async_database_url_override: str | None = None    # 예: sqlite+aiosqlite:///data/bench.sqlite
+
+    # 외부 서비스 대역(벤치/테스트용) "모듈:객체". 객체에 있는 메서드의 클라이언트만 교체(없으면 원격/로컬 모델):
+    #   chat_model(run_name) / embeddings(dim) / qdrant_client() / async_qdrant_client() / emotion_model() → (토크나이저, 백엔드)
+    client_factory: str = ""
+
+    # DB 커넥션 풀(동기/비동기 엔진 공통)
+    db_pool_size: int = 10                        # 상시 유지 커넥션 수
+    db_max_overflow: int = 20                     # 피크 시 추가 허용 커넥션 수
+    db_pool_timeout: float = 10.0                 # 풀에서 커넥션을 기다리는 최대 시간(s)
+    db_pool_recycle: int = 1800                   # 장시간 유휴 연결 재활용(s)
+    db_connect_timeout: int = 10                  # MySQL 접속 타임아웃(s)
 
     # Logging 옵션 (.env로 제어 가능)
     sqlalchemy_echo: bool = False                 # SQL 원문 로깅(운영 기본 꺼짐)
     sqlalchemy_log_level: str = "WARNING"         # sqlalchemy.engine 로거 레벨
     react_log_level: str = "INFO"                 # ReAct 로거 레벨(app.main에서 적용)
-    
+    trace_sample_rate: float = 0.0                # debug_trace 없이도 트레이스할 요청 비율(0~1)
+    trace_jsonl_path: str | None = None           # 요청별 트레이스(JSON 1줄) 기록 파일. None이면 끔
+    trace_prompt_chars: int = 2000                # JSONL 트레이스에 남길 프롬프트 메시지당 최대 글자 수
+    trace_queue_size: int = 10000                 # 트레이스 로그 큐 상한(가득 차면 버리고 카운트)
+
+    # 감정 분류 모델
+    emotion_model_path: str = "/app/best_model"
+    emotion_backend: str = "torch"                # torch | onnx (emotion_export로 변환 후 사용)
+    emotion_onnx_quantized: bool = False          # onnx 백엔드에서 int8 동적 양자화 모델 사용
+    emotion_warmup: bool = False                  # 기동 시 모델 로드+1회 추론(첫 요청 지연 제거)
+
+    # 감정 분류 마이크로배칭
+    emotion_batch_max_size: int = 16              # 한 번에 묶어 추론할 최대 문장 수
+    emotion_batch_max_wait_ms: float = 5.0        # 첫 요청 이후 배치를 모으는 최대 대기(ms)
+
+    # 벡터 메모리 write-behind
+    memory_write_batch_size: int = 32             # 임베딩/upsert 1회에 묶을 최대 레코드 수
+    memory_write_flush_ms: float = 200.0          # 첫 레코드 이후 배치를 모으는 최대 대기(ms)
+    memory_write_max_retries: int = 3             # 배치 실패 시 재시도 횟수(이후 폐기+경고)
+
+    # 메모리 하이브리드 검색(벡터 + BM25, RRF 결합)
+    memory_hybrid: bool = True
+    memory_hybrid_candidates: int = 20            # 각 검색기에서 가져올 후보 수(RRF 입력)
+    memory_rrf_k: int = 60                        # RRF 상수(클수록 순위 차이 영향 완화)
+    memory_lexical_max_members: int = 500         # BM25 색인을 메모리에 유지할 최대 회원 수(LRU)
+    memory_lexical_max_docs: int = 4000           # 회원당 색인 문서 수 상한(대화 1행 = 2문서, 최신 우선)
+
+    # 세션 히스토리(RunnableWithMessageHistory) 저장소
+    history_backend: str = "memory"               # memory | redis(워커 간 공유)
+    history_max_sessions: int = 1000              # memory: 유지할 최대 세션 수(LRU, 0=무제한)
+    history_idle_ttl_s: float = 1800.0            # 마지막 접근 후 이 시간(s) 지나면 제거(0=끔)
+    history_max_messages: int = 40                # 세션당 최근 메시지 수 상한(0=무제한)
+    history_redis_url: str | None = None          # 예: redis://localhost:6379/0
+    history_stats_interval_s: float = 300.0       # redis: 세션 수 SCAN 주기(/metrics 스크랩마다 하지 않음, 0=끔)
+
+    # 회원 프로필/프롬프트 캐시
+    member_profile_ttl_s: float = 600.0           # 성별(호칭) 캐시 유효 시간(s, 0=캐시 끔). 성별 변경은 최대 이만큼 늦게 반영
+    member_profile_cache_size: int = 10000        # 캐시할 최대 회원 수(LRU)
+    prompt_reload_interval_s: float = 5.0         # 프롬프트 파일 변경 확인 간격(s, 0=최초 1회만 읽음)
+
+    # 정책 추천 결과 캐시
+    policy_cache_ttl_s: float = 600.0             # 결과 유효 시간(s, 0=캐시 끔)
+    policy_cache_size: int = 5000                 # 캐시할 최대 프로필 수(LRU)
+    policy_cache_version_check_s: float = 30.0    # 컬렉션 points_count 확인 간격(바뀌면 전체 무효화)
+    policy_income_bucket: int = 1                 # 중위소득(%) 구간 폭(1=구간화 안 함). >1이면 키/쿼리 모두 구간 하한 사용 → 결과가 바뀌므로 배포별 선택
+    policy_warm_profiles_path: str | None = None  # 기동 시 임베딩을 미리 계산할 프로필(JSON/JSONL)
+    policy_batch_chunk_size: int = 256            # /recommend/batch: query_batch_points 1회당 질의 수
+    policy_batch_concurrency: int = 4             # /recommend/batch: 동시에 보낼 배치 호출 수
+
+    # 정책 로컬 인덱스(선택): 컬렉션 스냅샷을 memory-map 해 프로세스 안에서 검색
+    policy_index_enabled: bool = False
+    policy_index_path: str = "data/policy_index"  # 스냅샷 디렉터리(vectors.npy + meta.json)
+    policy_index_refresh_s: float = 300.0         # Qdrant에서 재구축하는 주기(s)
+    policy_index_max_age_s: float = 900.0         # 스냅샷이 이보다 오래되면 원격 검색으로 폴백(s)
+
+    # 프롬프트 토큰 예산(call_agent). 섹션별 상한 → 남은 예산은 히스토리(최신 턴 우선)
+    prompt_tokenizer: str = "o200k_base"          # tiktoken 인코딩(gpt-4.1 계열)
+    prompt_token_budget: int = 6000               # 에이전트 입력 프롬프트 전체 상한
+    prompt_role_tokens: int = 1500                # 역할/호칭/도구 목록
+    prompt_summary_tokens: int = 300              # 선주입 요약
+    prompt_recall_tokens: int = 450               # 선주입 회상
+    prompt_tool_tokens: int = 800                 # 도구 결과 요약(tool_context)
+    prompt_tool_output_tokens: int = 600          # 도구 1회 반환 본문
+    prompt_history_summary_tokens: int = 300      # 잘린 옛 턴의 압축 요약 자리
+
+    # 적응형 선주입(preload_context): 발화 휴리스틱으로 구성요소 선택, 느린 것은 에이전트와 동시 실행
+    preload_adaptive: bool = True                 # False면 요약/회상/감정을 항상 전부 기다린 뒤 에이전트 호출
+    preload_trivial_chars: int = 6                # 이 길이 이하(회상 힌트 없음)는 인사/맞장구로 보고 요약 생략(세션 첫 턴 제외)
+    preload_recall_min_chars: int = 12            # 회상 힌트가 없을 때 회상을 추측 실행할 최소 길이
+    preload_grace_ms: float = 30.0                # 추측 실행분을 프롬프트에 넣기 위해 기다리는 최대 시간
+    preload_emotion_wait_s: float = 2.0           # finalize에서 미완료 감정 결과를 기다리는 최대 시간
+    preload_recall_wait_s: float = 5.0            # rag_search_tool이 미완료 추측 회상을 기다리는 최대 시간(넘으면 직접 검색)
+    preload_pending_ttl_s: float = 60.0           # finalize에 도달하지 못한 턴의 미완료 작업 정리 기준
+
+    # LangGraph 체크포인터(세션 상태 영속화)
+    checkpoint_backend: str = "sqlite"            # sqlite | none
+    checkpoint_sqlite_path: str = "data/checkpoints.sqlite"
+    checkpoint_max_turns: int = 6                 # 스레드에 원문으로 남길 최근 턴 수(0=자르지 않음)
+    checkpoint_summary_max_chars: int = 1200      # 잘린 턴을 압축한 요약의 최대 길이
+    checkpoint_ttl_hours: float = 72.0            # 마지막 체크포인트 이후 이 시간 지난 스레드 삭제(0=끔)
+    checkpoint_cleanup_interval_min: float = 60.0 # TTL 정리 주기(분)
+
     @property
     def database_url(self) -> str:
+        if self.database_url_override:
+            return self.database_url_override
         return (
             f"mysql+pymysql://{self.mysql_user}:{self.mysql_password}"
             f"@{self.mysql_host}:{self.mysql_port}/{self.mysql_db}?charset=utf8mb4"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        if self.async_database_url_override:
+            return self.async_database_url_override
+        return (
+            f"mysql+aiomysql://{self.mysql_user}:{self.mysql_password}"
+            f"@{self.mysql_host}:{self.mysql_port}/{self.mysql_db}?charset=utf8mb4"
+        )
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         case_sensitive = False
 
 settings = Settings()
+
+@lru_cache(maxsize=1)
+def client_factory() -> Optional[Any]:
+    """settings.client_factory가 가리키는 대역 객체(없으면 None). 클라이언트 생성 지점(app.core.client, 감정 모델)이 참조."""
+    if not settings.client_factory:
+        return None
+    module, _, attr = settings.client_factory.partition(":")
+    return getattr(importlib.import_module(module), attr)
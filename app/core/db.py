@@ -1,22 +1,57 @@
 # app/core/db.py
 # SQLAlchemy 엔진/세션팩토리. 여기서 로그 소음 억제(echo=False).
+# - 동기(pymysql): 테이블 생성 등 부트스트랩용
+# - 비동기(aiomysql): 요청 경로(chat/summary/memory/graph) 전부 → 느린 쿼리가 이벤트 루프를 막지 않음
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+_pool_kwargs = dict(
+    pool_pre_ping=True,                         # 죽은 커넥션 자동 감지
+    pool_recycle=settings.db_pool_recycle,      # 장시간 유휴 연결 재활용
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+)
+
+def _connect_args(url: str) -> dict:
+    # SQLite(database_url_override)는 connect_timeout 대신 잠금 대기 timeout
+    if url.startswith("sqlite"):
+        return {"timeout": settings.db_connect_timeout}
+    return {"connect_timeout": settings.db_connect_timeout}
 
 # echo=False로 SQL 로그 억제(필요 시 .env의 sqlalchemy_echo=true로만 활성)
 engine = create_engine(
     settings.database_url,
     echo=settings.sqlalchemy_echo,
-    pool_pre_ping=True,         # 죽은 커넥션 자동 감지
-    pool_recycle=1800,          # 장시간 유휴 연결 재활용
-    future=True
+    connect_args=_connect_args(settings.database_url),
+    future=True,
+    **_pool_kwargs,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    settings.async_database_url,
+    echo=settings.sqlalchemy_echo,
+    connect_args=_connect_args(settings.async_database_url),
+    **_pool_kwargs,
+)
+# 쿼리 지연 지표(Prometheus): 문장 종류별
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+# expire_on_commit=False: commit 후 속성 접근 시 추가 I/O(암묵적 refresh) 방지
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,213 @@
+# app/core/embedding_cache.py
+# 임베딩 캐시: (모델명 + 정규화 텍스트 해시) → 벡터.
+#   1차: 프로세스 내 LRU(상한 max_entries)   2차(선택): 로컬 SQLite(재시작 후에도 유지)
+# langchain Embeddings 인터페이스를 그대로 구현하므로 벡터스토어/직접 호출 모두 이 객체를 거친다.
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core import metrics
+
+log = logging.getLogger("infra.embedding")
+
+_SQLITE_IN_CHUNK = 500   # IN 절 1회당 키 수(SQLite 변수 개수 상한 여유)
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", text or "").strip()
+
+@contextmanager
+def _observe(op: str, n: int):
+    """원격 임베딩 호출 1회(미스 n개) 지연/건수."""
+    metrics.EMBEDDING_TEXTS.labels(op).inc(n)
+    with metrics.EMBEDDING_SECONDS.labels(op).time():
+        yield
+
+class CachedEmbeddings(Embeddings):
+    def __init__(
+        self,
+        inner: Embeddings,
+        model_name: str,
+        max_entries: int = 10000,
+        sqlite_path: Optional[str] = None,
+    ):
+        self.inner = inner
+        self.model_name = model_name
+        self.max_entries = max(0, int(max_entries))
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()       # LRU/카운터(메모리 연산만)
+        self._db_lock = threading.Lock()    # SQLite 연결(조회/기록)
+        self._hits = 0          # LRU 적중
+        self._disk_hits = 0     # SQLite 적중
+        self._misses = 0        # 원격 임베딩 호출 대상
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._open_db(sqlite_path)
+
+    # --- 저장소 ---
+    def _open_db(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS embedding_cache (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+            db.commit()
+            self._db = db
+        except Exception as e:
+            log.warning("[embedding] disk cache disabled: %s", e)
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(_normalize(text).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    # LRU 조회/기록은 메모리 연산만(이벤트 루프에서 바로). SQLite 조회/기록은 _db_lock으로 따로 직렬화하고
+    # 비동기 경로에서는 asyncio.to_thread로 보낸다(SELECT/commit(fsync)이 루프를 막지 않도록).
+    def _lru_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self._hits += 1
+        if vec is not None:
+            metrics.CACHE_REQUESTS.labels("embedding", "hit").inc()
+        return vec
+
+    def _put_lru(self, key: str, vec: List[float]):
+        if self.max_entries <= 0:
+            return
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """SQLite에서 한 번에 조회(IN 절, 청크 단위). 찾은 항목은 LRU에도 올린다."""
+        found: Dict[str, List[float]] = {}
+        if self._db is None or not keys:
+            return found
+        with self._db_lock:
+            for i in range(0, len(keys), _SQLITE_IN_CHUNK):
+                chunk = keys[i:i + _SQLITE_IN_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embedding_cache WHERE key IN ({','.join('?' * len(chunk))})", chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        with self._lock:
+            for key, vec in found.items():
+                self._put_lru(key, vec)
+            self._disk_hits += len(found)
+        if found:
+            metrics.CACHE_REQUESTS.labels("embedding", "disk_hit").inc(len(found))
+        return found
+
+    def _put_lru_many(self, items: Dict[str, List[float]]):
+        with self._lock:
+            for key, vec in items.items():
+                self._put_lru(key, vec)
+
+    def _put_disk_many(self, items: Dict[str, List[float]]):
+        if self._db is None or not items:
+            return
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (key, vec) VALUES (?, ?)",
+                    [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in items.items()],
+                )
+                self._db.commit()
+            except Exception as e:
+                log.warning("[embedding] disk cache write warn: %s", e)
+
+    def _lru_lookup(self, texts: List[str]):
+        """(키 목록, 결과 슬롯, LRU 미스 키→대표 텍스트). 같은 배치 내 중복 미스는 1회만 요청."""
+        keys = [self._key(t) for t in texts]
+        out: List[Optional[List[float]]] = [self._lru_get(k) for k in keys]
+        missing: "OrderedDict[str, str]" = OrderedDict()
+        for k, t, v in zip(keys, texts, out):
+            if v is None and k not in missing:
+                missing[k] = t
+        return keys, out, missing
+
+    def _apply_disk(self, out, keys, missing, found: Dict[str, List[float]]):
+        """디스크 적중을 결과 슬롯에 채우고 남은 미스(원격 호출 대상)만 남긴다."""
+        for k in found:
+            missing.pop(k, None)
+        out = [v if v is not None else found.get(k) for k, v in zip(keys, out)]
+        with self._lock:
+            self._misses += len(missing)
+        if missing:
+            metrics.CACHE_REQUESTS.labels("embedding", "miss").inc(len(missing))
+        return out
+
+    def _lookup(self, texts: List[str]):
+        keys, out, missing = self._lru_lookup(texts)
+        found = self._disk_get_many(list(missing)) if missing else {}
+        return keys, self._apply_disk(out, keys, missing, found), missing
+
+    async def _alookup(self, texts: List[str]):
+        keys, out, missing = self._lru_lookup(texts)
+        found = await asyncio.to_thread(self._disk_get_many, list(missing)) if missing and self._db is not None else {}
+        return keys, self._apply_disk(out, keys, missing, found), missing
+
+    # --- Embeddings 인터페이스 ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, out, missing = self._lookup(texts)
+        if missing:
+            with _observe("documents", len(missing)):
+                fresh = dict(zip(missing.keys(), self.inner.embed_documents(list(missing.values()))))
+            self._put_lru_many(fresh)
+            self._put_disk_many(fresh)
+            out = [v if v is not None else fresh[k] for k, v in zip(keys, out)]
+        return out  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, out, missing = self._lookup([text])
+        if out[0] is not None:
+            return out[0]
+        with _observe("query", 1):
+            vec = self.inner.embed_query(text)
+        self._put_lru_many({keys[0]: vec})
+        self._put_disk_many({keys[0]: vec})
+        return vec
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, out, missing = await self._alookup(texts)
+        if missing:
+            with _observe("documents", len(missing)):
+                fresh = dict(zip(missing.keys(), await self.inner.aembed_documents(list(missing.values()))))
+            self._put_lru_many(fresh)
+            if self._db is not None:
+                await asyncio.to_thread(self._put_disk_many, fresh)
+            out = [v if v is not None else fresh[k] for k, v in zip(keys, out)]
+        return out  # type: ignore[return-value]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, out, missing = await self._alookup([text])
+        if out[0] is not None:
+            return out[0]
+        with _observe("query", 1):
+            vec = await self.inner.aembed_query(text)
+        self._put_lru_many({keys[0]: vec})
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk_many, {keys[0]: vec})
+        return vec
+
+    # --- 관측 ---
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "resident": len(self._lru),
+            }
@@ -0,0 +1,122 @@
+# app/core/metrics.py
+# Prometheus 지표 정의 + 계측 헬퍼. 노출은 app.main의 GET /metrics.
+# - 그래프 노드/LLM/도구: app.graph.callbacks.MetricsCallback(모든 에이전트 실행에 연결)
+# - 임베딩/Qdrant/MySQL/감정 추론: 각 호출 지점에서 직접 관측
+# - 기존 stats() 딕셔너리(캐시/인덱스/선주입 통계)는 수집 시점에 게이지로 변환(register_stats)
+# 다중 워커(uvicorn --workers N)는 프로세스별 값이므로 워커마다 스크랩하거나 multiprocess 모드를 쓴다.
+import logging
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+log = logging.getLogger("metrics")
+
+# 요청 경로 지연(초): 로컬 캐시 적중 ~ 느린 LLM 응답까지
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+AGENT_TURN_SECONDS = Histogram(
+    "jamjam_agent_turn_seconds", "에이전트 그래프 1회 실행(요청 1턴) 소요 시간", buckets=LATENCY_BUCKETS,
+)
+GRAPH_NODE_SECONDS = Histogram(
+    "jamjam_graph_node_seconds", "그래프 노드별 소요 시간", ["node"], buckets=LATENCY_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "jamjam_llm_seconds", "LLM 호출 소요 시간", ["run"], buckets=LATENCY_BUCKETS,
+)
+LLM_TTFT_SECONDS = Histogram(
+    "jamjam_llm_ttft_seconds", "LLM 첫 토큰까지 시간(스트리밍)", ["run"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "jamjam_llm_tokens", "LLM 토큰 수", ["run", "kind"],   # kind: prompt | completion
+)
+TOOL_SECONDS = Histogram(
+    "jamjam_tool_seconds", "도구 실행 소요 시간(메모 적중은 실행하지 않으므로 제외)", ["tool"], buckets=LATENCY_BUCKETS,
+)
+TOOL_CALLS = Counter(
+    "jamjam_tool_calls", "모델의 도구 호출 수", ["tool", "cache"],   # cache: hit(턴 메모) | miss(실행)
+)
+CACHE_REQUESTS = Counter(
+    "jamjam_cache_requests", "캐시 조회 수", ["cache", "result"],   # result: hit | miss (| disk_hit)
+)
+EMBEDDING_SECONDS = Histogram(
+    "jamjam_embedding_seconds", "원격 임베딩 API 호출 소요 시간(캐시 미스만)", ["op"], buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_TEXTS = Counter(
+    "jamjam_embedding_texts", "원격 임베딩 API로 보낸 텍스트 수", ["op"],
+)
+QDRANT_SECONDS = Histogram(
+    "jamjam_qdrant_seconds", "Qdrant 요청 소요 시간", ["op"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "jamjam_db_query_seconds", "SQL 문 실행 소요 시간", ["engine", "statement"], buckets=LATENCY_BUCKETS,
+)
+EMOTION_SECONDS = Histogram(
+    "jamjam_emotion_inference_seconds", "감정 모델 배치 추론 소요 시간", ["backend"], buckets=LATENCY_BUCKETS,
+)
+EMOTION_BATCH_SIZE = Histogram(
+    "jamjam_emotion_batch_size", "감정 추론 배치 크기(중복 제거 후)", buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+# --- SQLAlchemy: 커서 실행 전/후 이벤트로 문장 단위 지연 관측 ---
+def _statement_kind(statement: str) -> str:
+    head = (statement or "").lstrip().split(None, 1)
+    kind = head[0].lower() if head else ""
+    return kind if kind in ("select", "insert", "update", "delete") else "other"
+
+def instrument_engine(sync_engine: Any, name: str) -> None:
+    """동기 Engine(비동기 엔진은 .sync_engine)에 쿼리 시간 관측 리스너를 건다."""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            DB_QUERY_SECONDS.labels(name, _statement_kind(statement)).observe(time.perf_counter() - starts.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(ctx):
+        starts = ctx.connection.info.get("metrics_query_start") if ctx.connection is not None else None
+        if starts:
+            starts.pop()
+
+# --- 기존 stats() → 게이지 ---
+def _flatten(prefix: str, value: Any, out: List[Tuple[str, float]]) -> None:
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}" if prefix else str(k), v, out)
+    elif isinstance(value, (bool, int, float)):
+        out.append((prefix, float(value)))
+
+class _StatsCollector(Collector):
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def add(self, source: str, fn: Callable[[], Dict[str, Any]]) -> None:
+        self._sources[source] = fn
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        g = GaugeMetricFamily("jamjam_component_stat", "내부 캐시/인덱스 통계(stats() 값)", labels=["source", "stat"])
+        for source, fn in list(self._sources.items()):
+            try:
+                values: List[Tuple[str, float]] = []
+                _flatten("", fn() or {}, values)
+            except Exception as e:
+                log.warning("[metrics] stats(%s) warn: %s", source, e)
+                continue
+            for stat, v in values:
+                g.add_metric([source, stat], v)
+        yield g
+
+_stats_collector = _StatsCollector()
+REGISTRY.register(_stats_collector)
+
+def register_stats(source: str, fn: Callable[[], Dict[str, Any]]) -> None:
+    """수집 시점마다 fn()을 호출해 숫자 값(중첩 dict는 a.b 형태)을 jamjam_component_stat으로 노출."""
+    _stats_collector.add(source, fn)
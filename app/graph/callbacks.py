@@ -1,59 +1,338 @@
 # app/graph/callbacks.py
 import json
 import logging
-from typing import Any, Dict, Optional
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
 from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from app.core import metrics
+from app.core.config import settings
+
+# --- 트레이스 로그: 호출 측은 큐에 넣기만(put_nowait), 콘솔/파일 I/O는 리스너 스레드에서 ---
+_TRACE_LOGGER = "react.trace"
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+dropped_traces = 0
+
+class _DroppingQueueHandler(QueueHandler):
+    """큐가 가득 차면 기다리지 않고 버린다(요청 경로 보호)."""
+    def enqueue(self, record):
+        global dropped_traces
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_traces += 1
+
+class _ForwardHandler(logging.Handler):
+    """리스너 스레드에서 기존 로거 체인(react → root 핸들러)으로 넘긴다."""
+    def __init__(self, target: logging.Logger):
+        super().__init__()
+        self.target = target
+
+    def emit(self, record):
+        self.target.handle(record)
+
+def _is_jsonl(record) -> bool:
+    return getattr(record, "trace_jsonl", False)
+
+def trace_logger() -> logging.Logger:
+    """QueueHandler만 붙은 트레이스 로거(최초 사용 시 리스너 시작)."""
+    global _listener
+    logger = logging.getLogger(_TRACE_LOGGER)
+    if _listener is not None:
+        return logger
+    with _listener_lock:
+        if _listener is None:
+            q: "queue.Queue[logging.LogRecord]" = queue.Queue(max(1, settings.trace_queue_size))
+            console = _ForwardHandler(logging.getLogger("react"))
+            console.addFilter(lambda r: not _is_jsonl(r))
+            handlers: List[logging.Handler] = [console]
+            if settings.trace_jsonl_path:
+                os.makedirs(os.path.dirname(settings.trace_jsonl_path) or ".", exist_ok=True)
+                sink = logging.FileHandler(settings.trace_jsonl_path, encoding="utf-8")
+                sink.setFormatter(logging.Formatter("%(message)s"))
+                sink.addFilter(_is_jsonl)
+                handlers.append(sink)
+            logger.handlers = [_DroppingQueueHandler(q)]
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            _listener = QueueListener(q, *handlers)
+            _listener.start()
+    return logger
+
+def stop_trace_logging() -> None:
+    """큐에 남은 트레이스를 모두 기록하고 리스너 종료(app.main shutdown)."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for h in _listener.handlers:
+                h.close()
+            _listener = None
+
+def _preview(text: Any, n: int) -> str:
+    s = (text if isinstance(text, str) else json.dumps(text, ensure_ascii=False, default=str)).replace("\n", "\\n")
+    return s if len(s) <= n else s[:n] + " …"
+
+def _clip(text: Any, n: int) -> str:
+    s = text if isinstance(text, str) else json.dumps(text, ensure_ascii=False, default=str)
+    return s if len(s) <= n else s[:n] + f" …(+{len(s) - n})"
+
+def _dump_message(m: BaseMessage, max_chars: int) -> Dict[str, Any]:
+    d: Dict[str, Any] = {"type": m.type, "content": _clip(m.content, max_chars)}
+    if getattr(m, "tool_calls", None):
+        d["tool_calls"] = [{"name": tc["name"], "args": tc["args"], "id": tc.get("id")} for tc in m.tool_calls]
+    if isinstance(m, ToolMessage):
+        d["tool_call_id"] = m.tool_call_id
+        d["name"] = m.name
+    return d
 
 class ReactTraceCallback(BaseCallbackHandler):
     """
-    LLM 스트림/툴콜 델타를 터미널에 그대로 출력.
-    - content 토큰: 개행 이스케이프, 120자까지만 미리보기
-    - tool_calls 델타: 함수명과 arguments 누적 프리뷰
-    - Tool 실행 전/후의 input/output 스니펫
+    요청 1건의 ReAct 트레이스(debug_trace 또는 trace_sample_rate로 샘플링된 요청만 연결).
+    - LLM 스트림 델타는 런별 span에 모았다가 런 종료 시 1줄로 기록(토큰마다 로그 I/O 없음)
+    - 도구는 시작/종료를 묶어 1줄
+    - 최상위 런 종료 시 요청 전체(프롬프트/출력/도구 입출력/소요 시간)를 JSONL 1줄로(trace_jsonl_path 설정 시)
+      프롬프트 본문은 JSONL을 쓸 때만, 메시지당 trace_prompt_chars 글자까지만 잡아 둔다(콘솔 트레이스에는 안 쓰임)
+    로그는 QueueHandler로만 나가므로 콜백 자체는 메모리 작업뿐이다.
     """
+    run_inline = True
+
     def __init__(self, logger: Optional[logging.Logger] = None):
-        self.log = logger or logging.getLogger("react")
+        self.log = logger or trace_logger()
+        self._root: Optional[Any] = None
+        self._t0 = time.perf_counter()
+        self._request: Dict[str, Any] = {}
+        self._open: Dict[Any, Dict[str, Any]] = {}   # run_id → 진행 중 span
+        self._spans: List[Dict[str, Any]] = []
+
+    def _ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000, 1)
+
+    # 그래프 전체
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        if parent_run_id is not None or self._root is not None:
+            return
+        self._root, self._t0 = run_id, time.perf_counter()
+        meta = metadata or {}
+        msgs = (inputs or {}).get("messages") if isinstance(inputs, dict) else None
+        self._request = {
+            "session_id": meta.get("session_id"),
+            "member_id": meta.get("member_id"),
+            "input": msgs[-1].content if msgs else None,
+        }
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id == self._root:
+            self._flush(outputs, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        if run_id == self._root:
+            self._flush(None, error)
+
+    def _flush(self, outputs, error) -> None:
+        elapsed = self._ms()
+        response = outputs.get("response") if isinstance(outputs, dict) else None
+        self.log.info("[TRACE] request done %.0fms llm=%d tools=%d%s", elapsed,
+                      sum(1 for s in self._spans if s["type"] == "llm"),
+                      sum(1 for s in self._spans if s["type"] == "tool"),
+                      f" error={error}" if error else "")
+        if settings.trace_jsonl_path:
+            record = {
+                "ts": time.time(),
+                "run_id": str(self._root),
+                **self._request,
+                "response": response,
+                "error": str(error) if error else None,
+                "duration_ms": elapsed,
+                "spans": self._spans,
+            }
+            self.log.info(json.dumps(record, ensure_ascii=False, default=str), extra={"trace_jsonl": True})
+        self._root, self._spans, self._open = None, [], {}
 
     # LLM
-    def on_chat_model_start(self, serialized: Dict[str, Any], messages, **kwargs):
-        name = serialized.get("name") or serialized.get("id") or "chat_model"
-        self.log.info("[TRACE] LLM start: %s", name)
-
-    def on_chat_model_stream(self, chunk, **kwargs):
-        content = getattr(chunk, "content", None)
-        if content:
-            s = content.replace("\n", "\\n")
-            if len(s) > 120:
-                s = s[:120] + " …"
-            self.log.info("[TRACE] LLM> %s", s)
-
-        tool_calls = getattr(chunk, "tool_calls", None)
-        if tool_calls:
-            for tc in tool_calls:
-                name = getattr(tc, "name", None)
-                fn = getattr(tc, "function", None)
-                if fn is not None:
-                    name = name or getattr(fn, "name", None)
-                    args = getattr(fn, "arguments", None)
-                else:
-                    args = None
-                if args is not None:
-                    preview = args if isinstance(args, str) else json.dumps(args, ensure_ascii=False)
-                    if len(preview) > 120:
-                        preview = preview[:120] + " …"
-                    self.log.info("[TRACE] tool_call(delta): %s args+=%s", name, preview)
-
-    def on_chat_model_end(self, outputs, **kwargs):
-        self.log.info("[TRACE] LLM end")
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        span = {
+            "type": "llm",
+            "name": kwargs.get("name") or (serialized or {}).get("name") or "chat_model",
+            "node": (metadata or {}).get("langgraph_node"),
+            "start_ms": self._ms(),
+            "ttft_ms": None,
+            "text": [],
+            "tool_call_chunks": {},
+        }
+        if settings.trace_jsonl_path:
+            span["params"] = kwargs.get("invocation_params")
+            span["prompt"] = [_dump_message(m, settings.trace_prompt_chars) for m in (messages[0] if messages else [])]
+        self._open[run_id] = span
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id, **kwargs):
+        span = self._open.get(run_id)
+        if span is None:
+            return
+        if span["ttft_ms"] is None:
+            span["ttft_ms"] = round(self._ms() - span["start_ms"], 1)
+        msg = getattr(chunk, "message", None)
+        if token:
+            span["text"].append(token)
+        for tc in getattr(msg, "tool_call_chunks", None) or []:
+            acc = span["tool_call_chunks"].setdefault(tc.get("index") or 0, {"name": "", "args": ""})
+            acc["name"] += tc.get("name") or ""
+            acc["args"] += tc.get("args") or ""
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return
+        span["duration_ms"] = round(self._ms() - span["start_ms"], 1)
+        gen = (getattr(response, "generations", None) or [[None]])[0]
+        msg = getattr(gen[0], "message", None) if gen else None
+        # 스트리밍이 아니었으면 최종 메시지에서 채운다
+        span["output"] = "".join(span.pop("text")) or (getattr(msg, "content", "") if msg is not None else "")
+        chunks = span.pop("tool_call_chunks")
+        span["tool_calls"] = (
+            [{"name": tc["name"], "args": tc["args"]} for tc in getattr(msg, "tool_calls", None) or []]
+            or [chunks[i] for i in sorted(chunks)]
+        )
+        span["usage"] = getattr(msg, "usage_metadata", None)
+        self._spans.append(span)
+        self.log.info("[TRACE] LLM %s %.0fms ttft=%sms out=%s tool_calls=%s",
+                      span["name"], span["duration_ms"], span["ttft_ms"],
+                      _preview(span["output"], 120), _preview(span["tool_calls"], 200) if span["tool_calls"] else "-")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is not None:
+            span.pop("text", None); span.pop("tool_call_chunks", None)
+            span["error"] = str(error)
+            self._spans.append(span)
+            self.log.info("[TRACE] LLM %s error: %s", span["name"], error)
 
     # Tool 실행
-    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs):
-        name = serialized.get("name") or "tool"
-        prev = input_str if len(input_str) <= 200 else input_str[:200] + " …"
-        self.log.info("[TRACE] Tool start: %s input=%s", name, prev)
-
-    def on_tool_end(self, output: str, **kwargs):
-        out = output if output is not None else ""
-        if len(out) > 200:
-            out = out[:200] + " …"
-        self.log.info("[TRACE] Tool end: %s", out)
+    def on_tool_start(self, serialized, input_str, *, run_id, inputs=None, **kwargs):
+        self._open[run_id] = {
+            "type": "tool",
+            "name": kwargs.get("name") or (serialized or {}).get("name") or "tool",
+            "start_ms": self._ms(),
+            "input": inputs if inputs is not None else input_str,
+        }
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return
+        out = getattr(output, "content", output)
+        span["duration_ms"] = round(self._ms() - span["start_ms"], 1)
+        span["output"] = out if isinstance(out, str) else str(out)
+        self._spans.append(span)
+        self.log.info("[TRACE] Tool %s %.0fms input=%s output=%s", span["name"], span["duration_ms"],
+                      _preview(span["input"], 200), _preview(span["output"], 200))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is not None:
+            span["error"] = str(error)
+            self._spans.append(span)
+            self.log.info("[TRACE] Tool %s error: %s", span["name"], error)
+
+class MetricsCallback(BaseCallbackHandler):
+    """
+    에이전트 실행 1회의 단계별 지표(Prometheus, app.core.metrics).
+    - 그래프 노드: 노드 런(name == langgraph_node)의 시작~종료
+    - LLM: 호출 시간, 첫 토큰까지 시간(스트리밍), prompt/completion 토큰
+    - 도구: 실행 시간
+    - 최상위 런(그래프 전체): 턴 소요 시간
+    """
+    run_inline = True   # 이벤트 루프에서 바로 호출(스레드 풀 왕복 없음)
+
+    def __init__(self):
+        self._starts: Dict[Any, tuple] = {}   # run_id → (종류, 라벨, 시작 시각)
+        self._first_token: set = set()
+
+    def _begin(self, run_id, kind: str, label: str) -> None:
+        self._starts[run_id] = (kind, label, time.perf_counter())
+
+    def _end(self, run_id) -> Optional[tuple]:
+        entry = self._starts.pop(run_id, None)
+        if entry is None:
+            return None
+        kind, label, t0 = entry
+        elapsed = time.perf_counter() - t0
+        if kind == "turn":
+            metrics.AGENT_TURN_SECONDS.observe(elapsed)
+        elif kind == "node":
+            metrics.GRAPH_NODE_SECONDS.labels(label).observe(elapsed)
+        elif kind == "llm":
+            metrics.LLM_SECONDS.labels(label).observe(elapsed)
+        elif kind == "tool":
+            metrics.TOOL_SECONDS.labels(label).observe(elapsed)
+        return entry
+
+    # 체인(그래프/노드)
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is None:
+            self._begin(run_id, "turn", "")
+        elif node and kwargs.get("name") == node:
+            self._begin(run_id, "node", node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    # LLM
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._begin(run_id, "llm", kwargs.get("name") or (metadata or {}).get("langgraph_node") or "chat_model")
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id in self._first_token or run_id not in self._starts:
+            return
+        self._first_token.add(run_id)
+        _, label, t0 = self._starts[run_id]
+        metrics.LLM_TTFT_SECONDS.labels(label).observe(time.perf_counter() - t0)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._first_token.discard(run_id)
+        entry = self._end(run_id)
+        if entry is None:
+            return
+        prompt, completion = _token_usage(response)
+        if prompt:
+            metrics.LLM_TOKENS.labels(entry[1], "prompt").inc(prompt)
+        if completion:
+            metrics.LLM_TOKENS.labels(entry[1], "completion").inc(completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._first_token.discard(run_id)
+        self._end(run_id)
+
+    # Tool 실행
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._begin(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name") or "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+def _token_usage(response) -> tuple:
+    """(prompt, completion) 토큰. 메시지 usage_metadata 우선, 없으면 llm_output.token_usage."""
+    prompt = completion = 0
+    for gens in getattr(response, "generations", None) or []:
+        for g in gens:
+            usage = getattr(getattr(g, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not (prompt or completion):
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return prompt, completion
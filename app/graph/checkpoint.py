@@ -0,0 +1,127 @@
+# app/graph/checkpoint.py
+# LangGraph 체크포인터 생성(세션 상태 영속화) + 오래된 스레드 TTL 정리 작업.
+# - sqlite(기본): AsyncSqliteSaver + 스레드별 마지막 기록 시각 테이블(checkpoint_threads), 로컬 파일 1개
+#   TTL 정리는 이 테이블만 범위 조회 → 저장된 전체 체크포인트를 훑지 않는다
+# - none: 체크포인터 없음(매 턴 새 스레드, 기존 동작)
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
+from typing import AsyncIterator, List, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from app.core.config import settings
+
+log = logging.getLogger("checkpoint")
+
+# TTL 정리 1회 조회/삭제 단위(잠금을 짧게 나눠 잡는다)
+_CLEANUP_BATCH = 200
+
+class TrackedSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver + 스레드별 마지막 체크포인트 시각(checkpoint_threads). TTL 정리가 이 테이블만 본다."""
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoint_threads (
+                    thread_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_checkpoint_threads_updated ON checkpoint_threads (updated_at);
+                """
+            )
+            # 테이블 도입 전 스레드: 지금 기록된 것으로 간주(지금부터 TTL 뒤 정리)
+            await self.conn.execute(
+                "INSERT OR IGNORE INTO checkpoint_threads (thread_id, updated_at) "
+                "SELECT DISTINCT thread_id, ? FROM checkpoints",
+                (time.time(),),
+            )
+            await self.conn.commit()
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await self.setup()
+        async with self.lock:
+            # 같은 연결의 트랜잭션 → 아래 체크포인트 INSERT의 commit에 함께 반영(추가 fsync 없음)
+            await self.conn.execute(
+                "INSERT INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (str(config["configurable"]["thread_id"]), time.time()),
+            )
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with self.lock:
+            await self.conn.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (str(thread_id),))
+        await super().adelete_thread(thread_id)
+
+    async def expired_threads(self, cutoff: float, limit: int) -> List[str]:
+        """마지막 체크포인트 시각(epoch 초)이 cutoff보다 오래된 스레드(오래된 순, 최대 limit개)."""
+        await self.setup()
+        async with self.lock, self.conn.execute(
+            "SELECT thread_id FROM checkpoint_threads WHERE updated_at < ? ORDER BY updated_at LIMIT ?",
+            (cutoff, limit),
+        ) as cur:
+            return [row[0] for row in await cur.fetchall()]
+
+@asynccontextmanager
+async def _open_saver(backend: str) -> AsyncIterator[Optional[BaseCheckpointSaver]]:
+    if backend == "sqlite":
+        path = settings.checkpoint_sqlite_path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        async with TrackedSqliteSaver.from_conn_string(path) as saver:
+            await saver.setup()
+            yield saver
+    elif backend in ("", "none"):
+        yield None
+    else:
+        raise ValueError(f"unknown checkpoint_backend: {backend}")
+
+async def cleanup_expired_threads(saver: TrackedSqliteSaver, ttl: timedelta) -> int:
+    """마지막 체크포인트가 ttl보다 오래된 스레드를 삭제. 반환: 삭제한 스레드 수."""
+    cutoff = time.time() - ttl.total_seconds()
+    deleted = 0
+    while True:
+        expired = await saver.expired_threads(cutoff, _CLEANUP_BATCH)
+        for tid in expired:
+            await saver.adelete_thread(tid)
+        deleted += len(expired)
+        if len(expired) < _CLEANUP_BATCH:
+            return deleted
+
+async def _cleanup_loop(saver: TrackedSqliteSaver) -> None:
+    ttl = timedelta(hours=settings.checkpoint_ttl_hours)
+    interval = max(1.0, settings.checkpoint_cleanup_interval_min * 60)
+    while True:
+        try:
+            n = await cleanup_expired_threads(saver, ttl)
+            if n:
+                log.info("[checkpoint] expired threads deleted: %d", n)
+        except Exception as e:
+            log.warning("[checkpoint] cleanup warn: %s", e)
+        await asyncio.sleep(interval)
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[Optional[BaseCheckpointSaver]]:
+    """설정된 백엔드로 체크포인터를 열고(app.main lifespan), TTL 정리 작업을 함께 돌린다."""
+    backend = (settings.checkpoint_backend or "none").strip().lower()
+    async with _open_saver(backend) as saver:
+        task = None
+        if saver is not None and settings.checkpoint_ttl_hours > 0:
+            task = asyncio.create_task(_cleanup_loop(saver), name="checkpoint-cleanup")
+        log.info("[checkpoint] backend=%s", backend)
+        try:
+            yield saver
+        finally:
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
@@ -1,11 +1,9 @@
 # app/graph/graph.py
 # LangGraph 상태 머신 구성. 선요약/회상 선주입 → 에이전트 → (도구) → 최종응답.
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 from app.graph.state import AgentState
 from app.graph import nodes
-from app.graph.tools import classify_emotion_tool, rag_search_tool, summarize_tool
 
 def build_agent_graph(checkpointer=None):
     # 그래프 노드 구성
@@ -17,8 +15,8 @@ def build_agent_graph(checkpointer=None):
     # 1) 에이전트(도구 자율 호출)
     g.add_node("agent", nodes.call_agent)
 
-    # 2) 도구 실행/정리
-    g.add_node("tools", ToolNode([classify_emotion_tool, rag_search_tool, summarize_tool]))
+    # 2) 도구 실행(턴 단위 메모 확인 → 미스만 ToolNode)/정리
+    g.add_node("tools", nodes.run_tools)
     g.add_node("tools_to_prompt", nodes.tools_to_prompt)
 
     # 3) 종료
@@ -2,73 +2,70 @@
 import json
 import logging
 import asyncio
-from typing import List, Optional
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
 
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import ToolNode
 
 from app.graph.prompts import load_prompt_template
+from app.graph.state import HISTORY_SUMMARY_ID
+from app.graph.prompt_budget import budget_prompt, build_preload_context, count_tokens, has_encoder, truncate_tokens
+from app.graph import preload
+from app.core import metrics
+from app.core.config import settings
 from app.core.client import agent_llm
-from app.graph.tools import classify_emotion_tool, rag_search_tool, summarize_tool
+from app.graph.tools import classify_emotion_tool, memo_key, rag_search_tool, summarize_tool
 
-from app.core.db import SessionLocal
-from app.services.summary import summarize_conversation
-from app.services.memory import recall_or_general_context
-from app.services.emotion_service import predict_emotion
-from app.models.user import User  # ← 성별 조회
+from app.core.db import AsyncSessionLocal
+from app.services.summary import get_cached_summary, schedule_summary_refresh
+from app.services.memory import recall_or_general_context_async, retrieve_memory_hits_async, hits_to_state
+from app.services.emotion_service import apredict_emotion_result
+from app.services.member_profile import get_member_gender  # ← 성별 조회(캐시)
 
 logger = logging.getLogger("react")
 
+TOOLS = [classify_emotion_tool, rag_search_tool, summarize_tool]
+
 LLM_WITH_TOOLS = agent_llm().bind_tools(
-    [classify_emotion_tool, rag_search_tool, summarize_tool],
+    TOOLS,
     tool_choice="auto",
 ).with_config({"run_name": "AgentWithTools"})
 
+TOOL_NODE = ToolNode(TOOLS)
+
+REACT_RULES = (
+    "[ReAct 지침]\n"
+    "- 필요 시 도구를 선택해 순차 호출(Action)하고, 결과(Observation)를 반영해 다음 결정을 내린다.\n"
+    "- 아래 선주입 요약/회상/감정은 문자열 컨텍스트이며, 실제 Tool 실행 결과가 아니다.\n"
+    "- 동일 목적의 도구 호출은 금지. 이 턴에서 도구 호출은 최대 1회만 허용.\n"
+    "- 최종 답변은 'Final:'로 시작하며 1~2문장 + 되묻기 1문장으로 작성한다."
+)
+
 AGENT_PROMPT = ChatPromptTemplate.from_messages([
     ("system", "{role_text}"),
-    ("system",
-     "[ReAct 지침]\n"
-     "- 필요 시 도구를 선택해 순차 호출(Action)하고, 결과(Observation)를 반영해 다음 결정을 내린다.\n"
-     "- 아래 선주입 요약/회상/감정은 문자열 컨텍스트이며, 실제 Tool 실행 결과가 아니다.\n"
-     "- 동일 목적의 도구 호출은 금지. 이 턴에서 도구 호출은 최대 1회만 허용.\n"
-     "- 최종 답변은 'Final:'로 시작하며 1~2문장 + 되묻기 1문장으로 작성한다."),
+    ("system", REACT_RULES),
     ("system", "{control_hint}"),
     MessagesPlaceholder(variable_name="history"),
     ("system", "선주입 컨텍스트(문자열):\n{preload_context}"),
     ("system", "도구 결과 요약(이전 턴):\n{tool_context}"),
 ])
 
-def _get_user_gender(member_id: Optional[int]) -> int:
-    """
-    DB에서 사용자 성별을 읽는다.
-    반환: 0 또는 None=미지정, 1=남성, 2=여성
-    """
-    if not member_id:
-        return 0
-    db = SessionLocal()
-    try:
-        u = db.query(User).filter(User.member_id == member_id).first()
-        g = getattr(u, "gender", None) if u else None
-        return int(g) if g is not None else 0
-    except Exception as e:
-        logger.warning("=== ROLE / gender fetch warn: %s", e)
-        return 0
-    finally:
-        db.close()
-
-
-def _user_title_for(member_id: Optional[int]) -> str:
+async def _user_title_for(member_id: Optional[int]) -> str:
     """
     성별에 따른 호칭:
       - 1(남성) → '아빠'
       - 2(여성) → '엄마'
       - 0/기타 → '' (호칭 생략)
     """
-    g = _get_user_gender(member_id)
+    g = await get_member_gender(member_id)  # 프로필 캐시(히트 시 DB 조회 없음)
     return "아빠" if g == 1 else ("엄마" if g == 2 else "")
 
-def _ensure_role_text(member_id: Optional[int]) -> str:
-    """역할/규칙 + (성별 호칭 규칙) + 도구 목록을 구성."""
+async def _ensure_role_text(member_id: Optional[int]) -> str:
+    """역할/규칙 + (성별 호칭 규칙) + 도구 목록을 구성. 템플릿/성별 모두 캐시 → 핫패스 파일·DB I/O 없음."""
     try:
         role = load_prompt_template("role")
     except Exception:
@@ -79,7 +76,7 @@ def _ensure_role_text(member_id: Optional[int]) -> str:
     mi = "" if member_id is None else str(member_id)
 
     # ▼ 성별 기반 호칭 규칙 주입
-    title = _user_title_for(member_id)
+    title = await _user_title_for(member_id)
     if title:
         honorific_rule = (
             "\n\n[호칭 규칙]\n"
@@ -99,10 +96,33 @@ def _ensure_role_text(member_id: Optional[int]) -> str:
         f"- rag_search_tool(query, member_id={mi}, top_k=3)\n"
     )
 
-    return role + honorific_rule + tools_block
+    # 역할 예산(prompt_role_tokens)은 역할 본문에서만 깎는다: 뒤쪽 호칭 규칙/도구 목록(member_id)이 잘리면 도구를 못 부른다
+    # 인코더가 없으면(오프라인 등) 근사치가 실제보다 커서 멀쩡한 페르소나가 잘린다 → 자르지 않는다
+    tail = honorific_rule + tools_block
+    if has_encoder():
+        role = truncate_tokens(role, settings.prompt_role_tokens - count_tokens(tail) - 4)   # 4: 말줄임/토큰 경계 여유
+    return role + tail
 
 def _history_all(messages: List[BaseMessage]) -> List[BaseMessage]:
-    return [m for m in messages if isinstance(m, (HumanMessage, AIMessage, ToolMessage))]
+    # 체크포인트 리듀서가 접어 둔 이전 턴 압축 요약(SystemMessage)도 히스토리 맨 앞에 포함.
+    # 결과(ToolMessage)가 빠진 tool_calls AIMessage는 OpenAI가 400으로 거부 → 그 호출과 딸린 도구 결과를 함께 제외
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    dropped: set = set()
+    out: List[BaseMessage] = []
+    for m in messages:
+        if isinstance(m, AIMessage) and m.tool_calls and any(tc["id"] not in answered for tc in m.tool_calls):
+            dropped.update(tc["id"] for tc in m.tool_calls)
+            continue
+        if isinstance(m, ToolMessage) and m.tool_call_id in dropped:
+            continue
+        if isinstance(m, (HumanMessage, AIMessage, ToolMessage)) or m.id == HISTORY_SUMMARY_ID:
+            out.append(m)
+    return out
+
+def _without_tool_calls(ai: AIMessage) -> AIMessage:
+    """도구로 보내지 않는 응답에서 호출 정보를 지운다(본문 유지). 그대로 체크포인트되면 다음 턴 히스토리가 깨진다."""
+    kwargs = {k: v for k, v in (ai.additional_kwargs or {}).items() if k not in ("tool_calls", "function_call")}
+    return ai.model_copy(update={"tool_calls": [], "invalid_tool_calls": [], "additional_kwargs": kwargs})
 
 def _collect_recent_tool_msgs(messages: List[BaseMessage]) -> List[ToolMessage]:
     idx = None
@@ -121,10 +141,10 @@ def _summarize_tools(tool_msgs: List[ToolMessage]) -> str:
     if not tool_msgs:
         return ""
     lines = []
+    per_tool = max(1, settings.prompt_tool_tokens // len(tool_msgs))  # 도구 결과 예산을 균등 분배
     for tm in tool_msgs:
         name = getattr(tm, "name", "tool")
-        out = (tm.content or "").strip()
-        if len(out) > 800: out = out[:800] + " …"
+        out = truncate_tokens(tm.content or "", per_tool)
         lines.append(f"- {name}: {out}")
     return "\n".join(lines)
 
@@ -152,17 +172,68 @@ def _last_user_text(messages: List[BaseMessage]) -> str:
     return ""
 
 # 선주입
-def _recall_with_new_session(member_id: int, user_text: str) -> str:
-    db2 = SessionLocal()
-    try:
-        return (recall_or_general_context(user_text, member_id, db2, top_k=3) or "").strip()
-    finally:
-        db2.close()
+# 동시에 도는 작업마다 세션을 따로 연다(AsyncSession은 동시 사용 불가)
+async def _cached_summary_with_new_session(member_id: Optional[int]) -> str:
+    async with AsyncSessionLocal() as db2:
+        return await get_cached_summary(member_id, db2)
+
+RECALL_TOP_K = 3
+
+async def _recall_with_new_session(member_id: int, user_text: str):
+    """(회상 컨텍스트, 검색 히트). 히트는 같은 턴의 rag_search_tool이 재사용."""
+    hits = await retrieve_memory_hits_async(user_text, RECALL_TOP_K, member_id)
+    async with AsyncSessionLocal() as db2:
+        ctx = await recall_or_general_context_async(user_text, member_id, db2, top_k=RECALL_TOP_K, hits=hits)
+    return (ctx or "").strip(), hits
+
+def _session_turns(messages: List[BaseMessage]) -> int:
+    """이번 턴 이전에 이 스레드에서 오간 턴 수(압축 요약이 있으면 그보다 오래된 세션)."""
+    n = sum(1 for m in messages if isinstance(m, HumanMessage)) - 1
+    if any(m.id == HISTORY_SUMMARY_ID for m in messages):
+        n += 1
+    return max(0, n)
+
+def _turn_tool_names(messages: List[BaseMessage]) -> List[str]:
+    """이번 턴(마지막 HumanMessage 이후)에 모델이 호출한 도구 이름."""
+    names: List[str] = []
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            break
+        if isinstance(m, AIMessage):
+            names.extend(tc["name"] for tc in (m.tool_calls or []))
+    return names
+
+def _preload_tool_memo(member_id: Optional[int], user_text: str, ready: Dict[str, Any],
+                       summary: str, recall_ctx: str, emotion: str) -> Dict[str, Dict[str, str]]:
+    """
+    선주입 결과로 같은 턴 도구 메모를 미리 채운다(run_tools가 도구 실행 전에 확인).
+    메모 결과는 ToolMessage로 체크포인트 히스토리에 남으므로 본문 자체를 담는다(선주입 섹션과 같은 토큰 상한).
+    다음 턴의 preload_context는 내용이 달라지므로 그 섹션을 가리키는 문구로는 쓸 수 없다.
+    """
+    memo: Dict[str, Dict[str, str]] = {}
+    q = user_text.strip()
+    if "recall" in ready and q:
+        content = f"ctx_len={len(recall_ctx)}\n{truncate_tokens(recall_ctx, settings.prompt_recall_tokens)}"
+        memo[memo_key("rag_search_tool", {"query": q, "member_id": member_id, "top_k": RECALL_TOP_K})] = {
+            "content": content, "source": "preload"}
+    if summary:
+        memo[memo_key("summarize_tool", {"member_id": member_id})] = {
+            "content": truncate_tokens(summary, settings.prompt_summary_tokens), "source": "preload"}
+    if emotion and q:
+        memo[memo_key("classify_emotion_tool", {"text": q})] = {"content": f"emotion={emotion}", "source": "preload"}
+    return memo
 
 async def preload_context(state):
     member_id = state.get("member_id")
+    state["user_emotion"] = None
+    state["recall_query"] = ""
+    state["recall_top_k"] = 0
+    state["recall_hits"] = None
+    state["preload_key"] = ""
+    state["preload_injected"] = []
+    state["tool_memo"] = {}
     if state.get("disable_preload"):
-        state["base_system_text"] = state.get("base_system_text") or _ensure_role_text(member_id)
+        state["base_system_text"] = state.get("base_system_text") or await _ensure_role_text(member_id)
         state["preload_context"] = "없음"
         state["tool_context"] = state.get("tool_context", "") or "없음"
         state["tool_pass_done"] = False
@@ -172,30 +243,68 @@ async def preload_context(state):
     messages: List[BaseMessage] = state.get("messages", []) or []
     user_text = _last_user_text(messages) or ""
 
-    db = SessionLocal()
+    # 발화 휴리스틱으로 구성요소 선택. 요약은 누적 캐시만 읽는다(LLM 대기 없음).
+    plan = preload.plan_preload(user_text, _session_turns(messages))
+    tasks: Dict[str, asyncio.Task] = {}
+    if plan.summary:
+        tasks["summary"] = asyncio.create_task(_cached_summary_with_new_session(member_id))
+    if plan.recall != "off":
+        tasks["recall"] = asyncio.create_task(_recall_with_new_session(member_id, user_text))
+    if plan.emotion:
+        tasks["emotion"] = asyncio.create_task(apredict_emotion_result(user_text))
+    for name in preload.COMPONENTS:
+        preload.record(name, "started" if name in tasks else "skipped")
+
+    # 프롬프트에 꼭 필요한 것(요약, 회상 힌트가 있을 때의 회상)만 기다린다.
+    # 나머지는 짧게만 기다리고 에이전트 LLM 호출과 동시에 계속 실행(결과는 도구/finalize가 가져감).
+    blocking = [t for n, t in tasks.items()
+                if n == "summary" or (n == "recall" and plan.recall == "blocking") or not settings.preload_adaptive]
     try:
-        summary_task = summarize_conversation(member_id, db, limit=20)
-        recall_task = asyncio.to_thread(_recall_with_new_session, member_id, user_text)
-        emotion_task = asyncio.to_thread(predict_emotion, user_text) if user_text else asyncio.to_thread(lambda: "")
-        summary, recall_ctx, emotion = await asyncio.gather(summary_task, recall_task, emotion_task)
-        if hasattr(summary, "content"): summary = summary.content
-        summary = (summary or "").strip()
-        recall_ctx = (recall_ctx or "").strip()
-        emotion = (emotion or "").strip()
-    finally:
-        db.close()
-
-    base_role = state.get("base_system_text") or _ensure_role_text(member_id)
-    if summary:   base_role += f"\n\n[최근 대화 요약]\n{summary}"
-    if recall_ctx:base_role += f"\n\n[회상 컨텍스트]\n{recall_ctx[:600]}"
-    if emotion:   base_role += f"\n\n[사용자 현재 감정 추정] {emotion}"
-    state["base_system_text"] = base_role
-
-    add_lines = []
-    if summary:    add_lines.append(f"- preload_summary: {summary[:400]}")
-    if recall_ctx: add_lines.append(f"- preload_recall: {recall_ctx[:400]}")
-    if emotion:    add_lines.append(f"- preload_emotion: {emotion}")
-    state["preload_context"] = "\n".join(add_lines) or "없음"
+        if blocking:
+            await asyncio.gather(*blocking)
+    except BaseException:
+        for t in tasks.values():
+            t.cancel()
+        raise
+    rest = [t for t in tasks.values() if not t.done()]
+    if rest and settings.preload_grace_ms > 0:
+        await asyncio.wait(rest, timeout=settings.preload_grace_ms / 1000)
+
+    ready: Dict[str, Any] = {}
+    for name, t in list(tasks.items()):
+        if not t.done():
+            preload.record(name, "late")
+            continue
+        del tasks[name]
+        if t.exception() is not None:   # 추측 실행분 실패는 무시(필요하면 도구가 직접 계산)
+            logger.warning("=== PRELOAD / %s failed: %s", name, t.exception())
+            preload.record(name, "error")
+            continue
+        ready[name] = t.result()
+        preload.record(name, "ready")
+    key = uuid.uuid4().hex
+    preload.register(key, tasks)
+
+    summary = (ready.get("summary") or "").strip()
+    recall_ctx, recall_hits = ready.get("recall") or ("", None)
+    user_emotion = ready.get("emotion")
+    if plan.recall != "off":
+        state["recall_query"] = user_text.strip()
+        state["recall_top_k"] = RECALL_TOP_K
+        state["recall_hits"] = hits_to_state(recall_hits) if recall_hits is not None else None
+    emotion = user_emotion["label"] if user_emotion else ""
+    state["user_emotion"] = user_emotion
+    if "summary" in ready and not summary:
+        schedule_summary_refresh(member_id)
+
+    state["tool_memo"] = _preload_tool_memo(member_id, user_text, ready, summary, recall_ctx, emotion)
+    state["preload_key"] = key
+    state["preload_injected"] = [n for n, v in (("summary", summary), ("recall", recall_ctx), ("emotion", emotion)) if v]
+    logger.info("=== PRELOAD === plan=%s ready=%s pending=%s", plan._asdict(), sorted(ready), sorted(tasks))
+
+    # 역할 텍스트는 고정 부분만. 요약/회상/감정은 선주입 컨텍스트 1곳에만(토큰 상한 적용, 중복 주입 없음)
+    state["base_system_text"] = state.get("base_system_text") or await _ensure_role_text(member_id)
+    state["preload_context"] = build_preload_context(summary, recall_ctx, emotion)
 
     state["tool_context"] = state.get("tool_context", "") or "없음"
     state["tool_pass_done"] = False
@@ -214,7 +323,7 @@ async def call_agent(state):
         state["tool_pass_done"] = False
 
     if not state.get("base_system_text"):
-        state["base_system_text"] = _ensure_role_text(member_id)
+        state["base_system_text"] = await _ensure_role_text(member_id)
 
     history = _history_all(messages)
     tool_context = (state.get("tool_context") or "없음").strip()
@@ -233,8 +342,13 @@ async def call_agent(state):
     logger.info("=== REACT / THOUGHT === has_preload=%s tool_pass_done=%s history=%d preload_len=%d tool_ctx_len=%d",
                 has_preload, state.get("tool_pass_done"), len(history), len(preload_context), len(tool_context))
 
+    # 토큰 예산: 섹션 상한 적용 후 남은 만큼 히스토리(오래된 턴부터 압축/제거)
+    role_text, tool_context, history = budget_prompt(
+        state["base_system_text"], REACT_RULES + control_hint, preload_context, tool_context, history,
+    )
+
     prompt_msgs = AGENT_PROMPT.format_messages(
-        role_text=state["base_system_text"],
+        role_text=role_text,
         control_hint=control_hint.strip(),
         history=history,
         preload_context=preload_context,
@@ -246,6 +360,11 @@ async def call_agent(state):
     if getattr(ai, "tool_calls", None) and not state.get("tool_pass_done"):
         logger.info("=== REACT / DECISION === tool_calls -> %s", _toolcalls_preview(ai.tool_calls))
         return {"messages": messages + [ai]}
+    if getattr(ai, "tool_calls", None) or getattr(ai, "invalid_tool_calls", None):
+        # 도구 1회 사용 후에도 호출을 낸 경우: 라우터가 finalize로 보내므로 결과 없는 호출이 남지 않게 제거
+        logger.info("=== REACT / DECISION === tool_calls after tool pass -> dropped %s",
+                    _toolcalls_preview(ai.tool_calls or []))
+        ai = _without_tool_calls(ai)
 
     preview = (ai.content or "").replace("\n", " ")
     if len(preview) > 120: preview = preview[:120] + " …"
@@ -261,6 +380,52 @@ def should_call_tools(state) -> str:
     logger.info("=== ROUTER === agent → finalize")
     return "finalize"
 
+# 도구 실행: 턴 단위 메모(도구 이름 + 정규화 인자) 확인 후 미스만 ToolNode로 실행
+_memo_counts: Counter = Counter()
+
+def tool_memo_stats() -> Dict[str, int]:
+    """'{도구}:{preload|tool|miss}' → 횟수."""
+    return dict(_memo_counts)
+
+async def run_tools(state, config: RunnableConfig):
+    messages: List[BaseMessage] = state.get("messages", []) or []
+    ai = messages[-1] if messages and isinstance(messages[-1], AIMessage) else None
+    if ai is None or not ai.tool_calls:
+        return {}
+
+    memo = dict(state.get("tool_memo") or {})
+    answered: Dict[str, ToolMessage] = {}
+    misses = []
+    for tc in ai.tool_calls:
+        hit = memo.get(memo_key(tc["name"], tc["args"]))
+        if hit is None:
+            misses.append(tc)
+            _memo_counts[f"{tc['name']}:miss"] += 1
+            metrics.TOOL_CALLS.labels(tc["name"], "miss").inc()
+            continue
+        _memo_counts[f"{tc['name']}:{hit['source']}"] += 1
+        metrics.TOOL_CALLS.labels(tc["name"], "hit").inc()
+        logger.info("=== REACT / ACTION === %s (memo:%s, skipped)", tc["name"], hit["source"])
+        answered[tc["id"]] = ToolMessage(
+            content=hit["content"], name=tc["name"], tool_call_id=tc["id"], artifact={"memo": hit["source"]},
+        )
+
+    if misses:
+        # 미스 호출만 남긴 AIMessage 사본으로 ToolNode 실행(InjectedState는 현재 state 그대로)
+        sub = ai.model_copy(update={"tool_calls": misses})
+        out = await TOOL_NODE.ainvoke({**state, "messages": messages[:-1] + [sub]}, config)
+        args_by_id = {tc["id"]: tc["args"] for tc in misses}
+        for tm in out["messages"]:
+            answered[tm.tool_call_id] = tm
+            if tm.status != "error":
+                memo[memo_key(tm.name, args_by_id.get(tm.tool_call_id, {}))] = {
+                    "content": tm.content if isinstance(tm.content, str) else str(tm.content), "source": "tool"}
+
+    return {
+        "messages": [answered[tc["id"]] for tc in ai.tool_calls if tc["id"] in answered],
+        "tool_memo": memo,
+    }
+
 async def tools_to_prompt(state):
     tmsgs = _collect_recent_tool_msgs(state.get("messages", []))
     for tm in tmsgs:
@@ -283,6 +448,8 @@ async def tools_to_prompt(state):
 async def finalize(state):
     resp = None
     for m in reversed(state.get("messages", [])):
+        if isinstance(m, HumanMessage):
+            break   # 이전 턴 답변을 재사용하지 않는다
         if isinstance(m, AIMessage) and m.content:
             resp = m.content.strip(); break
     if not resp:
@@ -290,4 +457,16 @@ async def finalize(state):
         logger.warning("=== REACT / FINAL === (empty → fallback)")
     else:
         logger.info("=== REACT / FINAL === %s", (resp[:200] + " …") if len(resp) > 200 else resp)
-    return {"response": resp}
+
+    # 추측 실행분 정리: 감정은 API 응답에 필요하므로 기다려 받고, 나머지(쓰이지 않은 회상 등)는 취소
+    key = state.get("preload_key")
+    user_emotion = state.get("user_emotion")
+    if user_emotion is None:
+        user_emotion = await preload.consume(key, "emotion", "used_late", timeout=settings.preload_emotion_wait_s)
+    preload.cancel_rest(key)
+    preload.record_usefulness(state.get("preload_injected") or [], _turn_tool_names(state.get("messages", [])))
+
+    out = {"response": resp}
+    if user_emotion is not None:
+        out["user_emotion"] = user_emotion
+    return out
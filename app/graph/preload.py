@@ -0,0 +1,138 @@
+# app/graph/preload.py
+# 적응형 선주입 정책 + 턴 단위 추측 실행(speculative) 작업 레지스트리 + 구성요소별 통계.
+# - plan_preload: 발화 길이/회상 힌트/세션 경과 턴으로 summary·recall·emotion 실행 여부를 정한다(모델 없음)
+# - 느린 구성요소는 에이전트 LLM 호출과 동시에 계속 돌고, 결과는 같은 턴의 도구/finalize가 가져간다.
+#   모델이 필요로 하지 않고 답하면 finalize에서 취소한다.
+# - asyncio.Task는 state(체크포인트 직렬화 대상)에 둘 수 없으므로 state에는 preload_key만 두고 여기 보관.
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from app.core.config import settings
+from app.services.memory import looks_like_recall
+
+log = logging.getLogger("react")
+
+COMPONENTS = ("summary", "recall", "emotion")
+# 구성요소 → 같은 목적의 도구(모델이 이 도구를 또 부르면 선주입이 쓸모없었던 것)
+COMPONENT_TOOLS = {"summary": "summarize_tool", "recall": "rag_search_tool", "emotion": "classify_emotion_tool"}
+
+class PreloadPlan(NamedTuple):
+    summary: bool
+    recall: str      # off | speculative(에이전트와 동시) | blocking(프롬프트 전에 대기)
+    emotion: bool
+
+def plan_preload(user_text: str, session_turns: int) -> PreloadPlan:
+    t = (user_text or "").strip()
+    if not settings.preload_adaptive:
+        return PreloadPlan(summary=True, recall="blocking", emotion=bool(t))
+    hint = looks_like_recall(t)
+    trivial = len(t) <= settings.preload_trivial_chars and not hint
+    if hint:
+        recall = "blocking"
+    elif len(t) >= settings.preload_recall_min_chars:
+        recall = "speculative"
+    else:
+        recall = "off"
+    return PreloadPlan(
+        summary=not trivial or session_turns == 0,   # 짧은 인사라도 세션 첫 턴이면 요약(DB 1회) 사용
+        recall=recall,
+        emotion=bool(t),
+    )
+
+# --- 통계 ---
+_stats: Dict[str, Counter] = {c: Counter() for c in COMPONENTS}
+
+def record(component: str, event: str, n: int = 1) -> None:
+    """event: started | skipped | ready(프롬프트 주입) | late | used_by_tool | used_late | cancelled | wasted | error
+    | useful(주입했고 같은 목적 도구 호출 없음) | redundant(주입했는데 모델이 같은 도구를 또 호출)"""
+    _stats.setdefault(component, Counter())[event] += n
+
+def preload_stats() -> Dict[str, Dict[str, int]]:
+    return {c: dict(cnt) for c, cnt in _stats.items()}
+
+# --- 턴 단위 미완료 작업 ---
+_pending: Dict[str, "tuple[float, Dict[str, asyncio.Task]]"] = {}
+
+def _sweep(now: float) -> None:
+    # finalize에 도달하지 못한 턴(클라이언트 끊김, 예외 등)의 작업 정리.
+    # register/take(consume)/cancel_rest마다 호출 → 레지스트리를 건드리는 요청이 있는 한 TTL 넘게 남지 않는다
+    for key in [k for k, (at, _) in _pending.items() if now - at > settings.preload_pending_ttl_s]:
+        _, tasks = _pending.pop(key)
+        for name, task in tasks.items():
+            if not task.done():
+                task.cancel()
+                record(name, "cancelled")
+
+def register(key: str, tasks: Dict[str, asyncio.Task]) -> None:
+    now = time.monotonic()
+    _sweep(now)
+    if tasks:
+        _pending[key] = (now, dict(tasks))
+
+def take(key: Optional[str], name: str) -> Optional[asyncio.Task]:
+    """미완료 작업을 꺼낸다(한 번만). 없으면 None."""
+    _sweep(time.monotonic())
+    entry = _pending.get(key or "")
+    if entry is None:
+        return None
+    task = entry[1].pop(name, None)
+    if not entry[1]:
+        _pending.pop(key, None)
+    return task
+
+async def consume(key: Optional[str], name: str, event: str, timeout: Optional[float] = None) -> Any:
+    """미완료 작업 결과를 기다려 받는다. 실패/시간 초과면 None."""
+    task = take(key, name)
+    if task is None:
+        return None
+    try:
+        result = await asyncio.wait_for(task, timeout) if timeout is not None else await task
+    except asyncio.TimeoutError:
+        record(name, "cancelled")
+        return None
+    except Exception as e:
+        log.warning("=== PRELOAD / %s failed: %s", name, e)
+        record(name, "error")
+        return None
+    record(name, event)
+    return result
+
+async def wait(key: Optional[str], name: str, timeout: Optional[float] = None) -> Any:
+    """
+    미완료 작업 결과를 기다리되 꺼내지 않는다(작업은 그대로 등록 → finalize의 consume/cancel_rest가 정리).
+    여러 곳이 같은 결과를 써야 할 때(감정: 도구 + API 응답). 실패/시간 초과면 None(시간 초과여도 작업은 계속).
+    """
+    entry = _pending.get(key or "")
+    task = entry[1].get(name) if entry is not None else None
+    if task is None:
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        return None
+    except Exception:
+        return None   # 오류 기록은 consume 쪽에서
+
+def record_usefulness(injected: Iterable[str], called_tools: Iterable[str]) -> None:
+    """프롬프트에 넣은 구성요소마다: 모델이 같은 목적 도구를 또 불렀으면 redundant, 아니면 useful."""
+    called = set(called_tools)
+    for name in injected:
+        record(name, "redundant" if COMPONENT_TOOLS.get(name) in called else "useful")
+
+def cancel_rest(key: Optional[str]) -> None:
+    """턴 종료: 아무도 가져가지 않은 작업 취소."""
+    _sweep(time.monotonic())
+    entry = _pending.pop(key or "", None)
+    if entry is None:
+        return
+    for name, task in entry[1].items():
+        if task.done():
+            if not task.cancelled():
+                task.exception()   # 'exception never retrieved' 경고 방지
+            record(name, "wasted")  # 다 계산했지만 아무도 쓰지 않음
+        else:
+            task.cancel()
+            record(name, "cancelled")
@@ -0,0 +1,149 @@
+# app/graph/prompt_budget.py
+# 토큰 예산 기반 프롬프트 구성: 역할/요약/회상/도구 결과는 섹션별 상한(토큰)으로 자르고,
+# 남은 예산 안에서 히스토리를 최신 턴부터 채운다(오래된 턴부터 압축 → 제거).
+# 인코더는 1회 로드해 재사용(app.main lifespan에서 미리 로드). 로드 실패 시 UTF-8 바이트/3 근사치로 계산
+# (한글 1음절 = 1토큰, 실제보다 크게 잡는 쪽) → 예산은 보수적으로 맞추되, 역할 프롬프트는 근사치로 자르지 않는다.
+import json
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from app.core.config import settings
+from app.graph.state import HISTORY_SUMMARY_ID, HISTORY_SUMMARY_HEADER, compact_turns
+
+log = logging.getLogger("react")
+
+# 메시지 1개당 역할/구분자 오버헤드(OpenAI chat 포맷 근사)
+_MESSAGE_OVERHEAD = 4
+
+@lru_cache(maxsize=1)
+def get_encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.prompt_tokenizer)
+    except Exception as e:
+        log.warning("=== PROMPT / tokenizer load failed (%s) → byte estimate", e)
+        return None
+
+def has_encoder() -> bool:
+    """정확한 토큰 수를 셀 수 있는지(False면 count_tokens는 근사치)."""
+    return get_encoder() is not None
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = get_encoder()
+    if enc is None:
+        return (len(text.encode("utf-8")) + 2) // 3
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int, suffix: str = " …") -> str:
+    """앞에서부터 max_tokens 토큰만 남긴다(넘칠 때만 suffix)."""
+    text = (text or "").strip()
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = get_encoder()
+    if enc is None:
+        out, used = [], 0
+        for ch in text:
+            used += len(ch.encode("utf-8"))
+            if (used + 2) // 3 > max_tokens:
+                break
+            out.append(ch)
+        return "".join(out).rstrip() + suffix
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens]).rstrip() + suffix
+
+def message_tokens(m: BaseMessage) -> int:
+    n = _MESSAGE_OVERHEAD + count_tokens(m.content if isinstance(m.content, str) else str(m.content))
+    if isinstance(m, AIMessage) and m.tool_calls:
+        n += count_tokens(json.dumps([{"name": tc["name"], "args": tc["args"]} for tc in m.tool_calls],
+                                     ensure_ascii=False))
+    return n
+
+def _split_turns(history: List[BaseMessage]) -> Tuple[Optional[BaseMessage], List[List[BaseMessage]]]:
+    """(기존 압축 요약 메시지, HumanMessage로 시작하는 턴 목록)"""
+    summary, turns = None, []
+    for m in history:
+        if m.id == HISTORY_SUMMARY_ID:
+            summary = m
+        elif isinstance(m, HumanMessage) or not turns:
+            turns.append([m])
+        else:
+            turns[-1].append(m)
+    return summary, turns
+
+def fit_history(history: List[BaseMessage], budget: int) -> List[BaseMessage]:
+    """
+    히스토리를 budget 토큰 안으로 맞춘다.
+    - 현재 턴(마지막 HumanMessage 이후: 도구 호출/결과 포함)은 항상 유지
+    - 이전 턴은 최신부터 원문으로 채우고, 안 들어가는 오래된 턴은 한 줄 요약으로 압축해
+      기존 압축 요약 메시지와 합친다(prompt_history_summary_tokens 자리, 넘치면 오래된 줄부터 제거)
+    """
+    summary, turns = _split_turns(history)
+    if not turns:
+        return [summary] if summary is not None else []
+
+    current, older = turns[-1], turns[:-1]
+    used = sum(message_tokens(m) for m in current)
+    sizes = [sum(message_tokens(m) for m in turn) for turn in older]
+    if summary is None and used + sum(sizes) <= budget:
+        return [m for turn in turns for m in turn]
+
+    # 다 못 넣으면 압축 요약 자리를 남겨 두고 원문 턴을 채운다
+    raw_budget = budget - min(settings.prompt_history_summary_tokens, budget // 4)
+    kept: List[List[BaseMessage]] = []
+    i = len(older)
+    while i > 0:
+        t = sizes[i - 1]
+        if used + t > raw_budget:
+            break
+        used += t
+        kept.insert(0, older[i - 1])
+        i -= 1
+    dropped = [m for turn in older[:i] for m in turn]
+
+    lines = [l for l in (summary.content.split("\n")[1:] if summary is not None else []) if l.strip()]
+    lines += compact_turns(dropped)
+    room = budget - used - _MESSAGE_OVERHEAD - count_tokens(HISTORY_SUMMARY_HEADER)
+    while lines and count_tokens("\n".join(lines)) > room:
+        lines.pop(0)
+
+    out: List[BaseMessage] = []
+    if lines:
+        out.append(SystemMessage(content="\n".join([HISTORY_SUMMARY_HEADER] + lines), id=HISTORY_SUMMARY_ID))
+    for turn in kept:
+        out.extend(turn)
+    out.extend(current)
+    return out
+
+def build_preload_context(summary: str, recall: str, emotion: str) -> str:
+    """선주입 컨텍스트(요약/회상/감정)를 섹션별 토큰 상한으로 구성. 비어 있으면 '없음'."""
+    lines = []
+    summary = truncate_tokens(summary, settings.prompt_summary_tokens)
+    recall = truncate_tokens(recall, settings.prompt_recall_tokens)
+    if summary: lines.append(f"- preload_summary: {summary}")
+    if recall:  lines.append(f"- preload_recall: {recall}")
+    if emotion: lines.append(f"- preload_emotion: {emotion}")
+    return "\n".join(lines) or "없음"
+
+def budget_prompt(
+    role_text: str,
+    fixed_text: str,
+    preload_context: str,
+    tool_context: str,
+    history: List[BaseMessage],
+) -> Tuple[str, str, List[BaseMessage]]:
+    """
+    우선순위: 역할 > 현재 턴 > 도구 결과 > 선주입(요약/회상, build_preload_context에서 상한 적용) > 이전 히스토리.
+    fixed_text(지침/컨트롤 힌트)는 자르지 않고 예산에서만 뺀다. 반환: (role_text, tool_context, history)
+    """
+    if has_encoder():   # 근사치로 페르소나를 자르면 봇 성격이 바뀐다 → 정확히 셀 수 있을 때만
+        role_text = truncate_tokens(role_text, settings.prompt_role_tokens)
+    tool_context = truncate_tokens(tool_context, settings.prompt_tool_tokens) or "없음"
+    used = sum(count_tokens(t) + _MESSAGE_OVERHEAD for t in (role_text, fixed_text, preload_context, tool_context))
+    history = fit_history(history, max(0, settings.prompt_token_budget - used))
+    return role_text, tool_context, history
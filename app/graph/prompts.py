@@ -1,12 +1,61 @@
 # app/graph/prompts.py
+# 프롬프트 템플릿 레지스트리: 파일은 최초 1회만 읽어 메모리에 두고,
+# prompt_reload_interval_s 간격으로만 mtime을 확인해 바뀐 파일을 다시 읽는다(핫패스는 dict 조회).
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from app.core.config import settings
+
 PROMPT_PATH = {
     "test": "app/prompt/test.txt",
+    "role": "app/prompt/test.txt",
 }
 
+class PromptRegistry:
+    def __init__(self, paths: Dict[str, str], reload_interval_s: float):
+        self._paths = paths
+        self._reload_interval_s = reload_interval_s
+        self._cache: Dict[str, Tuple[str, float, str]] = {}   # name → (path, mtime, text)
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name: str, path: str) -> str:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self._cache[name] = (path, os.path.getmtime(path), text)
+        return text
+
+    def get(self, name: str) -> str:
+        path = self._paths.get(name, self._paths["test"])
+        now = time.monotonic()
+        hit = self._cache.get(name)
+        if hit is not None and hit[0] == path:
+            if self._reload_interval_s <= 0 or now - self._checked_at.get(name, 0.0) < self._reload_interval_s:
+                return hit[2]
+        with self._lock:
+            self._checked_at[name] = now
+            hit = self._cache.get(name)
+            try:
+                if hit is not None and hit[0] == path and os.path.getmtime(path) == hit[1]:
+                    return hit[2]
+            except OSError:
+                if hit is not None:
+                    return hit[2]   # 파일이 잠시 사라진 경우(배포 중 교체 등) 마지막 내용 유지
+                raise
+            return self._load(name, path)
+
+    def reload(self) -> None:
+        """다음 조회에서 모든 템플릿을 다시 읽게 한다."""
+        with self._lock:
+            self._cache.clear()
+            self._checked_at.clear()
+
+registry = PromptRegistry(PROMPT_PATH, settings.prompt_reload_interval_s)
+
 def load_prompt_template(name: str) -> str:
     """
-    지정된 프롬프트 이름에 해당하는 txt 템플릿 로드
+    지정된 프롬프트 이름에 해당하는 txt 템플릿(레지스트리 캐시)
     """
-    path = PROMPT_PATH.get(name, PROMPT_PATH["test"])
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    return registry.get(name)
@@ -1,50 +1,198 @@
 # app/graph/runner.py
 # 그래프 인스턴스 생애주기 관리 + 에이전트 호출 편의 함수.
-from typing import Optional
-from sqlalchemy.orm import Session
+import random
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 from langchain_core.messages import HumanMessage
 
+from app.core.config import settings
 from app.graph.graph import build_agent_graph
-from app.graph.callbacks import ReactTraceCallback
-import logging
+from app.graph.callbacks import MetricsCallback, ReactTraceCallback
+from app.services.emotion_service import EmotionResult
 
-# 그래프는 체크포인터 포함으로 모듈 레벨에 1회 생성
-_graph = build_agent_graph()
+# 그래프는 app.main lifespan에서 체크포인터와 함께 1회 컴파일(그 외에는 최초 사용 시 체크포인터 없이)
+_graph = None
 
-async def run_chat_agent(
+def init_graph(checkpointer=None):
+    global _graph
+    _graph = build_agent_graph(checkpointer=checkpointer)
+    return _graph
+
+def get_graph():
+    global _graph
+    if _graph is None:
+        _graph = build_agent_graph()
+    return _graph
+
+# 최종 답변 마커. 스트리밍 시 이 접두어는 떼고 본문만 흘려보낸다.
+FINAL_MARKER = "Final:"
+
+def _agent_inputs(
     user_input: str,
     user_id: int,
-    db: Optional[Session] = None,         # 직렬화 이슈로 state에는 넣지 않음
-    session_id: Optional[str] = None,
-    force_summary: bool = False,
-    disable_preload: bool = False,
-    debug_trace: bool = False,            # ← 스트림/툴콜 트레이스 ON
-) -> str:
+    session_id: Optional[str],
+    force_summary: bool,
+    disable_preload: bool,
+    debug_trace: bool,
+):
+    """ainvoke/astream_events 공통 입력(state)과 config 구성."""
     sid = str(session_id or user_id)
 
-    # debug_trace일 때만 콜백 연결
-    callbacks = [ReactTraceCallback(logging.getLogger("react"))] if debug_trace else None
+    # 지표 콜백은 항상, ReAct 트레이스는 debug_trace 또는 trace_sample_rate 비율로 샘플링된 요청만
+    callbacks = [MetricsCallback()]
+    if debug_trace or random.random() < settings.trace_sample_rate:
+        callbacks.append(ReactTraceCallback())
 
-    out = await _graph.ainvoke(
-        {
-            "messages": [HumanMessage(content=user_input)],
+    # 체크포인터가 스레드 상태를 이어 주므로, 턴 단위 필드는 매 입력에서 비운다(히스토리만 누적).
+    inputs = {
+        "messages": [HumanMessage(content=user_input)],
+        "member_id": user_id,
+        "response": None,
+        "base_system_text": "",
+        "preload_context": "",
+        "tool_context": "",
+        "user_emotion": None,
+        "recall_query": "",
+        "recall_top_k": 0,
+        "recall_hits": None,
+        "preload_key": "",
+        "preload_injected": [],
+        "tool_memo": {},
+        "tool_pass_done": False,
+        "executed_tools": [],
+        "force_summary": force_summary,
+        "disable_preload": disable_preload,
+        "debug_trace": debug_trace,
+    }
+    config = {
+        "configurable": {"thread_id": sid},
+        "tags": ["agent", f"user:{user_id}", f"session:{sid}"],
+        "metadata": {
             "member_id": user_id,
+            "session_id": sid,
             "force_summary": force_summary,
             "disable_preload": disable_preload,
             "debug_trace": debug_trace,
         },
-        config={
-            "configurable": {"thread_id": sid},
-            "tags": ["agent", f"user:{user_id}", f"session:{sid}"],
-            "metadata": {
-                "member_id": user_id,
-                "session_id": sid,
-                "force_summary": force_summary,
-                "disable_preload": disable_preload,
-                "debug_trace": debug_trace,
-            },
-            "callbacks": callbacks,   # ← 여기서 콜백 주입
-        },
+        "callbacks": callbacks,   # ← 여기서 콜백 주입
+    }
+    return inputs, config
+
+async def run_chat_agent(
+    user_input: str,
+    user_id: int,
+    db: Optional[AsyncSession] = None,    # 직렬화 이슈로 state에는 넣지 않음
+    session_id: Optional[str] = None,
+    force_summary: bool = False,
+    disable_preload: bool = False,
+    debug_trace: bool = False,            # ← 스트림/툴콜 트레이스 ON
+) -> Tuple[str, Optional[EmotionResult]]:
+    """에이전트 1턴 실행. 반환: (최종 응답, preload/finalize에서 계산한 사용자 감정 | None)"""
+    inputs, config = _agent_inputs(
+        user_input, user_id, session_id, force_summary, disable_preload, debug_trace,
     )
-    return out.get("response", "")
+    out = await get_graph().ainvoke(inputs, config=config)
+    return out.get("response", ""), out.get("user_emotion")
+
+class _FinalTextFilter:
+    """
+    LLM 런 하나의 content 델타에서 'Final:' 접두어를 걷어내고 본문만 내보낸다.
+    - 접두어 여부가 확정될 때까지(앞 몇 글자) 버퍼링
+    - 접두어가 없으면 받은 그대로 통과
+    """
+    def __init__(self):
+        self._buf = ""
+        self._decided = False
+        self._lstrip = False   # 마커 직후 공백은 본문 첫 글자 전까지 버린다
+
+    def feed(self, text: str) -> str:
+        if not self._decided:
+            self._buf += text
+            head = self._buf.lstrip()
+            if len(head) < len(FINAL_MARKER) and FINAL_MARKER.startswith(head):
+                return ""  # 아직 판단 불가 → 대기
+            self._decided = True
+            if head.startswith(FINAL_MARKER):
+                text, self._lstrip = head[len(FINAL_MARKER):], True
+            else:
+                text = self._buf
+            self._buf = ""
+        if self._lstrip:
+            text = text.lstrip()
+            self._lstrip = not text
+        return text
+
+    def flush(self) -> str:
+        """런 종료 시 판단 보류 중이던 짧은 잔여 텍스트를 내보낸다."""
+        out, self._buf, self._decided = self._buf, "", True
+        return out
+
+async def stream_chat_agent(
+    user_input: str,
+    user_id: int,
+    session_id: Optional[str] = None,
+    force_summary: bool = False,
+    disable_preload: bool = False,
+    debug_trace: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    astream_events 기반 스트리밍 실행. 아래 형태의 이벤트 dict를 순서대로 내보낸다.
+      - {"event": "token", "text": ...}         : 에이전트 답변 본문 토큰('Final:' 제거)
+      - {"event": "tool_start", "name", "input"}: 도구 실행 시작
+      - {"event": "tool_end", "name", "output"} : 도구 실행 종료(출력은 200자 미리보기)
+      - {"event": "response", "text", "user_emotion"}: 최종 응답(저장용 원문) + 사용자 감정
+    """
+    inputs, config = _agent_inputs(
+        user_input, user_id, session_id, force_summary, disable_preload, debug_trace,
+    )
+    filters: Dict[str, _FinalTextFilter] = {}
+    response = ""
+    user_emotion: Optional[EmotionResult] = None
+
+    async for ev in get_graph().astream_events(inputs, config=config, version="v2"):
+        kind = ev.get("event")
+        node = (ev.get("metadata") or {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node == "agent":
+            chunk = ev["data"].get("chunk")
+            # 도구 호출 델타는 본문이 아니므로 흘리지 않는다.
+            if chunk is None or getattr(chunk, "tool_call_chunks", None):
+                continue
+            content = getattr(chunk, "content", None)
+            if not isinstance(content, str) or not content:
+                continue
+            text = filters.setdefault(ev["run_id"], _FinalTextFilter()).feed(content)
+            if text:
+                yield {"event": "token", "text": text}
+
+        elif kind == "on_chat_model_end" and node == "agent":
+            f = filters.pop(ev["run_id"], None)
+            text = f.flush() if f else ""
+            if text:
+                yield {"event": "token", "text": text}
+
+        elif kind == "on_tool_start":
+            yield {"event": "tool_start", "name": ev.get("name"), "input": ev["data"].get("input")}
+
+        elif kind == "on_tool_end":
+            out = ev["data"].get("output")
+            out = getattr(out, "content", out)
+            out = out if isinstance(out, str) else str(out)
+            yield {
+                "event": "tool_end",
+                "name": ev.get("name"),
+                "output": (out[:200] + " …") if len(out) > 200 else out,
+            }
+
+        elif kind == "on_chain_end" and ev.get("name") == "preload_context":
+            output = ev["data"].get("output") or {}
+            user_emotion = output.get("user_emotion") if isinstance(output, dict) else None
+
+        elif kind == "on_chain_end" and ev.get("name") == "finalize":
+            output = ev["data"].get("output") or {}
+            response = output.get("response", "") if isinstance(output, dict) else ""
+            # 감정이 에이전트와 동시에 계산된 경우 finalize에서 채워진다
+            if user_emotion is None and isinstance(output, dict):
+                user_emotion = output.get("user_emotion")
 
+    yield {"event": "response", "text": response, "user_emotion": user_emotion}
@@ -1,12 +1,70 @@
 # app/graph/state.py
-# LangGraph 상태 타입 정의. messages는 add_messages로 누적 관리.
-from typing import TypedDict, List, Optional, Annotated
-from langchain_core.messages import BaseMessage
+# LangGraph 상태 타입 정의. messages는 add_messages로 누적하되, 오래된 턴은 잘라 압축 요약으로 접는다.
+from typing import Any, Dict, TypedDict, List, Optional, Annotated
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langgraph.graph import add_messages
 
+from app.core.config import settings
+from app.services.emotion_service import EmotionResult
+
+# 잘려 나간 턴의 압축 요약을 담는 고정 id 메시지(항상 히스토리 맨 앞)
+HISTORY_SUMMARY_ID = "history-summary"
+HISTORY_SUMMARY_HEADER = "[이전 대화(압축)]"
+
+def _one_line(text: Any, n: int = 80) -> str:
+    s = " ".join(str(text or "").split())
+    if s.startswith("Final:"):
+        s = s[len("Final:"):].lstrip()
+    return (s[:n] + "…") if len(s) > n else s
+
+def compact_turns(messages: List[BaseMessage]) -> List[str]:
+    """턴(HumanMessage로 시작)마다 '사용자 발화 / 최종 답변' 한 줄로 압축(LLM 호출 없음)."""
+    lines: List[str] = []
+    user, bot = "", ""
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            if user or bot:
+                lines.append(f"- 사용자: {user} / 봇: {bot}")
+            user, bot = _one_line(m.content), ""
+        elif isinstance(m, AIMessage) and m.content:
+            bot = _one_line(m.content)
+    if user or bot:
+        lines.append(f"- 사용자: {user} / 봇: {bot}")
+    return lines
+
+def trim_turns(messages: List[BaseMessage], max_turns: int, max_chars: int) -> List[BaseMessage]:
+    """
+    최근 max_turns 턴만 원문으로 남기고, 그 이전 턴은 압축 요약 메시지(HISTORY_SUMMARY_ID)로 접는다.
+    - 자르는 경계는 HumanMessage(도구 호출/결과 쌍이 갈라지지 않음)
+    - 요약은 max_chars를 넘으면 오래된 줄부터 버린다
+    """
+    summary: Optional[BaseMessage] = None
+    body: List[BaseMessage] = []
+    for m in messages:
+        if m.id == HISTORY_SUMMARY_ID:
+            summary = m
+        else:
+            body.append(m)
+    starts = [i for i, m in enumerate(body) if isinstance(m, HumanMessage)]
+    if max_turns <= 0 or len(starts) <= max_turns:
+        return messages
+
+    cut = starts[-max_turns]
+    lines = [l for l in (summary.content.split("\n")[1:] if summary else []) if l.strip()]
+    lines += compact_turns(body[:cut])
+    while lines and sum(len(l) + 1 for l in lines) > max_chars:
+        lines.pop(0)
+    head = SystemMessage(content="\n".join([HISTORY_SUMMARY_HEADER] + lines), id=HISTORY_SUMMARY_ID)
+    return [head] + body[cut:]
+
+def add_messages_trimmed(left: List[BaseMessage], right: List[BaseMessage]) -> List[BaseMessage]:
+    """add_messages로 병합한 뒤 턴 수 상한을 적용하는 리듀서(체크포인트에 쌓이는 히스토리 상한)."""
+    merged = add_messages(left, right)
+    return trim_turns(merged, settings.checkpoint_max_turns, settings.checkpoint_summary_max_chars)
+
 class AgentState(TypedDict, total=False):
-    # 메시지 스트림(히스토리). add_messages 덕분에 자동 누적/머지.
-    messages: Annotated[List[BaseMessage], add_messages]
+    # 메시지 스트림(히스토리). 자동 누적/머지 + 최근 N턴 유지(이전 턴은 압축 요약으로).
+    messages: Annotated[List[BaseMessage], add_messages_trimmed]
 
     # 세션 식별
     member_id: int
@@ -19,6 +77,23 @@ class AgentState(TypedDict, total=False):
     preload_context: str          # 선주입 컨텍스트(요약/회상/감정)
     tool_context: str       # 도구 결과 요약(가변)
 
+    # 이번 턴 사용자 발화 감정(preload에서 1회 계산 → 도구/API 응답에서 재사용)
+    user_emotion: Optional[EmotionResult]
+
+    # 이번 턴 메모리 검색 결과(preload ↔ rag_search_tool 공유: 임베딩/Qdrant 1회)
+    recall_query: str
+    recall_top_k: int
+    recall_hits: Optional[List[Dict[str, Any]]]
+
+    # 적응형 선주입: 미완료(에이전트와 동시 실행 중) 작업 레지스트리 키, 프롬프트에 넣은 구성요소
+    preload_key: str
+    preload_injected: List[str]
+
+    # 턴 단위 도구 결과 메모(도구 이름 + 정규화 인자 → 결과). 선주입 결과로 미리 채워 중복 도구 실행 생략
+    tool_memo: Dict[str, Dict[str, str]]
+    tool_pass_done: bool    # 이번 턴 도구 1회 사용 여부(노드 간 전달되려면 state 키여야 함)
+    executed_tools: List[str]
+
     force_summary: bool
     disable_preload: bool
-    debug_trace: bool
\ No newline at end of file
+    debug_trace: bool
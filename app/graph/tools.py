@@ -1,25 +1,90 @@
 # app/graph/tools.py
+import json
 import logging
+from typing import Annotated, Any, Dict, Optional
+from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
-from sqlalchemy.orm import Session
-from app.services.emotion_service import predict_emotion
-from app.services.memory import search_memory, recall_or_general_context
+from langgraph.prebuilt import InjectedState
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.emotion_service import apredict_emotion
+from app.services.memory import (
+    MemoryHits, format_memory_hits, hits_from_state, recall_or_general_context_async,
+    retrieve_memory_hits_async, search_memory_async,
+)
 from app.services.summary import summarize_conversation
-from app.core.db import SessionLocal
+from app.core.db import AsyncSessionLocal
+from app.core.config import settings
+from app.graph.prompt_budget import truncate_tokens
+from app.graph import preload
 
 logger = logging.getLogger("react")  # 에이전트 트레이스용 로거
 
+# 도구 인자 기본값(메모 키 정규화용: 인자 생략 호출과 명시 호출을 같은 키로)
+_TOOL_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "rag_search_tool": {"top_k": 3},
+    "summarize_tool": {"limit": 20},
+}
+
+def memo_key(name: str, args: Dict[str, Any]) -> str:
+    """턴 단위 도구 결과 메모 키: 도구 이름 + 정규화 인자(주입 state 제외, 기본값 채움, 문자열 strip, 숫자 문자열 → int)."""
+    norm: Dict[str, Any] = dict(_TOOL_DEFAULTS.get(name, {}))
+    for k, v in (args or {}).items():
+        if k == "state":
+            continue
+        if isinstance(v, str):
+            v = v.strip()
+            if k in ("member_id", "top_k", "limit") and v.lstrip("-").isdigit():
+                v = int(v)
+        norm[k] = v
+    return name + ":" + json.dumps(norm, ensure_ascii=False, sort_keys=True, default=str)
+
+def _current_user_text(state: dict) -> str:
+    for m in reversed((state or {}).get("messages", []) or []):
+        if isinstance(m, HumanMessage):
+            return (m.content or "").strip()
+    return ""
+
 @tool
-def classify_emotion_tool(text: str) -> str:
+async def classify_emotion_tool(text: str, state: Annotated[dict, InjectedState]) -> str:
     """문장을 6개 감정 중 하나로 분류한다."""
     logger.info("=== REACT / ACTION-INPUT === classify_emotion_tool(text_len=%d)", len(text or ""))  # 본문은 미로그
-    label = predict_emotion(text)  # 로컬 모델 추론
+    state = state or {}
+    cached = None
+    if (text or "").strip() == _current_user_text(state):
+        # 이번 턴 사용자 발화 → preload 결과 재사용(아직 계산 중이면 그 작업을 기다린다: 같은 발화 재추론 방지)
+        cached = state.get("user_emotion") or await preload.wait(
+            state.get("preload_key"), "emotion", timeout=settings.preload_emotion_wait_s,
+        )
+    if cached:
+        label = cached["label"]
+    else:
+        label = await apredict_emotion(text)  # 로컬 모델 추론(배치, 이벤트 루프 비차단)
     out = f"emotion={label}"       # 에이전트가 파싱하기 쉬운 포맷
     logger.info("=== REACT / OBSERVATION === classify_emotion_tool -> %s", out)  # 관측치 요약
     return out
 
+def _shared_recall_hits(state: dict, query: str, member_id: int, top_k: int) -> Optional[MemoryHits]:
+    """preload가 같은 질의로 이미 검색한 히트가 있으면 재사용(임베딩/Qdrant 생략)."""
+    state = state or {}
+    if state.get("recall_hits") is None or state.get("member_id") != member_id:
+        return None
+    if (query or "").strip() != state.get("recall_query") or top_k > int(state.get("recall_top_k") or 0):
+        return None
+    return hits_from_state(state["recall_hits"])[:top_k]
+
+async def _pending_recall_hits(state: dict, query: str, member_id: int, top_k: int) -> Optional[MemoryHits]:
+    """preload가 에이전트와 동시에 돌리던 같은 질의 검색이 아직 진행 중이면 그 결과를 기다려 사용."""
+    state = state or {}
+    if state.get("member_id") != member_id:
+        return None
+    if (query or "").strip() != state.get("recall_query") or top_k > int(state.get("recall_top_k") or 0):
+        return None
+    out = await preload.consume(state.get("preload_key"), "recall", "used_by_tool",
+                                timeout=settings.preload_recall_wait_s)   # 멈춘 회상이 도구 호출을 붙잡지 않게
+    return out[1][:top_k] if out else None
+
 @tool
-def rag_search_tool(query: str, member_id: int, top_k: int = 3) -> str:
+async def rag_search_tool(query: str, member_id: int, state: Annotated[dict, InjectedState], top_k: int = 3) -> str:
     """
     member_id 필터로 유사 문맥 검색.
     '기억/지난번/그때' 등 회상 힌트가 있으면 DB 시간창 확장 회상 모드로 전환.
@@ -27,25 +92,35 @@ def rag_search_tool(query: str, member_id: int, top_k: int = 3) -> str:
     """
     logger.info("=== REACT / ACTION-INPUT === rag_search_tool(member_id=%s, top_k=%s, qlen=%d)",
                 member_id, top_k, len(query or ""))  # 본문 미로그
-    db: Session = SessionLocal()  # 도구 단위 세션
+    hits = _shared_recall_hits(state, query, member_id, top_k)
+    if hits is None:
+        hits = await _pending_recall_hits(state, query, member_id, top_k)
+    db: AsyncSession = AsyncSessionLocal()  # 도구 단위 세션
     try:
-        with db.begin():  # 읽기 트랜잭션(ROLLBACK 노이즈 방지)
-            ctx = recall_or_general_context(user_input=query, member_id=member_id, db=db, top_k=top_k)
-        snippet = (ctx[:1500] + " …") if ctx and len(ctx) > 1500 else (ctx or "")  # 토큰/로그 절약
+        if hits is None:
+            hits = await retrieve_memory_hits_async(query, top_k, member_id)  # 임베딩/검색 1회
+        async with db.begin():  # 읽기 트랜잭션(ROLLBACK 노이즈 방지)
+            ctx = await recall_or_general_context_async(
+                user_input=query, member_id=member_id, db=db, top_k=top_k, hits=hits,
+            )
+        snippet = truncate_tokens(ctx or "", settings.prompt_tool_output_tokens)  # 토큰/로그 절약
         logger.info("=== REACT / OBSERVATION === rag_search_tool -> ctx_len=%d", len(ctx or ""))
         return f"ctx_len={len(ctx or '')}\n{snippet}"
     except Exception as e:
         logger.warning("=== REACT / OBSERVATION === rag_search_tool warn: %s", e)
         try:
-            ctx = search_memory(query, top_k=top_k, member_id=member_id)  # 폴백: 벡터 검색
-            snippet = (ctx[:1500] + " …") if ctx and len(ctx) > 1500 else (ctx or "")
+            # 폴백: 이미 받은 히트가 있으면 그대로, 없으면 벡터 검색 1회
+            ctx = format_memory_hits(hits) if hits is not None else await search_memory_async(
+                query, top_k=top_k, member_id=member_id,
+            )
+            snippet = truncate_tokens(ctx or "", settings.prompt_tool_output_tokens)
             logger.info("=== REACT / OBSERVATION === rag_search_tool(fallback) -> ctx_len=%d", len(ctx or ""))
             return f"ctx_len={len(ctx or '')}\n{snippet}"
         except Exception as e2:
             logger.error("=== REACT / OBSERVATION === rag_search_tool fallback error: %s", e2)
             return f"ctx_error={e2}"
     finally:
-        db.close()  # 세션 정리
+        await db.close()  # 세션 정리
 
 @tool
 async def summarize_tool(member_id: int, limit: int = 20) -> str:
@@ -54,16 +129,16 @@ async def summarize_tool(member_id: int, limit: int = 20) -> str:
     - 내부에서 읽기 트랜잭션을 COMMIT로 종료하도록 summary 서비스가 처리.
     """
     logger.info("=== REACT / ACTION-INPUT === summarize_tool(member_id=%s, limit=%s)", member_id, limit)
-    db: Session = SessionLocal()
+    db: AsyncSession = AsyncSessionLocal()
     try:
         summary = await summarize_conversation(member_id, db, limit)  # LLM 요약 호출
         if hasattr(summary, "content"):
             summary = summary.content  # Message 타입 대비
         s = summary or ""
         logger.info("=== REACT / OBSERVATION === summarize_tool -> out_len=%d", len(s))
-        return s[:1500]  # 길이 제한(모델/로그 보호)
+        return truncate_tokens(s, settings.prompt_tool_output_tokens)  # 토큰 상한(모델/로그 보호)
     except Exception as e:
         logger.error("=== REACT / OBSERVATION === summarize_tool error: %s", e)
         return f"summary_error={e}"
     finally:
-        db.close()
+        await db.close()
@@ -1,10 +1,29 @@
 # app/main.py
 # FastAPI 앱 부트스트랩, 로깅 수준 일괄 조정(소음 억제), 라우터/테이블 초기화.
+# 원격 I/O(테이블/컬렉션/인덱스 보장, 그래프 컴파일, 감정 모델 워밍업)는 임포트 시점이 아닌
+# lifespan에서 병렬 실행하고 단계별 소요 시간을 로그로 남긴다.
 
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.api import chat, recommend
 from app.models.base import Base
-from app.core.db import engine
+from app.models.chat_log import ensure_chat_log_indexes
+from app.core.config import settings
+from app.core.client import aclose_qdrant_clients, embedding, ensure_collection_and_indexes, get_async_qdrant_client
+from app.core.metrics import register_stats
+from app.core.db import async_engine, engine
+from app.graph.callbacks import stop_trace_logging
+from app.graph.checkpoint import open_checkpointer
+from app.graph.runner import init_graph
+from app.graph.prompt_budget import get_encoder
+from app.graph.nodes import tool_memo_stats
+from app.graph.preload import preload_stats
+from app.services.memory import lexical_index, memory_writer
+from app.services.session_history import history_stats
 from dotenv import load_dotenv
 
 import logging
@@ -34,17 +53,97 @@ def configure_logging():
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 configure_logging()
+log = logging.getLogger("startup")
+
+async def _timed(name: str, coro, required: bool = False) -> None:
+    """
+    시작 단계 1개 실행 + 소요 시간 로그.
+    - required(DB 스키마, 체크포인터/그래프): 실패하면 예외를 그대로 올려 기동 중단
+      (그래프가 체크포인터 없이 조용히 만들어지면 세션 영속화가 사라진다)
+    - 그 외(Qdrant 인덱스 보장, 토크나이저, 워밍업 등): 실패해도 기동은 계속(요청 경로에서 다시 드러남)
+    """
+    t0 = time.perf_counter()
+    try:
+        await coro
+        log.info("[startup] %-16s ok   %8.1fms", name, (time.perf_counter() - t0) * 1000)
+    except Exception as e:
+        if required:
+            log.error("[startup] %-16s FAIL %8.1fms: %s", name, (time.perf_counter() - t0) * 1000, e)
+            raise
+        log.warning("[startup] %-16s FAIL %8.1fms: %s", name, (time.perf_counter() - t0) * 1000, e)
+
+async def _create_tables():
+    # 테이블 생성(프로덕션은 마이그레이션 권장) + 기존 테이블에 빠진 인덱스 추가
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_chat_log_indexes)
+
+async def _open_graph(stack: AsyncExitStack):
+    # 체크포인터(세션 상태 영속화)를 열고 그래프를 컴파일. 닫기는 shutdown에서 stack으로.
+    saver = await stack.enter_async_context(open_checkpointer())
+    await asyncio.to_thread(init_graph, saver)
 
-app = FastAPI(title="JAMJAM AI")
+async def _warmup_emotion():
+    from app.services.emotion_service import apredict_emotion
+    await apredict_emotion("안녕")
 
-# 테이블 생성(프로덕션은 마이그레이션 권장)
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    t0 = time.perf_counter()
+    stack = AsyncExitStack()
+    phases = [
+        _timed("db_schema", _create_tables(), required=True),
+        _timed("qdrant_memory", asyncio.to_thread(ensure_collection_and_indexes)),
+        _timed("qdrant_policy", asyncio.to_thread(recommend.ensure_policy_indexes)),
+        _timed("graph_compile", _open_graph(stack), required=True),
+        _timed("tokenizer", asyncio.to_thread(get_encoder)),   # tiktoken 인코딩 로드(최초 1회 다운로드될 수 있음)
+    ]
+    if recommend.policy_index is not None:
+        phases.append(_timed("policy_index", stack.enter_async_context(
+            recommend.policy_index.running(get_async_qdrant_client),
+        )))
+    if settings.policy_warm_profiles_path:
+        phases.append(_timed("policy_warmup", recommend.warm_policy_embeddings()))
+    if settings.emotion_warmup:
+        phases.append(_timed("emotion_warmup", _warmup_emotion()))
+    # 나머지 단계가 끝난 뒤 필수 단계 실패를 올린다(열린 체크포인터 등은 닫고)
+    failed = [r for r in await asyncio.gather(*phases, return_exceptions=True) if isinstance(r, BaseException)]
+    if failed:
+        await stack.aclose()
+        raise failed[0]
+    log.info("[startup] total %.1fms", (time.perf_counter() - t0) * 1000)
+
+    yield
+
+    # 큐에 남은 벡터 메모리 레코드를 모두 기록한 뒤 종료
+    await asyncio.to_thread(memory_writer.close)
+    await stack.aclose()
+    await aclose_qdrant_clients()
+    await async_engine.dispose()
+    engine.dispose()
+    stop_trace_logging()   # 큐에 남은 트레이스 기록
+
+app = FastAPI(title="JAMJAM AI", lifespan=lifespan)
 
 # 라우터
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
 app.include_router(recommend.router, prefix="/policy", tags=["Policy"])
 
+# 기존 캐시/인덱스 통계를 /metrics 게이지로(jamjam_component_stat{source, stat})
+register_stats("embedding_cache", embedding.stats)
+register_stats("session_history", history_stats)
+register_stats("policy_cache", recommend.result_cache.stats)
+register_stats("lexical_index", lexical_index.stats)
+register_stats("preload", preload_stats)
+register_stats("tool_memo", tool_memo_stats)
+if recommend.policy_index is not None:
+    register_stats("policy_index", recommend.policy_index.stats)
+
 @app.get("/")
 def root():
     return {"message": "JAMJAM AI"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus 스크랩(노드/LLM/도구/임베딩/Qdrant/DB/감정 지표 + 내부 통계)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
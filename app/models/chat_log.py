@@ -1,14 +1,30 @@
 # app/models/chat_log.py
 # 대화 로그 테이블 모델. member와 FK 관계.
-from sqlalchemy import Column, BigInteger, DateTime, Text, ForeignKey
-from datetime import datetime
+from sqlalchemy import Column, BigInteger, DateTime, Integer, Text, ForeignKey, Index
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
+# created_at은 KST 벽시계 시각(app.api.chat이 datetime.now(KST)로 기록). DATETIME 컬럼이라 읽으면 tz 없는 값
+KST = timezone(timedelta(hours=9))
+
+def as_log_time(dt: datetime) -> datetime:
+    """tz 없는 ChatLog.created_at에 기록 시간대(KST)를 붙인다. 벡터 메모리(+09:00 ISO)와 섞어 비교/정렬할 때."""
+    return dt.replace(tzinfo=KST) if dt.tzinfo is None else dt
+
+# 회상 시간창 조회(member_id = ? AND created_at BETWEEN ...)용 복합 인덱스
+RECALL_INDEX = Index("ix_chat_log_member_created", "member_id", "created_at")
+
+def ensure_chat_log_indexes(conn) -> None:
+    """기존 chat_log 테이블에도 회상 인덱스를 만든다(create_all은 이미 있는 테이블을 건너뜀). 멱등."""
+    RECALL_INDEX.create(conn, checkfirst=True)
+
 class ChatLog(Base):
     __tablename__ = "chat_log"
+    __table_args__ = (RECALL_INDEX,)
 
-    chat_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # SQLite(로컬/벤치)는 INTEGER PRIMARY KEY만 자동 증가 → 방언별 타입
+    chat_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
     member_id = Column(BigInteger, ForeignKey("member.member_id", ondelete="CASCADE", onupdate="RESTRICT"), nullable=False, index=True)
     user_text = Column(Text, nullable=False)
     bot_text = Column(Text, nullable=False)
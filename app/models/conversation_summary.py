@@ -0,0 +1,16 @@
+# app/models/conversation_summary.py
+# 회원별 누적(rolling) 대화 요약 캐시. last_chat_id까지의 대화가 summary에 반영되어 있다.
+from sqlalchemy import Column, BigInteger, DateTime, Text, ForeignKey
+from datetime import datetime
+from app.models.base import Base
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summary"
+
+    member_id = Column(BigInteger, ForeignKey("member.member_id", ondelete="CASCADE", onupdate="RESTRICT"), primary_key=True)
+    last_chat_id = Column(BigInteger, nullable=False, default=0)   # 요약에 반영된 마지막 chat_log.chat_id
+    summary = Column(Text, nullable=False, default="")
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ConversationSummary(member_id={self.member_id}, last_chat_id={self.last_chat_id})>"
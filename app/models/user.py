@@ -8,7 +8,7 @@ from app.models.base import Base
 class User(Base):
     __tablename__ = "member"
 
-    member_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    member_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)   # SQLite 자동 증가 대응
     provider = Column(Integer, nullable=False)  # 1=KAKAO, 2=GOOGLE
     provider_user_id = Column(String(191), nullable=False)
     nickname = Column(String(50), nullable=True)
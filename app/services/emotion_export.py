@@ -0,0 +1,120 @@
+# app/services/emotion_export.py
+# 감정 분류 모델(torch) → ONNX 변환 + (선택) int8 동적 양자화 + torch 대비 라벨 일치 검사.
+#   python -m app.services.emotion_export                 # model.onnx 생성 + 검사
+#   python -m app.services.emotion_export --quantize      # model.int8.onnx 까지 생성 + 검사
+#   python -m app.services.emotion_export --check-only    # 기존 산출물 검사만
+import argparse
+import inspect
+import os
+import sys
+from typing import List, Optional, Tuple
+
+from transformers import AutoTokenizer
+
+from app.services.emotion_service import (
+    MODEL_PATH, ONNX_FILE, ONNX_INT8_FILE, load_backend, predict_labels,
+)
+
+# 패리티 검사 기본 샘플(아이와의 대화에서 흔한 감정 표현)
+SAMPLE_TEXTS: List[str] = [
+    "오늘 회사에서 너무 화가 났어",
+    "내일 발표가 있어서 걱정돼",
+    "요즘 너무 외롭고 슬퍼",
+    "그냥 평범한 하루였어",
+    "갑자기 그런 말을 들어서 당황했어",
+    "아이가 처음으로 걸었어! 너무 기뻐",
+    "밥은 먹었어?",
+    "잠이 안 와서 불안해",
+    "왜 내 말을 안 들어주는 거야",
+    "주말에 같이 놀이공원 가자",
+    "비가 와서 좀 우울하네",
+    "선물 받아서 정말 행복해",
+]
+
+def export_onnx(model_path: str = MODEL_PATH, quantize: bool = False) -> List[str]:
+    """torch 모델을 model.onnx로 내보내고, quantize면 model.int8.onnx도 만든다."""
+    import torch
+    from transformers import RobertaForSequenceClassification
+
+    tok = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = RobertaForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+    model.eval()
+
+    fp32 = os.path.join(model_path, ONNX_FILE)
+    dummy = tok(["감정 분류 더미 입력", "짧은 문장"], return_tensors="pt", padding=True)
+    # torch>=2.5는 dynamo 인자를 받고 최신 버전은 기본값이 True(다른 경로) → 기존 TorchScript 경로로 고정.
+    # 그보다 오래된 torch는 인자 자체가 없다(TypeError) → 넘기지 않는다.
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"]),
+        fp32,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "seq"},
+            "attention_mask": {0: "batch", 1: "seq"},
+            "logits": {0: "batch"},
+        },
+        opset_version=17,
+        do_constant_folding=True,
+        **extra,
+    )
+    written = [fp32]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8 = os.path.join(model_path, ONNX_INT8_FILE)
+        quantize_dynamic(fp32, int8, weight_type=QuantType.QInt8)
+        written.append(int8)
+    return written
+
+def check_parity(
+    model_path: str = MODEL_PATH,
+    quantized: bool = False,
+    texts: Optional[List[str]] = None,
+) -> Tuple[int, int, List[Tuple[str, str, str]]]:
+    """
+    torch와 onnx 백엔드 라벨(_id2label) 비교.
+    반환: (일치 수, 전체 수, [(문장, torch 라벨, onnx 라벨) 불일치 목록])
+    """
+    texts = texts or SAMPLE_TEXTS
+    tok = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    ref = predict_labels(tok, load_backend("torch", model_path), texts)
+    got = predict_labels(tok, load_backend("onnx", model_path, quantized=quantized), texts)
+    mismatches = [(t, a, b) for t, a, b in zip(texts, ref, got) if a != b]
+    return len(texts) - len(mismatches), len(texts), mismatches
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="emotion model → ONNX export / parity check")
+    ap.add_argument("--model-path", default=MODEL_PATH)
+    ap.add_argument("--quantize", action="store_true", help="int8 동적 양자화 모델도 생성/검사")
+    ap.add_argument("--check-only", action="store_true", help="변환 없이 기존 산출물만 검사")
+    ap.add_argument("--samples", help="검사용 문장 파일(한 줄에 한 문장)")
+    ap.add_argument("--min-agree", type=float, default=1.0, help="fp32 통과 기준 일치율(0~1)")
+    # int8은 경계 근처 문장에서 라벨이 갈릴 수 있다: 기본 샘플 12개 중 1개 불일치(91.7%)까지 허용
+    ap.add_argument("--min-agree-int8", type=float, default=0.9, help="int8 통과 기준 일치율(0~1)")
+    args = ap.parse_args(argv)
+
+    if not args.check_only:
+        for path in export_onnx(args.model_path, quantize=args.quantize):
+            print(f"[export] wrote {path}")
+
+    texts = None
+    if args.samples:
+        with open(args.samples, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    ok = True
+    for quantized in ([False, True] if args.quantize else [False]):
+        name = ONNX_INT8_FILE if quantized else ONNX_FILE
+        agree, total, mismatches = check_parity(args.model_path, quantized=quantized, texts=texts)
+        rate = agree / total if total else 1.0
+        print(f"[parity] {name}: {agree}/{total} labels match torch ({rate:.1%})")
+        for text, a, b in mismatches:
+            print(f"  - {text!r}: torch={a} onnx={b}")
+        ok = ok and rate >= (args.min_agree_int8 if quantized else args.min_agree)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,78 @@
 # app/services/emotion_service.py
+# 로컬 RoBERTa 감정 분류. 동시 요청의 텍스트를 큐에 모아 패딩 배치로 한 번에 추론(마이크로배칭).
+# 백엔드: torch(기본) | onnx(ONNX Runtime, 선택적으로 int8 동적 양자화 모델) — settings.emotion_backend
+import asyncio
+import logging
+import os
+import queue
 import threading
-import torch
-from transformers import AutoTokenizer, RobertaForSequenceClassification
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple, TypedDict
 
-MODEL_PATH = "/app/best_model"
+import numpy as np
+
+from app.core import metrics
+from app.core.config import client_factory, settings
+
+MODEL_PATH = settings.emotion_model_path
+
+# ONNX 산출물은 best_model 폴더 안(가중치 옆)에 둔다 → 볼륨 마운트 시에도 유지
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
 
 _id2label = {0:"분노", 1:"불안", 2:"슬픔", 3:"평온", 4:"당황", 5:"기쁨"}
 
+log = logging.getLogger("emotion")
+
+class EmotionResult(TypedDict):
+    """감정 분류 결과: 라벨 + softmax 확신도 + 원시 logits(_id2label 순서)."""
+    label: str
+    confidence: float
+    logits: List[float]
+
+class _TorchBackend:
+    """PyTorch RobertaForSequenceClassification (full precision)."""
+    return_tensors = "pt"
+
+    def __init__(self, path: str):
+        import torch
+        from transformers import RobertaForSequenceClassification
+        self._torch = torch
+        self.model = RobertaForSequenceClassification.from_pretrained(path, local_files_only=True)
+        # if torch.cuda.is_available(): self.model.to("cuda")
+        self.model.eval()
+
+    def logits(self, inputs) -> np.ndarray:
+        # if self.model.device.type == "cuda": inputs = {k: v.to("cuda") for k, v in inputs.items()}
+        with self._torch.no_grad():
+            return self.model(**inputs).logits.cpu().numpy()
+
+class _OnnxBackend:
+    """ONNX Runtime CPU 세션. torch 모델 가중치를 올리지 않아 메모리/지연이 작다."""
+    return_tensors = "np"
+
+    def __init__(self, path: str, quantized: bool = False):
+        import onnxruntime as ort
+        file = os.path.join(path, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not os.path.exists(file):
+            raise FileNotFoundError(
+                f"{file} 없음 → `python -m app.services.emotion_export{' --quantize' if quantized else ''}`로 먼저 변환"
+            )
+        self.session = ort.InferenceSession(file, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self.session.get_inputs()]
+
+    def logits(self, inputs) -> np.ndarray:
+        feed = {k: np.asarray(inputs[k], dtype=np.int64) for k in self._input_names if k in inputs}
+        return self.session.run(None, feed)[0]
+
+def load_backend(backend: str, path: str = MODEL_PATH, quantized: bool = False):
+    if backend == "torch":
+        return _TorchBackend(path)
+    if backend == "onnx":
+        return _OnnxBackend(path, quantized=quantized)
+    raise ValueError(f"unknown emotion backend: {backend}")
+
 # lazy-load 대상 (임포트 시점에는 None)
 _tokenizer = None
 _model = None
@@ -18,18 +84,124 @@ def _ensure_loaded():
         return
     with _lock:  # 동시 초기화 방지
         if _tokenizer is None or _model is None:
+            make = getattr(client_factory(), "emotion_model", None)   # 벤치/테스트 대역
+            if make is not None:
+                _tokenizer, _model = make()
+                return
+            from transformers import AutoTokenizer
             tok = AutoTokenizer.from_pretrained(MODEL_PATH, local_files_only=True)
-            mdl = RobertaForSequenceClassification.from_pretrained(MODEL_PATH, local_files_only=True)
-            # if torch.cuda.is_available(): mdl.to("cuda")
-            mdl.eval()
+            mdl = load_backend(settings.emotion_backend, MODEL_PATH, quantized=settings.emotion_onnx_quantized)
             _tokenizer, _model = tok, mdl
 
-def predict_emotion(text: str) -> str:
-    """요청마다 감정 추론 (모델은 최초 1회만 로드)"""
+def predict_results(tokenizer, backend, texts: List[str]) -> List[EmotionResult]:
+    """주어진 토크나이저/백엔드로 패딩 배치 1회 forward → 라벨/확신도/logits."""
+    inputs = tokenizer(texts, return_tensors=backend.return_tensors, truncation=True, padding=True)
+    logits = np.asarray(backend.logits(inputs), dtype=np.float64)
+    probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probs /= probs.sum(axis=-1, keepdims=True)
+    out: List[EmotionResult] = []
+    for row, p in zip(logits, probs):
+        i = int(np.argmax(row))
+        out.append({"label": _id2label[i], "confidence": float(p[i]), "logits": row.tolist()})
+    return out
+
+def predict_labels(tokenizer, backend, texts: List[str]) -> List[str]:
+    """predict_results의 라벨만."""
+    return [r["label"] for r in predict_results(tokenizer, backend, texts)]
+
+def _predict_batch(texts: List[str]) -> List[EmotionResult]:
+    """텍스트 묶음을 패딩 배치 1회 forward로 분류."""
     _ensure_loaded()
-    inputs = _tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    # if _model.device.type == "cuda": inputs = {k: v.to("cuda") for k, v in inputs.items()}
-    with torch.no_grad():
-        logits = _model(**inputs).logits
-        pred_id = torch.argmax(logits, dim=-1).item()
-    return _id2label[pred_id]
+    return predict_results(_tokenizer, _model, texts)
+
+class EmotionBatcher:
+    """
+    감정 추론 마이크로배처.
+    - submit()으로 들어온 텍스트를 큐에 쌓고, 백그라운드 워커 스레드가
+      max_batch_size개가 모이거나 max_wait_ms가 지나면 한 번에 추론한다.
+    - 같은 배치 안의 동일 텍스트는 한 번만 계산한다.
+    - 결과는 concurrent.futures.Future로 돌려주므로 동기/비동기 양쪽에서 기다릴 수 있다.
+    """
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]  # 첫 항목은 무기한 대기
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # 실행 상태로 전환: 이후에는 대기 측 취소(wrap_future)가 Future를 바꾸지 못한다. 이미 취소된 요청은 건너뜀
+            batch = [(text, fut) for text, fut in self._collect() if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            uniq = list(dict.fromkeys(text for text, _ in batch))
+            metrics.EMOTION_BATCH_SIZE.observe(len(uniq))
+            try:
+                with metrics.EMOTION_SECONDS.labels(settings.emotion_backend).time():
+                    results = dict(zip(uniq, _predict_batch(uniq)))
+            except Exception as e:
+                log.warning("[emotion] batch(%d) predict warn: %s", len(batch), e)
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for text, fut in batch:
+                fut.set_result(results[text])
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def predict(self, text: str) -> EmotionResult:
+        return self.submit(text).result()
+
+    async def apredict(self, text: str) -> EmotionResult:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def predict_many(self, texts: List[str]) -> List[EmotionResult]:
+        futs = [self.submit(t) for t in texts]
+        return [f.result() for f in futs]
+
+batcher = EmotionBatcher(
+    max_batch_size=settings.emotion_batch_max_size,
+    max_wait_ms=settings.emotion_batch_max_wait_ms,
+)
+
+def predict_emotion(text: str) -> str:
+    """감정 추론(동기). 동시 요청과 함께 배치로 묶여 처리된다."""
+    return batcher.predict(text)["label"]
+
+async def apredict_emotion(text: str) -> str:
+    """감정 추론(비동기). 이벤트 루프를 막지 않고 배치 결과를 기다린다."""
+    return (await batcher.apredict(text))["label"]
+
+async def apredict_emotion_result(text: str) -> EmotionResult:
+    """apredict_emotion + 확신도/logits."""
+    return await batcher.apredict(text)
+
+def predict_emotions(texts: List[str]) -> List[str]:
+    """여러 문장을 한 번에 분류. 입력 순서대로 라벨을 반환."""
+    if not texts:
+        return []
+    return [r["label"] for r in batcher.predict_many(list(texts))]
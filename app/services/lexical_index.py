@@ -0,0 +1,178 @@
+# app/services/lexical_index.py
+# 회원별 BM25 역색인(ChatLog user_text/bot_text). 벡터 검색이 놓치는 이름/장소/날짜를 어휘 일치로 보완.
+# - 한국어 토큰화: 조사 떼기 + 음절 bigram(복합어/활용형 부분 일치), 숫자+단위(3월, 5살 등)는 한 토큰
+# - 회원 색인은 최초 검색 때 DB에서 적재(최신 max_docs행), 이후 대화 저장마다 증분 추가(add)
+# - 메모리 상한: 회원 수 LRU + 회원당 문서 수(오래된 문서부터 제거)
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat_log import ChatLog, as_log_time
+
+_TOKEN_RE = re.compile(r"\d+(?:월|일|시|분|살|년|개|번|학년)?|[가-힣]+|[a-z]+")
+# 긴 조사부터 떼어낸다(어간이 1글자 이상 남을 때만)
+_JOSA = sorted([
+    "이랑", "랑", "하고", "한테서", "한테", "에게서", "에게", "께서", "께", "에서", "에는", "에도", "에",
+    "으로", "로", "와", "과", "은", "는", "이", "가", "을", "를", "의", "도", "만", "까지", "부터",
+    "처럼", "보다", "이나", "나", "이야", "야", "아",
+], key=len, reverse=True)
+_JOSA_SET = frozenset(_JOSA)
+
+def tokenize(text: Any) -> List[str]:
+    t = unicodedata.normalize("NFC", str(text or "")).lower()
+    out: List[str] = []
+    for w in _TOKEN_RE.findall(t):
+        if not ("가" <= w[0] <= "힣"):
+            out.append(w)
+            continue
+        if w in _JOSA_SET:
+            continue   # 숫자 토큰 뒤에 떨어져 나온 조사 등
+        stem = w
+        for j in _JOSA:
+            if len(w) > len(j) and w.endswith(j):
+                stem = w[: -len(j)]
+                break
+        out.append(stem)
+        if len(stem) > 2:
+            out.extend(stem[i:i + 2] for i in range(len(stem) - 1))
+    return out
+
+# 문서 키: (chat_id, role) — 벡터 메모리 point와 같은 단위(대화 1행 = user/bot 2문서)
+DocKey = Tuple[int, str]
+
+class MemberIndex:
+    """회원 1명의 BM25 색인(문서 수 상한, 오래된 문서부터 제거)."""
+
+    def __init__(self, max_docs: int, k1: float = 1.2, b: float = 0.75):
+        self.max_docs = max_docs
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[DocKey, Tuple[str, datetime, Counter, int]] = {}   # key → (text, created_at, tf, len)
+        self.order: "deque[DocKey]" = deque()
+        self.postings: Dict[str, Dict[DocKey, int]] = {}
+        self.total_len = 0
+
+    def add(self, key: DocKey, text: str, created_at: datetime) -> None:
+        if key in self.docs or not text:
+            return
+        tf = Counter(tokenize(text))
+        n = sum(tf.values())
+        self.docs[key] = (text, created_at, tf, n)
+        self.order.append(key)
+        self.total_len += n
+        for term, c in tf.items():
+            self.postings.setdefault(term, {})[key] = c
+        while self.max_docs > 0 and len(self.docs) > self.max_docs:
+            self._remove(self.order.popleft())
+
+    def _remove(self, key: DocKey) -> None:
+        _, _, tf, n = self.docs.pop(key)
+        self.total_len -= n
+        for term in tf:
+            p = self.postings.get(term)
+            if p is not None:
+                p.pop(key, None)
+                if not p:
+                    del self.postings[term]
+
+    def search(self, query: str, top_k: int) -> List[Tuple[DocKey, float]]:
+        n_docs = len(self.docs)
+        if not n_docs:
+            return []
+        avgdl = self.total_len / n_docs or 1.0
+        scores: Dict[DocKey, float] = {}
+        for term in set(tokenize(query)):
+            p = self.postings.get(term)
+            if not p:
+                continue
+            idf = math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+            for key, c in p.items():
+                dl = self.docs[key][3]
+                denom = c + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                scores[key] = scores.get(key, 0.0) + idf * c * (self.k1 + 1) / denom
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+
+    def doc(self, key: DocKey) -> Tuple[str, datetime]:
+        text, created_at, _, _ = self.docs[key]
+        return text, created_at
+
+class LexicalIndex:
+    """회원별 MemberIndex의 LRU. 적재 중 들어온 add는 보류했다가 적재 직후 반영."""
+
+    def __init__(self, max_members: int, max_docs: int):
+        self.max_members = max_members
+        self.max_docs = max_docs
+        self._members: "OrderedDict[int, MemberIndex]" = OrderedDict()
+        self._loading: Dict[int, List[Tuple[DocKey, str, datetime]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, member_id: int, chat_id: Optional[int], role: str, text: str, created_at: datetime) -> None:
+        """대화 저장 시 증분 반영. 아직 적재 안 된 회원은 무시(다음 적재 때 DB에서 읽힘)."""
+        if chat_id is None:
+            return
+        item = ((int(chat_id), role), text, created_at)
+        with self._lock:
+            idx = self._members.get(member_id)
+            if idx is not None:
+                idx.add(*item)
+            elif member_id in self._loading:
+                self._loading[member_id].append(item)
+
+    async def _load(self, member_id: int, db: AsyncSession) -> MemberIndex:
+        rows = (await db.execute(
+            select(ChatLog.chat_id, ChatLog.user_text, ChatLog.bot_text, ChatLog.created_at)
+            .where(ChatLog.member_id == member_id)
+            .order_by(ChatLog.chat_id.desc())
+            .limit(max(1, self.max_docs // 2))
+        )).all()
+        idx = MemberIndex(self.max_docs)
+        for chat_id, user_text, bot_text, created_at in reversed(rows):
+            created_at = as_log_time(created_at)   # 증분 add(tz 있음)와 같은 형태로
+            idx.add((chat_id, "user"), user_text or "", created_at)
+            idx.add((chat_id, "bot"), bot_text or "", created_at)
+        return idx
+
+    async def get(self, member_id: int, db: AsyncSession) -> MemberIndex:
+        with self._lock:
+            idx = self._members.get(member_id)
+            if idx is not None:
+                self._members.move_to_end(member_id)
+                return idx
+            self._loading.setdefault(member_id, [])
+        try:
+            idx = await self._load(member_id, db)
+        except BaseException:
+            with self._lock:
+                self._loading.pop(member_id, None)
+            raise
+        with self._lock:
+            current = self._members.get(member_id)
+            if current is not None:       # 동시 적재가 먼저 끝난 경우
+                return current
+            for item in self._loading.pop(member_id, []):
+                idx.add(*item)
+            self._members[member_id] = idx
+            while self.max_members > 0 and len(self._members) > self.max_members:
+                self._members.popitem(last=False)
+            return idx
+
+    async def search(self, member_id: int, query: str, top_k: int, db: AsyncSession) -> List[Tuple[DocKey, str, datetime, float]]:
+        """(문서 키, 본문, 작성 시각, BM25 점수) 상위 top_k."""
+        idx = await self.get(member_id, db)
+        with self._lock:
+            return [(key, *idx.doc(key), score) for key, score in idx.search(query, top_k)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "members": len(self._members),
+                "docs": sum(len(i.docs) for i in self._members.values()),
+                "terms": sum(len(i.postings) for i in self._members.values()),
+            }
@@ -0,0 +1,63 @@
+# app/services/member_profile.py
+# 회원 프로필(성별 → 호칭) 캐시. 프롬프트 구성 때마다 User를 조회하지 않도록 TTL + LRU로 보관.
+# 이 서비스에는 프로필 수정 경로가 없다(member 테이블은 다른 서비스가 갱신) → 성별 변경은
+# 최대 member_profile_ttl_s 동안 이전 호칭으로 보일 수 있다. 즉시 반영이 필요하면 TTL을 줄이거나 0(캐시 끔).
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.user import User
+
+log = logging.getLogger("profile")
+
+_cache: "OrderedDict[int, Tuple[float, int]]" = OrderedDict()   # member_id → (만료 시각, gender)
+_lock = threading.Lock()
+
+def _cached_gender(member_id: int) -> Optional[int]:
+    with _lock:
+        hit = _cache.get(member_id)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _cache[member_id]
+            return None
+        _cache.move_to_end(member_id)
+        return hit[1]
+
+def _remember(member_id: int, gender: int) -> None:
+    if settings.member_profile_ttl_s <= 0 or settings.member_profile_cache_size <= 0:
+        return
+    with _lock:
+        _cache[member_id] = (time.monotonic() + settings.member_profile_ttl_s, gender)
+        _cache.move_to_end(member_id)
+        while len(_cache) > settings.member_profile_cache_size:
+            _cache.popitem(last=False)
+
+async def get_member_gender(member_id: Optional[int]) -> int:
+    """
+    사용자 성별(캐시 우선).
+    반환: 0 또는 None=미지정, 1=남성, 2=여성. 조회 실패는 캐시하지 않는다.
+    """
+    if not member_id:
+        return 0
+    g = _cached_gender(member_id)
+    if g is not None:
+        metrics.CACHE_REQUESTS.labels("member_profile", "hit").inc()
+        return g
+    metrics.CACHE_REQUESTS.labels("member_profile", "miss").inc()
+    try:
+        async with AsyncSessionLocal() as db:
+            raw = await db.scalar(select(User.gender).where(User.member_id == member_id))
+    except Exception as e:
+        log.warning("=== PROFILE / gender fetch warn: %s", e)
+        return 0
+    g = int(raw) if raw is not None else 0
+    _remember(member_id, g)
+    return g
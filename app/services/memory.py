@@ -1,29 +1,39 @@
 # app/services/memory.py
-# (a) 인메모리 히스토리 for RunnableWithMessageHistory, (b) Qdrant 벡터 메모리 저장/검색, (c) "회상 모드": 유사 시점 주변 DB 대화창 확장.
+# (a) 세션 히스토리 for RunnableWithMessageHistory(상한 있는 저장소), (b) Qdrant 벡터 메모리 저장/검색, (c) "회상 모드": 유사 시점 주변 DB 대화창 확장.
+# (b) 저장은 write-behind: 큐에 모아 배치 임베딩 + 일괄 upsert(결정적 point id → 재시도 멱등).
+# (b') 검색은 비동기 경로 하나: 벡터 + 회원별 BM25(lexical_index)를 RRF로 합친 하이브리드.
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain.schema import BaseMessage
+from langchain_core.documents import Document
 
-from sqlalchemy.orm import Session
-from app.core.client import vectorstore
-from app.models.chat_log import ChatLog
+from sqlalchemy import and_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import metrics
+from app.core.client import embedding, get_vectorstore, get_qdrant_client, get_async_qdrant_client
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.chat_log import ChatLog, as_log_time
+from app.services.session_history import get_history_store
+from app.services.lexical_index import LexicalIndex
 
 # ★ 추가: Qdrant 필터 모델 사용
 from qdrant_client.http import models as qmodels
 
-_store: Dict[str, ChatMessageHistory] = {}
-
 def get_user_history(session_id: str) -> BaseChatMessageHistory:
-    key = str(session_id)
-    if key not in _store:
-        _store[key] = ChatMessageHistory()
-    return _store[key]
+    # 세션 수/유휴 TTL/메시지 수 상한이 있는 저장소(app.services.session_history)
+    return get_history_store().get(str(session_id))
 
 def _ensure_utc(dt: datetime) -> datetime:
     if dt.tzinfo is None:
@@ -44,6 +54,140 @@ def _to_text(value: Any) -> str:
         return value
     return str(value)
 
+log = logging.getLogger("memory")
+
+# 결정적 point id 네임스페이스: (member_id, chat_id, role)이 같으면 같은 id → 재시도/중복 저장이 덮어쓰기
+_POINT_NS = uuid.UUID("6f0c4f1e-5c1b-4c59-9a52-0d7c1e8a7b3d")
+
+def _point_id(member_id: int, chat_id: Optional[int], role: str) -> str:
+    if chat_id is None:
+        return str(uuid.uuid4())
+    return str(uuid.uuid5(_POINT_NS, f"{member_id}:{chat_id}:{role}"))
+
+# client._ensure_collection_and_indexes가 최상위 payload 인덱스를 거는 필드
+_INDEXED_KEYS = ("member_id", "role", "created_at")
+
+# (point_id, text, metadata)
+_MemoryRecord = Tuple[str, str, Dict[str, Any]]
+
+class MemoryWriter:
+    """
+    벡터 메모리 write-behind 작성기.
+    - enqueue()는 즉시 반환. 워커 스레드가 batch_size개 또는 flush_ms마다 모아
+      embedding.embed_documents 1회 + qdrant upsert 1회로 저장한다.
+    - point id가 결정적이라 실패 재시도/중복 enqueue가 같은 점을 덮어쓴다(멱등).
+    - close()는 남은 큐를 모두 비운 뒤 종료(앱 shutdown에서 호출).
+    """
+    def __init__(self, batch_size: int = 32, flush_ms: float = 200.0, max_retries: int = 3):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_ms)) / 1000.0
+        self.max_retries = max(0, int(max_retries))
+        self._queue: "queue.Queue[Optional[_MemoryRecord]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                self._worker.start()
+
+    def enqueue(
+        self,
+        member_id: int,
+        text: str,
+        role: str,
+        chat_id: Optional[int],
+        created_at: datetime,
+    ) -> None:
+        # member_id를 문자열로 저장 (KEYWORD 인덱스와 호환)
+        meta = {
+            "member_id": str(member_id),
+            "role": role,
+            "created_at": created_at.isoformat(),
+            "chat_id": chat_id,
+        }
+        self._ensure_worker()
+        self._queue.put((_point_id(member_id, chat_id, role), text, meta))
+
+    def _write(self, records: List[_MemoryRecord]) -> None:
+        vectors = embedding.embed_documents([text for _, text, _ in records])
+        points = [
+            qmodels.PointStruct(
+                id=pid,
+                vector=vec,
+                # langchain Qdrant 벡터스토어와 같은 payload 구조 → 기존 검색 경로 그대로 사용
+                # + 필터/인덱스 대상 필드(member_id/role/created_at)는 최상위에도 둔다(_member_filter는 최상위/metadata 둘 다 봄)
+                payload={
+                    get_vectorstore().content_payload_key: text,
+                    get_vectorstore().metadata_payload_key: meta,
+                    **{k: meta[k] for k in _INDEXED_KEYS},
+                },
+            )
+            for (pid, text, meta), vec in zip(records, vectors)
+        ]
+        with metrics.QDRANT_SECONDS.labels("memory_upsert").time():
+            get_qdrant_client().upsert(collection_name=settings.collection_name, points=points)
+
+    def _write_with_retry(self, records: List[_MemoryRecord]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(records)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    log.warning("[memory] drop %d records after %d tries: %s", len(records), attempt + 1, e)
+                    return
+                time.sleep(min(2.0, 0.2 * (2 ** attempt)))
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch: List[_MemoryRecord] = []
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write_with_retry(batch)
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """남은 레코드를 모두 기록하고 워커 종료. timeout 안에 못 끝내면 남은 레코드 수를 경고로 남긴다."""
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        self._queue.put(None)
+        worker.join(timeout)
+        if worker.is_alive():
+            # 아직 쓰는 중 → _worker를 그대로 둬야 이후 enqueue가 두 번째 워커를 띄우지 않는다
+            log.warning("[memory] close timed out after %ss: in-flight batch + ~%d queued records dropped at exit",
+                        timeout, self._queue.qsize())
+            return
+        # close 이후 enqueue가 오면 새 워커가 다시 뜬다
+        with self._start_lock:
+            if self._worker is worker:
+                self._worker = None
+
+memory_writer = MemoryWriter(
+    batch_size=settings.memory_write_batch_size,
+    flush_ms=settings.memory_write_flush_ms,
+    max_retries=settings.memory_write_max_retries,
+)
+
 def add_chat_memory(
     member_id: int,
     text: Any,
@@ -51,123 +195,275 @@ def add_chat_memory(
     chat_id: Optional[int] = None,
     created_at: Optional[datetime] = None,
 ) -> None:
+    """벡터 메모리 저장 요청(비차단). 실제 임베딩/upsert는 memory_writer가 배치로 처리."""
     text_str = _to_text(text).strip()
     if not text_str:
         return
     created_utc = _ensure_utc(created_at) if created_at else datetime.now(timezone.utc)
+    memory_writer.enqueue(member_id, text_str, role, chat_id, created_utc)
+    # 어휘 색인은 즉시 반영(적재된 회원만). 시각은 ChatLog와 같은 값(회상 시간창 기준과 일치)
+    lexical_index.add(member_id, chat_id, role, text_str, created_at or created_utc)
 
-    # member_id를 문자열로 저장 (KEYWORD 인덱스와 호환)
-    vectorstore.add_texts(
-        texts=[text_str],
-        metadatas=[{
-            "member_id": str(member_id),
-            "role": role,
-            "created_at": created_utc.isoformat(),
-            "chat_id": chat_id,
-        }],
-    )
+# 회원 필터 키: write-behind 작성기(MemoryWriter)는 최상위 member_id를 쓰지만,
+# 그 전에 벡터스토어(add_texts)로 저장된 점은 metadata.member_id에만 있다 → 둘 중 하나만 맞으면 통과(should)
+_MEMBER_KEYS = ("member_id", "metadata.member_id")
 
 def _member_filter(member_id: Optional[int]) -> Optional[qmodels.Filter]:
     if member_id is None:
         return None
     return qmodels.Filter(
-        must=[qmodels.FieldCondition(
-            key="member_id",
-            match=qmodels.MatchValue(value=str(member_id))
-        )]
+        should=[
+            qmodels.FieldCondition(key=key, match=qmodels.MatchValue(value=str(member_id)))
+            for key in _MEMBER_KEYS
+        ]
     )
 
-def search_memory(query: str, top_k: int = 3, member_id: Optional[int] = None) -> str:
-    query_str = _to_text(query)
+# (문서, 점수) 목록. 한 턴 안에서 preload/도구가 같은 히트를 공유할 수 있게 state에는 dict로 보관.
+MemoryHits = List[Tuple[Document, float]]
+
+def _doc_from_point(point) -> Document:
+    """Qdrant ScoredPoint → langchain Document(벡터스토어와 같은 payload 키 사용)."""
+    payload = point.payload or {}
+    return Document(
+        page_content=payload.get(get_vectorstore().content_payload_key) or "",
+        metadata=payload.get(get_vectorstore().metadata_payload_key) or {},
+    )
+
+async def search_memory_hits_async(
+    query_vector: List[float],
+    top_k: int = 3,
+    member_id: Optional[int] = None,
+) -> MemoryHits:
+    """미리 계산한 벡터로 1회 검색(AsyncQdrantClient, 워커 스레드 미사용). 필터 검색 실패 시 같은 벡터로 무필터 재시도."""
+    async def _query(filt: Optional[qmodels.Filter]):
+        with metrics.QDRANT_SECONDS.labels("memory_search").time():
+            res = await get_async_qdrant_client().query_points(
+                collection_name=settings.collection_name,
+                query=query_vector,
+                query_filter=filt,
+                limit=top_k,
+                with_payload=True,
+            )
+        return [(_doc_from_point(p), float(p.score)) for p in res.points]
+
     try:
-        filt = _member_filter(member_id)
-        results = vectorstore.similarity_search(query_str, k=top_k, filter=filt)
+        return await _query(_member_filter(member_id))
     except Exception as e:
         print(f"[Qdrant] filtered search failed -> fallback. reason: {e}")
-        results = vectorstore.similarity_search(query_str, k=top_k)
+        return await _query(None)
+
+# --- 하이브리드(BM25 + 벡터) ---
+lexical_index = LexicalIndex(
+    max_members=settings.memory_lexical_max_members,
+    max_docs=settings.memory_lexical_max_docs,
+)
+
+def _hit_key(doc: Document) -> Tuple[Any, ...]:
+    meta = doc.metadata or {}
+    if meta.get("chat_id") is not None:
+        return (int(meta["chat_id"]), meta.get("role"))
+    return ("text", doc.page_content)
+
+async def _lexical_hits(query: str, member_id: int, top_k: int) -> MemoryHits:
+    async with AsyncSessionLocal() as db:
+        found = await lexical_index.search(member_id, query, top_k, db)
+    return [
+        (Document(page_content=text, metadata={
+            "member_id": str(member_id), "role": role, "chat_id": chat_id,
+            "created_at": as_log_time(created_at).isoformat(),
+        }), score)
+        for (chat_id, role), text, created_at, score in found
+    ]
+
+def fuse_rrf(rankings: List[MemoryHits], top_k: int, k: int = 60) -> MemoryHits:
+    """Reciprocal Rank Fusion: 문서마다 Σ 1/(k + 순위). 같은 문서는 (chat_id, role)로 식별, 먼저 나온 쪽 Document 사용."""
+    fused: Dict[Tuple[Any, ...], List[Any]] = {}
+    for hits in rankings:
+        for rank, (doc, _score) in enumerate(hits, start=1):
+            entry = fused.setdefault(_hit_key(doc), [doc, 0.0])
+            entry[1] += 1.0 / (k + rank)
+    ranked = sorted(fused.values(), key=lambda e: e[1], reverse=True)[:top_k]
+    return [(doc, score) for doc, score in ranked]
+
+async def retrieve_memory_hits_async(
+    query: Any,
+    top_k: int = 3,
+    member_id: Optional[int] = None,
+    query_vector: Optional[List[float]] = None,
+) -> MemoryHits:
+    """
+    임베딩 1회 + 검색 1회(query_vector가 있으면 임베딩 생략).
+    memory_hybrid이면 벡터 후보와 회원별 BM25 후보를 동시에 구해 RRF로 합친다(점수 = RRF 점수).
+    어휘 색인 실패 시 벡터 결과만 사용.
+    """
+    text = _to_text(query)
+    hybrid = settings.memory_hybrid and member_id is not None and text.strip()
+    n = max(top_k, settings.memory_hybrid_candidates) if hybrid else top_k
+
+    async def _dense() -> MemoryHits:
+        vec = query_vector if query_vector is not None else await embedding.aembed_query(text)
+        return await search_memory_hits_async(vec, top_k=n, member_id=member_id)
+
+    if not hybrid:
+        return await _dense()
 
-    if not results:
+    dense, lexical = await asyncio.gather(_dense(), _lexical_hits(text, member_id, n), return_exceptions=True)
+    if isinstance(dense, BaseException):
+        raise dense
+    if isinstance(lexical, BaseException):
+        log.warning("[memory] lexical search warn: %s", lexical)
+        return dense[:top_k]
+    return fuse_rrf([dense, lexical], top_k, k=settings.memory_rrf_k)
+
+def format_memory_hits(hits: Optional[MemoryHits]) -> str:
+    if not hits:
         return ""
-    return "\n".join(doc.page_content for doc in results)
+    return "\n".join(doc.page_content for doc, _score in hits)
+
+def hits_to_state(hits: MemoryHits) -> List[Dict[str, Any]]:
+    """state 보관용(직렬화 가능) 표현."""
+    return [{"page_content": d.page_content, "metadata": dict(d.metadata or {}), "score": float(sc)} for d, sc in hits]
+
+def hits_from_state(items: Optional[List[Dict[str, Any]]]) -> MemoryHits:
+    return [
+        (Document(page_content=it.get("page_content", ""), metadata=it.get("metadata") or {}), float(it.get("score", 0.0)))
+        for it in (items or [])
+    ]
+
+async def search_memory_async(
+    query: str,
+    top_k: int = 3,
+    member_id: Optional[int] = None,
+    query_vector: Optional[List[float]] = None,
+) -> str:
+    return format_memory_hits(await retrieve_memory_hits_async(query, top_k, member_id, query_vector))
 
 _RECALL_HINTS = [
     "기억나", "기억 해", "그때", "그 일", "그날", "그 순간",
     "지난번", "전에 말했", "예전에 말했", "그 얘기"
 ]
 
-def _looks_like_recall(text: Any) -> bool:
+def looks_like_recall(text: Any) -> bool:
     t = _to_text(text)
     return any(h in t for h in _RECALL_HINTS)
 
-def _expand_context_window_by_time(
-    db: Session,
-    member_id: int,
-    center_time: datetime,
-    minutes: int = 30,
-    limit: int = 30,
-) -> str:
-    start = center_time - timedelta(minutes=minutes)
-    end = center_time + timedelta(minutes=minutes)
-
-    logs: List[ChatLog] = (
-        db.query(ChatLog)
-        .filter(ChatLog.member_id == member_id)
-        .filter(ChatLog.created_at >= start)
-        .filter(ChatLog.created_at <= end)
-        .order_by(ChatLog.created_at.asc())
-        .limit(limit)
-        .all()
+def _merge_windows(centers: List[datetime], minutes: int) -> List[Tuple[datetime, datetime]]:
+    """히트 시점별 ±minutes 구간을 정렬 후 겹치거나 맞닿는 것끼리 병합."""
+    half = timedelta(minutes=minutes)
+    merged: List[Tuple[datetime, datetime]] = []
+    for c in sorted(centers):
+        start, end = c - half, c + half
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _windows_query(member_id: int, windows: List[Tuple[datetime, datetime]], limit: int):
+    """
+    병합 구간마다 (member_id, created_at) 인덱스 범위 스캔 + 구간별 LIMIT, UNION ALL로 1회 왕복.
+    (전체 LIMIT 하나면 앞쪽 바쁜 구간이 한도를 다 써서 뒤 구간이 비는 문제가 있다)
+    구간 SELECT는 파생 테이블로 감싼다: MySQL/SQLite 모두 UNION 항목 안의 ORDER BY/LIMIT를 이렇게만 허용.
+    """
+    parts = []
+    for s, e in windows:
+        per_window = (
+            select(ChatLog.chat_id)
+            .where(ChatLog.member_id == member_id)
+            .where(and_(ChatLog.created_at >= s, ChatLog.created_at <= e))
+            .order_by(ChatLog.created_at.asc(), ChatLog.chat_id.asc())
+            .limit(limit)
+            .subquery()
+        )
+        parts.append(select(per_window.c.chat_id))
+    ids = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    return (
+        select(ChatLog)
+        .join(ids, ChatLog.chat_id == ids.c.chat_id)
+        .order_by(ChatLog.created_at.asc(), ChatLog.chat_id.asc())
     )
-    if not logs:
-        return ""
 
-    lines: List[str] = []
+def _format_windows(windows: List[Tuple[datetime, datetime]], logs: List[ChatLog], limit: int) -> List[str]:
+    """chat_id로 중복 제거 후 병합 구간별 블록으로 포맷. limit는 구간당 최대 행 수."""
+    # 드라이버가 경계값을 tz 없이 비교하므로 행 배정도 같은 기준(naive)으로
+    bounds = [(s.replace(tzinfo=None), e.replace(tzinfo=None)) for s, e in windows]
+    seen = set()
+    blocks: List[List[str]] = [[] for _ in windows]
+    counts = [0] * len(windows)
     for c in logs:
+        if c.chat_id in seen:
+            continue
+        seen.add(c.chat_id)
+        # 병합 구간은 서로 겹치지 않으므로 첫 매칭 구간에 배정
+        at = c.created_at.replace(tzinfo=None)
+        idx = next((i for i, (s, e) in enumerate(bounds) if s <= at <= e), None)
+        if idx is None or counts[idx] >= limit:
+            continue
+        counts[idx] += 1
         when = _ensure_utc(c.created_at).isoformat()
-        lines.append(f"[{when}][USER] {c.user_text}")
-        lines.append(f"[{when}][BOT ] {c.bot_text}")
-    return "\n".join(lines)
+        blocks[idx].append(f"[{when}][USER] {c.user_text}")
+        blocks[idx].append(f"[{when}][BOT ] {c.bot_text}")
+    return ["\n".join(b) for b in blocks if b]
 
-def recall_or_general_context(
-    user_input: Any,
+async def _expand_context_windows_by_time_async(
+    db: AsyncSession,
     member_id: int,
-    db: Optional[Session],
-    top_k: int = 3,
-    recall_window_min: int = 30,
-) -> str:
-    if not db or not _looks_like_recall(user_input):
-        return search_memory(_to_text(user_input), top_k=top_k, member_id=member_id)
-
-    filt = _member_filter(member_id)
-    docs_with_scores = vectorstore.similarity_search_with_score(
-        _to_text(user_input),
-        k=top_k,
-        filter=filt,
-    )
-    if not docs_with_scores:
-        return ""
+    centers: List[datetime],
+    minutes: int = 30,
+    limit: int = 30,
+) -> List[str]:
+    """여러 히트의 시간창을 병합해 ChatLog를 1회 조회."""
+    windows = _merge_windows(centers, minutes)
+    if not windows:
+        return []
+    logs = (await db.scalars(_windows_query(member_id, windows, limit))).all()
+    return _format_windows(windows, logs, limit)
 
-    contexts: List[str] = []
-    for doc, _score in docs_with_scores:
+def _hit_centers(hits: MemoryHits) -> List[datetime]:
+    centers: List[datetime] = []
+    for doc, _score in hits:
         meta = doc.metadata or {}
         created_at_iso = meta.get("created_at")
         if not created_at_iso:
             continue
         try:
-            center = datetime.fromisoformat(created_at_iso.replace("Z", "+00:00"))
+            # tz 없는 값(예전 어휘 색인/외부 적재분)은 ChatLog 기록 시간대로 간주 → 정렬 시 naive/aware 혼합 방지
+            centers.append(as_log_time(datetime.fromisoformat(created_at_iso.replace("Z", "+00:00"))))
         except Exception:
             continue
+    return centers
 
-        ctx = _expand_context_window_by_time(
-            db=db,
-            member_id=member_id,
-            center_time=center,
-            minutes=recall_window_min,
-        )
-        if ctx:
-            contexts.append(ctx)
+async def recall_or_general_context_async(
+    user_input: Any,
+    member_id: int,
+    db: Optional[AsyncSession],
+    top_k: int = 3,
+    recall_window_min: int = 30,
+    query_vector: Optional[List[float]] = None,
+    hits: Optional[MemoryHits] = None,
+) -> str:
+    """
+    회상 힌트가 있으면 히트 시점 주변 DB 대화창을 확장, 아니면 일반 벡터 검색 결과.
+    - 쿼리는 1회만 임베딩/검색하고, 확장 실패 시 폴백도 같은 히트를 재사용한다.
+    - hits(같은 턴에서 이미 검색한 결과)나 query_vector를 넘기면 임베딩/검색을 생략.
+    - Qdrant/DB I/O 모두 이벤트 루프를 막지 않음.
+    """
+    if hits is None:
+        hits = await retrieve_memory_hits_async(user_input, top_k, member_id, query_vector)
 
+    if not db or not looks_like_recall(user_input):
+        return format_memory_hits(hits)
+
+    if not hits:
+        return ""
+
+    contexts = await _expand_context_windows_by_time_async(
+        db=db,
+        member_id=member_id,
+        centers=_hit_centers(hits),
+        minutes=recall_window_min,
+    )
     if not contexts:
-        return search_memory(_to_text(user_input), top_k=top_k, member_id=member_id)
+        return format_memory_hits(hits)
 
     return "\n---\n".join(contexts)
@@ -0,0 +1,139 @@
+# app/services/policy_cache.py
+# 정책 추천 결과 캐시: 정규화된 요청 키 → 결과. TTL + LRU, 동일 키 동시 요청은 1회만 계산(single-flight).
+# 정책 컬렉션이 바뀌면(버전 함수 값 변화, 예: points_count) 전체 무효화. 확인은 version_check_s 간격으로만.
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger("policy.cache")
+
+class PolicyResultCache:
+    def __init__(
+        self,
+        ttl_s: float,
+        max_entries: int,
+        version_check_s: float,
+        version_fn: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.version_check_s = version_check_s
+        self._version_fn = version_fn
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()   # key → (만료 시각, 값)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._version: Any = None
+        self._checked_at = 0.0
+        self._checking = False
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0 and self.max_entries > 0
+
+    def invalidate(self) -> None:
+        self._items.clear()
+        self.invalidations += 1
+
+    async def _maybe_check_version(self) -> None:
+        """컬렉션 버전이 바뀌었으면 비운다. 확인 실패 시 기존 캐시 유지(TTL이 상한)."""
+        if self._version_fn is None or self._checking:
+            return
+        if time.monotonic() - self._checked_at < self.version_check_s:
+            return
+        self._checking = True
+        try:
+            version = await self._version_fn()
+            if self._version is not None and version != self._version:
+                log.info("[policy.cache] collection changed %s → %s, invalidated", self._version, version)
+                self.invalidate()
+            self._version = version
+        except Exception as e:
+            log.warning("[policy.cache] version check warn: %s", e)
+        finally:
+            self._checked_at = time.monotonic()
+            self._checking = False
+
+    def _get(self, key: str) -> Tuple[bool, Any]:
+        hit = self._items.get(key)
+        if hit is None:
+            return False, None
+        if hit[0] < time.monotonic():
+            del self._items[key]
+            return False, None
+        self._items.move_to_end(key)
+        return True, hit[1]
+
+    def _put(self, key: str, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl_s, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await loader()
+        await self._maybe_check_version()
+
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise   # 이 요청 자체가 취소됨
+                # 먼저 계산하던 요청이 취소됨 → 아래에서 직접 계산
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()   # 대기자가 없어도 'exception never retrieved' 경고가 남지 않게
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self._put(key, value)
+        fut.set_result(value)
+        return value
+
+    async def lookup(self, key: str) -> Tuple[bool, Any]:
+        """배치 경로용 조회(버전 확인 포함). 미스는 호출자가 모아서 계산한 뒤 store()."""
+        if not self.enabled:
+            return False, None
+        await self._maybe_check_version()
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found, value
+
+    def store(self, key: str, value: Any) -> None:
+        if self.enabled:
+            self._put(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "version": self._version,
+        }
@@ -0,0 +1,230 @@
+# app/services/policy_index.py
+# 정책 컬렉션 로컬 인덱스(선택): Qdrant 스냅샷을 디스크에 쓰고 memory-map으로 읽어 프로세스 안에서 검색.
+# - 벡터: 정규화된 float32 (n, d) 행렬(np.load mmap) → 코사인 = 내적
+# - 페이로드: 필터 필드별 값 → 불리언 마스크(컬럼형 비트맵). 값이 배열이면 원소마다 마스크(Qdrant Match 의미와 동일)
+# - 주기적으로 전체 scroll로 재구축. 스냅샷이 max_age_s보다 오래되면 usable=False → 호출자가 원격 검색으로 폴백
+# - 단일(이름 없는) 코사인 벡터 컬렉션만 지원. 색인하지 못한 포인트가 있으면(policy_id 없음 등) usable=False
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+log = logging.getLogger("policy.index")
+
+FILTER_FIELDS = ("region", "childbirth_status", "marriage_status")
+
+def _value_key(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False)
+
+class PolicySnapshot:
+    def __init__(self, vectors: np.ndarray, policy_ids: List[int], titles: List[str],
+                 columns: Dict[str, Dict[str, List[int]]], built_at: float, points_count: int):
+        self.vectors = vectors
+        self.policy_ids = policy_ids
+        self.titles = titles
+        self.built_at = built_at
+        self.points_count = points_count
+        n = len(policy_ids)
+        self.masks: Dict[str, Dict[str, np.ndarray]] = {}
+        for field, values in columns.items():
+            per_value = {}
+            for key, idx in values.items():
+                m = np.zeros(n, dtype=bool)
+                m[idx] = True
+                per_value[key] = m
+            self.masks[field] = per_value
+
+    def mask(self, conditions: Sequence[Tuple[str, Any]]) -> np.ndarray:
+        """(필드, 값) AND 조건. 해당 값을 가진 포인트가 없으면 전부 False."""
+        m = np.ones(len(self.policy_ids), dtype=bool)
+        for field, value in conditions:
+            hit = self.masks.get(field, {}).get(_value_key(value))
+            if hit is None:
+                return np.zeros(len(self.policy_ids), dtype=bool)
+            m &= hit
+        return m
+
+    def top_k(self, query: np.ndarray, conditions: Sequence[Tuple[str, Any]], k: int) -> List[Tuple[int, str]]:
+        if not self.policy_ids:
+            return []
+        return self.top_k_scores(self.vectors @ query, conditions, k)
+
+    def top_k_scores(self, scores: np.ndarray, conditions: Sequence[Tuple[str, Any]], k: int) -> List[Tuple[int, str]]:
+        idx = np.flatnonzero(self.mask(conditions))
+        if idx.size == 0:
+            return []
+        s = scores[idx]
+        if idx.size > k:
+            part = np.argpartition(-s, k - 1)[:k]
+            idx, s = idx[part], s[part]
+        order = idx[np.argsort(-s, kind="stable")]
+        return [(self.policy_ids[i], self.titles[i]) for i in order]
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (mat / norms).astype(np.float32, copy=False)
+
+class LocalPolicyIndex:
+    def __init__(self, collection: str, path: str, max_age_s: float, refresh_s: float):
+        self.collection = collection
+        self.path = path
+        self.max_age_s = max_age_s
+        self.refresh_s = refresh_s
+        self.snapshot: Optional[PolicySnapshot] = None
+        self.local_hits = 0
+        self.fallbacks = 0
+
+    # --- 조회 ---
+    @property
+    def usable(self) -> bool:
+        snap = self.snapshot
+        return (
+            snap is not None
+            and (time.time() - snap.built_at) <= self.max_age_s
+            and len(snap.policy_ids) >= snap.points_count   # 빠진 포인트가 있으면 결과가 원격과 달라짐
+        )
+
+    def search(self, query_vector: Sequence[float], conditions: Sequence[Tuple[str, Any]], k: int) -> List[Tuple[int, str]]:
+        q = _normalize(np.asarray(query_vector, dtype=np.float32))
+        return self.snapshot.top_k(q, conditions, k)
+
+    def search_many(self, query_vectors: Sequence[Sequence[float]],
+                    conditions: Sequence[Sequence[Tuple[str, Any]]], k: int) -> List[List[Tuple[int, str]]]:
+        """질의 m개를 (n, d) @ (d, m) 행렬곱 1회로 채점한 뒤 열마다 마스크/top-k."""
+        snap = self.snapshot
+        if not snap.policy_ids:
+            return [[] for _ in query_vectors]
+        q = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        scores = snap.vectors @ q.T
+        return [snap.top_k_scores(scores[:, j], conditions[j], k) for j in range(q.shape[0])]
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self.snapshot
+        return {
+            "points": len(snap.policy_ids) if snap else 0,
+            "skipped": snap.points_count - len(snap.policy_ids) if snap else 0,
+            "age_s": round(time.time() - snap.built_at, 1) if snap else None,
+            "usable": self.usable,
+            "local_hits": self.local_hits,
+            "fallbacks": self.fallbacks,
+        }
+
+    # --- 스냅샷 디스크 포맷: {path}/{build_id}/vectors.npy + meta.json, {path}/CURRENT = build_id ---
+    def _write(self, vectors: np.ndarray, meta: Dict[str, Any]) -> str:
+        build_id = f"{int(meta['built_at'] * 1000)}-{os.getpid()}"
+        d = os.path.join(self.path, build_id)
+        os.makedirs(d, exist_ok=True)
+        np.save(os.path.join(d, "vectors.npy"), vectors)
+        with open(os.path.join(d, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        tmp = os.path.join(self.path, f"CURRENT.{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(build_id)
+        os.replace(tmp, os.path.join(self.path, "CURRENT"))
+        # 이전 빌드 정리(이미 mmap 중인 파일은 unlink 후에도 열린 동안 유효)
+        for name in os.listdir(self.path):
+            full = os.path.join(self.path, name)
+            if name != build_id and os.path.isdir(full):
+                shutil.rmtree(full, ignore_errors=True)
+        return d
+
+    def _read(self, d: str) -> PolicySnapshot:
+        with open(os.path.join(d, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(d, "vectors.npy"), mmap_mode="r")
+        return PolicySnapshot(vectors, meta["policy_ids"], meta["titles"], meta["columns"],
+                              meta["built_at"], meta["points_count"])
+
+    def load_from_disk(self) -> bool:
+        """재시작 시 마지막 스냅샷을 바로 사용(오래됐으면 usable=False라 원격 폴백)."""
+        try:
+            with open(os.path.join(self.path, "CURRENT"), "r", encoding="utf-8") as f:
+                build_id = f.read().strip()
+            self.snapshot = self._read(os.path.join(self.path, build_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _build(self, points: List[Any]) -> str:
+        vecs, ids, titles = [], [], []
+        columns: Dict[str, Dict[str, List[int]]] = {f: {} for f in FILTER_FIELDS}
+        for p in points:
+            vec = p.vector
+            payload = p.payload or {}
+            if not isinstance(vec, list) or "policy_id" not in payload:
+                continue   # 이름 있는 벡터/정책 id 없는 포인트는 로컬 인덱스 대상 아님
+            i = len(ids)
+            vecs.append(vec)
+            ids.append(payload["policy_id"])
+            titles.append(payload.get("title", ""))
+            for field in FILTER_FIELDS:
+                raw = payload.get(field)
+                for v in (raw if isinstance(raw, list) else [raw] if raw is not None else []):
+                    columns[field].setdefault(_value_key(v), []).append(i)
+        if len(ids) < len(points):
+            log.warning("[policy.index] %d/%d points not indexed (no policy_id or non-list vector) → remote search",
+                        len(points) - len(ids), len(points))
+        mat = _normalize(np.asarray(vecs, dtype=np.float32)) if vecs else np.zeros((0, 0), dtype=np.float32)
+        meta = {"built_at": time.time(), "points_count": len(points),
+                "policy_ids": ids, "titles": titles, "columns": columns}
+        return self._write(mat, meta)
+
+    async def _check_collection(self, client: Any) -> None:
+        """로컬 채점(정규화 내적)과 같은 의미인지 확인: 이름 없는 단일 벡터 + 코사인 거리만."""
+        info = await client.get_collection(self.collection)
+        params = info.config.params.vectors
+        if not isinstance(params, qmodels.VectorParams):
+            raise ValueError(f"{self.collection}: named/multi vectors are not supported by the local index")
+        if params.distance != qmodels.Distance.COSINE:
+            raise ValueError(f"{self.collection}: distance {params.distance} is not cosine")
+
+    async def refresh(self, client: Any) -> int:
+        """Qdrant 전체 scroll → 스냅샷 재구축(디스크 기록/로드는 스레드에서). 반환: 색인된 포인트 수."""
+        try:
+            await self._check_collection(client)
+        except ValueError:
+            self.snapshot = None   # 디스크의 이전 스냅샷도 같은 컬렉션 기준이므로 쓰지 않는다
+            raise
+        points: List[Any] = []
+        offset = None
+        while True:
+            batch, offset = await client.scroll(
+                collection_name=self.collection, limit=1024, offset=offset,
+                with_payload=True, with_vectors=True,
+            )
+            points.extend(batch)
+            if offset is None:
+                break
+        d = await asyncio.to_thread(self._build, points)
+        self.snapshot = await asyncio.to_thread(self._read, d)
+        return len(self.snapshot.policy_ids)
+
+    async def _refresh_loop(self, client_fn) -> None:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                n = await self.refresh(client_fn())
+                log.info("[policy.index] refreshed %d points in %.1fms", n, (time.perf_counter() - t0) * 1000)
+            except Exception as e:
+                log.warning("[policy.index] refresh warn: %s", e)
+            await asyncio.sleep(max(1.0, self.refresh_s))
+
+    @asynccontextmanager
+    async def running(self, client_fn) -> AsyncIterator["LocalPolicyIndex"]:
+        """디스크 스냅샷 로드 + 주기 갱신 작업(app.main lifespan)."""
+        await asyncio.to_thread(self.load_from_disk)
+        task = asyncio.create_task(self._refresh_loop(client_fn), name="policy-index-refresh")
+        try:
+            yield self
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
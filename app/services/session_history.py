@@ -0,0 +1,187 @@
+# app/services/session_history.py
+# RunnableWithMessageHistory용 세션 히스토리 저장소(상한 있음).
+# - memory(기본): 프로세스 내 LRU(세션 수 상한) + 유휴 TTL + 세션당 메시지 수 상한
+# - redis(선택): 여러 uvicorn 워커가 히스토리 공유. 키 TTL = 유휴 TTL, LTRIM으로 메시지 상한
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from app.core.config import settings
+
+def _message_bytes(m: BaseMessage) -> int:
+    c = m.content
+    return len(c.encode("utf-8")) if isinstance(c, str) else len(str(c).encode("utf-8"))
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """최근 max_messages개만 유지하는 인메모리 히스토리(0=무제한). 점유 바이트를 증분 집계."""
+
+    def __init__(self, max_messages: int = 0):
+        self.messages: List[BaseMessage] = []
+        self.max_messages = max_messages
+        self.nbytes = 0
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        for m in messages:
+            self.messages.append(m)
+            self.nbytes += _message_bytes(m)
+        overflow = len(self.messages) - self.max_messages
+        if self.max_messages > 0 and overflow > 0:
+            self.nbytes -= sum(_message_bytes(m) for m in self.messages[:overflow])
+            del self.messages[:overflow]
+
+    def clear(self) -> None:
+        self.messages = []
+        self.nbytes = 0
+
+class SessionHistoryStore:
+    """
+    session_id → BoundedChatMessageHistory. 접근 순서(LRU)로 정렬해 두므로
+    유휴 만료/용량 초과 제거는 항상 앞쪽에서만 일어난다(O(제거 수)).
+    """
+
+    def __init__(self, max_sessions: int, idle_ttl_s: float, max_messages: int):
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self.max_messages = max_messages
+        self._items: "OrderedDict[str, tuple[float, BoundedChatMessageHistory]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _evict(self, now: float) -> None:
+        if self.idle_ttl_s > 0:
+            while self._items:
+                _, (seen, _) = next(iter(self._items.items()))
+                if now - seen <= self.idle_ttl_s:
+                    break
+                self._items.popitem(last=False)
+                self.expired += 1
+        while self.max_sessions > 0 and len(self._items) > self.max_sessions:
+            self._items.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, session_id: str) -> BoundedChatMessageHistory:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.pop(session_id, None)
+            if entry is not None and self.idle_ttl_s > 0 and now - entry[0] > self.idle_ttl_s:
+                entry = None
+                self.expired += 1
+            hist = entry[1] if entry else BoundedChatMessageHistory(self.max_messages)
+            self._items[session_id] = (now, hist)
+            self._evict(now)
+            return hist
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {
+                "backend": "memory",
+                "sessions": len(self._items),
+                "bytes": sum(h.nbytes for _, h in self._items.values()),
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+class RedisChatMessageHistory(BaseChatMessageHistory):
+    """Redis 리스트(RPUSH) 기반 히스토리. 쓰기마다 LTRIM(메시지 상한) + EXPIRE(유휴 TTL)."""
+
+    def __init__(self, client: Any, key: str, max_messages: int, ttl_s: float):
+        self._client = client
+        self._key = key
+        self._max = max_messages
+        self._ttl = int(ttl_s)
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore[override]
+        start = -self._max if self._max > 0 else 0
+        raw = self._client.lrange(self._key, start, -1)
+        return messages_from_dict([json.loads(r) for r in raw])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        pipe = self._client.pipeline()
+        pipe.rpush(self._key, *[json.dumps(message_to_dict(m), ensure_ascii=False) for m in messages])
+        if self._max > 0:
+            pipe.ltrim(self._key, -self._max, -1)
+        if self._ttl > 0:
+            pipe.expire(self._key, self._ttl)
+        pipe.execute()
+
+    def clear(self) -> None:
+        self._client.delete(self._key)
+
+class RedisSessionHistoryStore:
+    """워커 간 공유 저장소. 세션 수 상한은 Redis maxmemory 정책에 맡기고, 유휴 TTL로 정리."""
+
+    KEY_PREFIX = "jamjam:history:"
+
+    def __init__(self, url: str, idle_ttl_s: float, max_messages: int, stats_interval_s: float = 300.0):
+        import redis  # 선택 의존성
+        self._client = redis.Redis.from_url(url)
+        self.idle_ttl_s = idle_ttl_s
+        self.max_messages = max_messages
+        self.stats_interval_s = stats_interval_s
+        self._stats_lock = threading.Lock()
+        self._sessions: Optional[int] = None   # 마지막 SCAN 결과
+        self._counted_at = 0.0
+
+    def get(self, session_id: str) -> RedisChatMessageHistory:
+        return RedisChatMessageHistory(
+            self._client, self.KEY_PREFIX + session_id, self.max_messages, self.idle_ttl_s,
+        )
+
+    def _count_sessions(self) -> int:
+        return sum(1 for _ in self._client.scan_iter(match=self.KEY_PREFIX + "*", count=1000))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        /metrics 스크랩마다 호출된다 → 키 공간 SCAN은 stats_interval_s마다 1번만(키당 MEMORY USAGE 왕복 없음),
+        그 사이에는 캐시한 세션 수를 돌려준다. 동시에 들어온 수집은 기다리지 않고 이전 값 사용.
+        """
+        now = time.monotonic()
+        due = self.stats_interval_s > 0 and (self._sessions is None or now - self._counted_at >= self.stats_interval_s)
+        if due and self._stats_lock.acquire(blocking=False):
+            try:
+                self._sessions = self._count_sessions()
+            finally:
+                self._counted_at = now   # 실패해도 다음 주기까지 재시도하지 않음(수집기가 경고 로그)
+                self._stats_lock.release()
+        out: Dict[str, Any] = {"backend": "redis"}
+        if self._sessions is not None:
+            out["sessions"] = self._sessions
+            out["sessions_age_s"] = round(time.monotonic() - self._counted_at, 1)
+        return out
+
+def create_history_store():
+    backend = (settings.history_backend or "memory").strip().lower()
+    if backend == "redis":
+        if not settings.history_redis_url:
+            raise ValueError("history_backend=redis requires history_redis_url")
+        return RedisSessionHistoryStore(
+            settings.history_redis_url, settings.history_idle_ttl_s, settings.history_max_messages,
+            settings.history_stats_interval_s,
+        )
+    if backend != "memory":
+        raise ValueError(f"unknown history_backend: {backend}")
+    return SessionHistoryStore(
+        settings.history_max_sessions, settings.history_idle_ttl_s, settings.history_max_messages,
+    )
+
+@lru_cache(maxsize=None)
+def get_history_store():
+    """프로세스 단일 저장소(최초 사용 시 생성 → 임포트 시 외부 연결 없음)."""
+    return create_history_store()
+
+def history_stats() -> Dict[str, Any]:
+    """상주 세션 수/바이트 등 저장소 지표(메트릭 수집용)."""
+    return get_history_store().stats()
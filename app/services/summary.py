@@ -1,10 +1,21 @@
 # app/services/summary.py
 # 최근 대화 N개를 요약. 읽기 트랜잭션을 COMMIT로 남겨 로그를 깔끔히.
-from sqlalchemy.orm import Session
+# + 회원별 누적 요약 캐시: 응답 이후 새 턴만 이전 요약에 접어 넣고(incremental), preload는 캐시만 읽는다.
+import asyncio
+import logging
+import weakref
+from typing import List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.chat_log import ChatLog
+from app.models.conversation_summary import ConversationSummary
 from app.core.client import llm
+from app.core.db import AsyncSessionLocal
+
+log = logging.getLogger("summary")
 
-async def summarize_conversation(member_id: int, db: Session = None, limit: int = 20) -> str:
+async def summarize_conversation(member_id: int, db: AsyncSession = None, limit: int = 20) -> str:
     """
     최근 대화를 요약한다.
     - 읽기 트랜잭션을 명시적으로 시작/종료하여 로그가 ROLLBACK 대신 COMMIT로 찍히도록 함.
@@ -14,14 +25,13 @@ async def summarize_conversation(member_id: int, db: Session = None, limit: int
     
     # 명시적 읽기 트랜잭션(끝날 때 COMMIT) → ROLLBACK 노이즈 제거
     try:
-        with db.begin():
-            chats = (
-                db.query(ChatLog)
-                .filter(ChatLog.member_id == member_id)
+        async with db.begin():
+            chats = (await db.scalars(
+                select(ChatLog)
+                .where(ChatLog.member_id == member_id)
                 .order_by(ChatLog.created_at.desc())
                 .limit(limit)
-                .all()
-            )
+            )).all()
     except Exception:
         return ""
 
@@ -38,3 +48,97 @@ async def summarize_conversation(member_id: int, db: Session = None, limit: int
 """
     msg = await llm.ainvoke(prompt, config={"run_name": "Summarize"})
     return getattr(msg, "content", str(msg))
+
+# --- 누적 요약 캐시 ---
+async def get_cached_summary(member_id: Optional[int], db: AsyncSession) -> str:
+    """캐시된 누적 요약(PK 1건 조회). 없으면 ''."""
+    if not member_id:
+        return ""
+    try:
+        async with db.begin():
+            row = await db.get(ConversationSummary, member_id)
+            return (row.summary or "") if row else ""
+    except Exception as e:
+        log.warning("[summary] cache read warn: %s", e)
+        return ""
+
+async def _load_pending(member_id: int, limit: int):
+    """(이전 요약, 마지막 반영 chat_id, 아직 반영되지 않은 최근 대화 limit개(오래된 순))"""
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            row = await db.get(ConversationSummary, member_id)
+            prev = (row.summary or "") if row else ""
+            last_id = int(row.last_chat_id or 0) if row else 0
+            chats: List[ChatLog] = (await db.scalars(
+                select(ChatLog)
+                .where(ChatLog.member_id == member_id)
+                .where(ChatLog.chat_id > last_id)
+                .order_by(ChatLog.chat_id.desc())
+                .limit(limit)
+            )).all()
+            rows = [(c.chat_id, c.user_text, c.bot_text) for c in reversed(chats)]
+        return prev, last_id, rows
+
+async def _store_summary(member_id: int, summary: str, last_chat_id: int) -> None:
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            row = await db.get(ConversationSummary, member_id)
+            if row is None:
+                db.add(ConversationSummary(member_id=member_id, summary=summary, last_chat_id=last_chat_id))
+            elif int(row.last_chat_id or 0) < last_chat_id:   # 다른 워커가 더 최신으로 갱신했으면 유지
+                row.summary = summary
+                row.last_chat_id = last_chat_id
+
+# 회원별 갱신 직렬화(같은 회원의 동시 갱신이 같은 턴을 두 번 접지 않도록)
+_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+_background: Set[asyncio.Task] = set()
+
+async def refresh_summary(member_id: Optional[int], limit: int = 20) -> str:
+    """
+    아직 요약에 반영되지 않은 턴만 이전 요약에 접어 넣어 캐시를 갱신한다.
+    새 턴이 없으면 LLM 호출 없이 기존 요약을 반환.
+    """
+    if not member_id:
+        return ""
+    lock = _locks.get(member_id)
+    if lock is None:
+        lock = _locks[member_id] = asyncio.Lock()
+    async with lock:
+        try:
+            prev, _, rows = await _load_pending(member_id, limit)
+        except Exception as e:
+            log.warning("[summary] load warn: %s", e)
+            return ""
+        if not rows:
+            return prev
+
+        new_text = "\n".join(f"U: {u}\nB: {b}" for _, u, b in rows)
+        prompt = f"""
+아래는 사용자와 챗봇의 이전 대화 요약과, 그 이후 새로 오간 대화이다.
+새 대화를 반영해 최근 대화 맥락을 5줄 이내로 핵심만 다시 요약하라.
+
+[이전 요약]
+{prev or "없음"}
+
+[새 대화]
+{new_text}
+"""
+        try:
+            msg = await llm.ainvoke(prompt, config={"run_name": "SummarizeIncremental"})
+        except Exception as e:
+            log.warning("[summary] llm warn: %s", e)
+            return prev
+        summary = (getattr(msg, "content", str(msg)) or "").strip()
+        try:
+            await _store_summary(member_id, summary, rows[-1][0])
+        except Exception as e:
+            log.warning("[summary] store warn: %s", e)
+        return summary
+
+def schedule_summary_refresh(member_id: Optional[int], limit: int = 20) -> None:
+    """현재 이벤트 루프에서 refresh_summary를 백그라운드로 실행(결과 대기 없음)."""
+    if not member_id:
+        return
+    task = asyncio.get_running_loop().create_task(refresh_summary(member_id, limit))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
@@ -0,0 +1,241 @@
+# bench/fakes.py
+# 벤치마크용 로컬 대역: 외부 서비스(OpenAI LLM/임베딩, Qdrant, 감정 모델) 없이 앱 전체 경로를 돌린다.
+# - FakeChatModel: 첫 토큰/토큰당 지연 설정 가능, 도구 호출 스크립트(발화 해시로 결정적 선택), usage_metadata 보고
+# - FakeEmbeddings: 문자 bigram 해시 → 정규화 벡터(결정적, 비슷한 문장은 비슷한 벡터)
+# - LockedQdrant/AsyncQdrantFacade: QdrantClient(":memory:") 1개를 동기(write-behind 스레드)/비동기 경로가 공유
+# - FakeEmotionTokenizer/FakeEmotionBackend: 감정 모델 대신 해시 기반 logits(배치당 지연 설정 가능)
+# - clients(BenchClients): settings.client_factory="bench.fakes:clients"로 앱의 클라이언트 생성 지점 한 곳에서 위 대역을 주입
+import asyncio
+import json
+import re
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from qdrant_client import QdrantClient
+
+_WORDS = ["응", "나도", "오늘", "재밌었어", "공룡", "좋아", "같이", "놀자", "그림", "그렸어", "엄마", "아빠", "최고야"]
+_MEMBER_RE = re.compile(r"member_id=(\d+)")
+
+def stable_hash(text: str) -> int:
+    return zlib.crc32((text or "").encode("utf-8"))
+
+def _last_turn(messages: List[BaseMessage]):
+    """(마지막 사용자 발화, 그 이후 도구 결과가 있었는지)"""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i].content or "", any(isinstance(m, ToolMessage) for m in messages[i + 1:])
+    return "", False
+
+class FakeChatModel(BaseChatModel):
+    first_token_s: float = 0.15
+    token_s: float = 0.005
+    answer_tokens: int = 24
+    # 턴마다 stable_hash(발화) % len으로 고른다. None = 바로 Final
+    tool_script: List[Optional[str]] = [None, "rag_search_tool", None, "summarize_tool", None, "classify_emotion_tool"]
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    # --- 응답 결정 ---
+    def _tool_call(self, messages: List[BaseMessage]) -> Optional[Dict[str, Any]]:
+        user_text, after_tool = _last_turn(messages)
+        if after_tool or not self.tool_script:
+            return None
+        name = self.tool_script[stable_hash(user_text) % len(self.tool_script)]
+        system = "\n".join(m.content for m in messages if isinstance(m, SystemMessage) and isinstance(m.content, str))
+        m = _MEMBER_RE.search(system)
+        if name is None or m is None:   # 도구 목록이 없는 프롬프트(요약 등)는 바로 답
+            return None
+        member_id = int(m.group(1))
+        args = {
+            "rag_search_tool": {"query": user_text, "member_id": member_id, "top_k": 3},
+            "summarize_tool": {"member_id": member_id, "limit": 20},
+            "classify_emotion_tool": {"text": user_text},
+        }.get(name, {})
+        return {"name": name, "args": args, "id": f"call_{stable_hash(user_text + name):08x}"}
+
+    def _answer_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        h = stable_hash(_last_turn(messages)[0])
+        words = [_WORDS[(h + i * 7) % len(_WORDS)] for i in range(max(1, self.answer_tokens - 1))]
+        return ["Final:"] + [" " + w for w in words]
+
+    def _usage(self, messages: List[BaseMessage], output_tokens: int) -> Dict[str, int]:
+        n_in = sum(len(str(m.content)) for m in messages) // 3
+        return {"input_tokens": n_in, "output_tokens": output_tokens, "total_tokens": n_in + output_tokens}
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        tc = self._tool_call(messages)
+        if tc is not None:
+            msg = AIMessage(content="", tool_calls=[tc], usage_metadata=self._usage(messages, 20))
+        else:
+            tokens = self._answer_tokens(messages)
+            msg = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _latency(self, messages: List[BaseMessage]) -> float:
+        n = 1 if self._tool_call(messages) is not None else len(self._answer_tokens(messages))
+        return self.first_token_s + n * self.token_s
+
+    # --- BaseChatModel ---
+    def _generate(self, messages, stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        time.sleep(self._latency(messages))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._latency(messages))
+        return self._result(messages)
+
+    async def _astream(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_s)
+        tc = self._tool_call(messages)
+        if tc is not None:
+            chunk = AIMessageChunk(
+                content="",
+                tool_call_chunks=[{"name": tc["name"], "args": json.dumps(tc["args"], ensure_ascii=False),
+                                   "id": tc["id"], "index": 0}],
+                usage_metadata=self._usage(messages, 20),
+            )
+            yield ChatGenerationChunk(message=chunk)
+            return
+        tokens = self._answer_tokens(messages)
+        for i, tok in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_s)
+            usage = self._usage(messages, len(tokens)) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=tok, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(tok, chunk=chunk)
+            yield chunk
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dim: int, latency_s: float = 0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _vec(self, text: str) -> List[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        t = (text or "").strip() or " "
+        grams = [t[i:i + 2] for i in range(max(1, len(t) - 1))]
+        for g in grams:
+            h = stable_hash(g)
+            v[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        n = float(np.linalg.norm(v)) or 1.0
+        return (v / n).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency_s)
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        return [self._vec(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+class LockedQdrant(QdrantClient):
+    """QdrantClient(':memory:') + 공개 메서드 락(로컬 모드는 스레드 안전하지 않음).
+    langchain 벡터스토어가 isinstance(QdrantClient)를 검사하므로 래퍼가 아닌 서브클래스."""
+    def __init__(self):
+        self._bench_lock = threading.RLock()
+        super().__init__(":memory:")
+
+    def __getattribute__(self, name: str):
+        attr = super().__getattribute__(name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        lock = super().__getattribute__("_bench_lock")
+        def call(*args, **kwargs):
+            with lock:
+                return attr(*args, **kwargs)
+        return call
+
+class AsyncQdrantFacade:
+    """AsyncQdrantClient 자리에 넣는 비동기 래퍼. 같은 in-memory 저장소를 쓴다(연산은 이벤트 루프에서 즉시 실행)."""
+    def __init__(self, locked: LockedQdrant):
+        self._locked = locked
+
+    def __getattr__(self, name: str):
+        fn = getattr(self._locked, name)
+        async def call(*args, **kwargs):
+            return fn(*args, **kwargs)
+        return call
+
+class FakeEmotionTokenizer:
+    """감정 토크나이저 대역: 문장 목록을 그대로 백엔드에 넘긴다."""
+    def __call__(self, texts: List[str], **kwargs) -> Dict[str, List[str]]:
+        return {"texts": list(texts)}
+
+class FakeEmotionBackend:
+    """감정 모델 백엔드 대역(predict_results가 softmax/라벨을 계산). 배치 1회당 latency_s."""
+    return_tensors = "np"
+
+    def __init__(self, latency_s: float, n_labels: int = 6):
+        self.latency_s = latency_s
+        self.n_labels = n_labels
+
+    def logits(self, inputs) -> np.ndarray:
+        time.sleep(self.latency_s)
+        out = np.zeros((len(inputs["texts"]), self.n_labels), dtype=np.float32)
+        for row, t in enumerate(inputs["texts"]):
+            out[row, stable_hash(t) % self.n_labels] = 3.0
+        return out
+
+class BenchClients:
+    """
+    settings.client_factory 대역 객체. app.core.client/emotion_service가 클라이언트를 만들 때 여기 메서드를 부른다.
+    앱 임포트 전에 configure()로 지연을 맞춘다. Qdrant는 동기/비동기가 같은 in-memory 저장소 1개를 본다.
+    """
+    def __init__(self):
+        self.chat_kwargs: Dict[str, Any] = {}
+        self.embed_latency_s = 0.0
+        self.emotion_latency_s = 0.0
+        self._qdrant: Optional[LockedQdrant] = None
+        self._lock = threading.Lock()
+
+    def configure(self, first_token_s: float, token_s: float, answer_tokens: int,
+                  embed_latency_s: float, emotion_latency_s: float) -> None:
+        self.chat_kwargs = dict(first_token_s=first_token_s, token_s=token_s, answer_tokens=answer_tokens)
+        self.embed_latency_s = embed_latency_s
+        self.emotion_latency_s = emotion_latency_s
+
+    def chat_model(self, run_name: str) -> FakeChatModel:
+        if run_name == "AgentLLM":
+            return FakeChatModel(**self.chat_kwargs)
+        return FakeChatModel(tool_script=[], **self.chat_kwargs)   # 요약 등 기본 LLM은 도구를 부르지 않는다
+
+    def embeddings(self, dim: int) -> FakeEmbeddings:
+        return FakeEmbeddings(dim, latency_s=self.embed_latency_s)
+
+    def qdrant_client(self) -> LockedQdrant:
+        with self._lock:   # 동기/비동기 클라이언트가 처음 동시에 만들어져도 저장소는 1개
+            if self._qdrant is None:
+                self._qdrant = LockedQdrant()
+            return self._qdrant
+
+    def async_qdrant_client(self) -> AsyncQdrantFacade:
+        return AsyncQdrantFacade(self.qdrant_client())
+
+    def emotion_model(self):
+        return FakeEmotionTokenizer(), FakeEmotionBackend(self.emotion_latency_s)
+
+clients = BenchClients()
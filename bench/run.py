@@ -0,0 +1,512 @@
+# bench/run.py
+# 부하/벤치마크 하네스: 외부 서비스 없이 FastAPI 앱을 그대로 띄워 /chat/, /chat/stream, /policy/recommend를 측정.
+#   python -m bench.run                      # 기본 프로필로 측정 + 리포트
+#   python -m bench.run --check              # bench/thresholds.json 기준 회귀 판정(위반 시 exit 1)
+#   python -m bench.run --output bench_output.json
+# - OpenAI/Qdrant/감정 모델은 settings.client_factory로 bench.fakes 대역 주입, MySQL은 임시 SQLite(지연은 옵션으로 조절)
+# - 앱은 프로세스 내 uvicorn으로 실제 HTTP 경로를 거친다(응답 후 BackgroundTasks는 지연에 포함되지 않음)
+# - 단계별 분해는 측정 전후 /metrics 히스토그램 스냅샷의 차이(count/mean/버킷 기반 p95)
+# 주의: app 임포트 전에 환경변수를 세팅해야 한다(settings/엔진이 임포트 시점에 만들어짐).
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_THRESHOLDS = os.path.join(HERE, "thresholds.json")
+
+# 임계값이 보정된 측정 조건(다른 조건으로 돌린 결과는 임계값과 비교하지 않는다)
+PROFILE_KEYS = (
+    "conversations", "turns", "concurrency", "stream_ratio", "recommend_requests", "recommend_concurrency",
+    "policies", "llm_first_token_ms", "llm_token_ms", "answer_tokens", "embed_ms", "emotion_ms", "seed",
+)
+
+# --- 합성 발화(인사/맞장구, 일상, 회상 힌트) ---
+SHORT_TURNS = ["응", "안녕", "좋아", "싫어", "왜?", "그래"]
+DAILY_TURNS = [
+    "오늘 유치원에서 공룡 그림을 그렸어",
+    "친구랑 블록으로 큰 성을 만들었어",
+    "엄마가 저녁에 카레를 해줬는데 맛있었어",
+    "놀이터에서 미끄럼틀을 열 번이나 탔어",
+    "동생이 내 장난감을 가져가서 속상했어",
+    "내일은 아빠랑 동물원에 가기로 했어",
+    "선생님이 나한테 칭찬 스티커를 주셨어",
+    "비가 와서 밖에서 못 놀아서 심심했어",
+]
+RECALL_TURNS = [
+    "지난번에 말했던 공룡 기억나?",
+    "그때 같이 얘기한 동물원 생각나?",
+    "전에 내가 좋아한다고 했던 음식 뭐였지?",
+]
+
+REGIONS = ["서울", "부산", "대구", "인천", "광주", "대전", "경기"]
+STATUSES = ["구직", "재직", "학생", "육아", "임신"]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def setup_env(workdir: str) -> None:
+    """필수 설정은 더미로, DB/체크포인트는 임시 SQLite로. 원격 주소는 대역이 대신하므로 쓰이지 않는다."""
+    for k, v in {
+        "OPENAI_API_KEY": "sk-bench",
+        "QDRANT_URL": "http://127.0.0.1:1",
+        "QDRANT_API_KEY": "bench",
+        "MYSQL_HOST": "127.0.0.1",
+        "MYSQL_PORT": "3306",
+        "MYSQL_USER": "bench",
+        "MYSQL_PASSWORD": "bench",
+        "MYSQL_DB": "bench",
+    }.items():
+        os.environ.setdefault(k, v)
+    db_path = os.path.join(workdir, "bench.sqlite")
+    os.environ["DATABASE_URL_OVERRIDE"] = f"sqlite:///{db_path}"
+    os.environ["ASYNC_DATABASE_URL_OVERRIDE"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["CHECKPOINT_BACKEND"] = "sqlite"
+    os.environ["CHECKPOINT_SQLITE_PATH"] = os.path.join(workdir, "checkpoints.sqlite")
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+    os.environ["HISTORY_BACKEND"] = "memory"
+    os.environ["POLICY_INDEX_ENABLED"] = "false"
+    os.environ["POLICY_WARM_PROFILES_PATH"] = ""
+    os.environ["EMOTION_WARMUP"] = "false"
+    os.environ["TRACE_SAMPLE_RATE"] = "0"
+    os.environ["LANGSMITH_TRACING"] = "false"
+    # OpenAI LLM/임베딩, Qdrant, 감정 모델은 bench.fakes 대역(앱의 클라이언트 생성 지점 한 곳에서 교체)
+    os.environ["CLIENT_FACTORY"] = "bench.fakes:clients"
+
+def configure_fakes(args) -> None:
+    """대역 지연 설정. 앱 임포트 전에 호출(클라이언트는 임포트/최초 사용 시 settings.client_factory로 만들어진다)."""
+    from bench import fakes
+    fakes.clients.configure(
+        first_token_s=args.llm_first_token_ms / 1000.0,
+        token_s=args.llm_token_ms / 1000.0,
+        answer_tokens=args.answer_tokens,
+        embed_latency_s=args.embed_ms / 1000.0,
+        emotion_latency_s=args.emotion_ms / 1000.0,
+    )
+
+def seed_policies(locked, n: int, rng: random.Random) -> None:
+    from qdrant_client.http import models as qmodels
+    from app.api.recommend import COLLECTION_NAME
+    from app.core.client import VECTOR_SIZE, embedding
+
+    locked.create_collection(
+        collection_name=COLLECTION_NAME,
+        vectors_config=qmodels.VectorParams(size=VECTOR_SIZE, distance=qmodels.Distance.COSINE),
+    )
+    points = []
+    for i in range(1, n + 1):
+        region = rng.choice(REGIONS)
+        status = rng.choice(STATUSES)
+        title = f"{region} {status} 지원 정책 {i}"
+        points.append(qmodels.PointStruct(
+            id=i,
+            vector=embedding.inner.embed_query(f"지역={region} 상태={status} {title}"),
+            payload={
+                "policy_id": i,
+                "title": title,
+                "region": region,
+                "childbirth_status": rng.choice([0, 0, 1, 2]),
+                "marriage_status": rng.choice([0, 0, 1, 2]),
+            },
+        ))
+    locked.upsert(collection_name=COLLECTION_NAME, points=points)
+
+def seed_members(n: int) -> None:
+    from app.core.db import SessionLocal, engine
+    from app.models.base import Base
+    from app.models.user import User
+    import app.models.chat_log  # noqa: F401  (메타데이터 등록)
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        for i in range(1, n + 1):
+            db.merge(User(member_id=i, provider=1, provider_user_id=f"bench-{i}", nickname=f"bench{i}", gender=i % 2))
+        db.commit()
+
+# --- 부하 ---
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.ttft: List[float] = []
+        self.samples: Dict[str, List[str]] = {}
+
+    def ok(self, endpoint: str, seconds: float) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self.errors.setdefault(endpoint, 0)
+
+    def fail(self, endpoint: str, detail: str) -> None:
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        self.latencies.setdefault(endpoint, [])
+        errs = self.samples.setdefault(endpoint, [])
+        if len(errs) < 3:
+            errs.append(detail[:200])
+
+async def _chat(http, rec: Recorder, body: Dict[str, Any]) -> None:
+    t0 = time.perf_counter()
+    try:
+        r = await http.post("/chat/", json=body)
+        if r.status_code != 200 or not r.json().get("output"):
+            rec.fail("chat", f"{r.status_code} {r.text}")
+            return
+    except Exception as e:
+        rec.fail("chat", repr(e))
+        return
+    rec.ok("chat", time.perf_counter() - t0)
+
+async def _chat_stream(http, rec: Recorder, body: Dict[str, Any]) -> None:
+    t0 = time.perf_counter()
+    first: Optional[float] = None
+    event = ""
+    final = False
+    try:
+        async with http.stream("POST", "/chat/stream", json=body) as r:
+            if r.status_code != 200:
+                rec.fail("chat_stream", f"{r.status_code} {await r.aread()!r}")
+                return
+            async for line in r.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                    if event == "token" and first is None:
+                        first = time.perf_counter() - t0
+                    elif event == "final":
+                        final = True
+                elif line.startswith("data:") and event == "error":
+                    rec.fail("chat_stream", line[5:].strip())
+                    return
+    except Exception as e:
+        rec.fail("chat_stream", repr(e))
+        return
+    if not final:
+        rec.fail("chat_stream", "no final event")
+        return
+    rec.ok("chat_stream", time.perf_counter() - t0)
+    if first is not None:
+        rec.ttft.append(first)
+
+def make_conversations(args, rng: random.Random) -> List[Tuple[int, str, List[Tuple[str, bool]]]]:
+    """(member_id, session_id, [(발화, 스트리밍 여부)])"""
+    convs = []
+    for c in range(args.conversations):
+        turns = []
+        for t in range(args.turns):
+            roll = rng.random()
+            if t == 0 or roll < 0.5:
+                text = rng.choice(DAILY_TURNS)
+            elif roll < 0.75:
+                text = rng.choice(SHORT_TURNS)
+            else:
+                text = rng.choice(RECALL_TURNS)
+            turns.append((text, rng.random() < args.stream_ratio))
+        convs.append((c % args.members + 1, f"bench-{args.seed}-{c}", turns))
+    return convs
+
+def make_profiles(args, rng: random.Random) -> List[Dict[str, Any]]:
+    """추천 요청. 프로필 종류를 제한해 결과 캐시 적중/미스가 섞이게 한다."""
+    pool = []
+    for _ in range(max(1, args.recommend_requests // 3)):
+        pool.append({
+            "region": rng.choice(REGIONS),
+            "current_status": rng.sample(STATUSES, k=rng.randint(1, 2)),
+            "childbirth_status": rng.choice([0, 1, 2]),
+            "marriage_status": rng.choice([0, 1, 2]),
+            "income": rng.choice([None, 50, 75, 100, 150]),
+        })
+    return [rng.choice(pool) for _ in range(args.recommend_requests)]
+
+async def drive(http, args, rec: Recorder, rng: random.Random) -> float:
+    convs = make_conversations(args, rng)
+    profiles = make_profiles(args, rng)
+    chat_sem = asyncio.Semaphore(max(1, args.concurrency))
+    rec_sem = asyncio.Semaphore(max(1, args.recommend_concurrency))
+
+    async def conversation(member_id: int, session_id: str, turns):
+        async with chat_sem:
+            for text, stream in turns:
+                body = {"member_id": member_id, "input": text, "session_id": session_id}
+                await (_chat_stream if stream else _chat)(http, rec, body)
+                if args.think_ms:
+                    await asyncio.sleep(args.think_ms / 1000.0)
+
+    async def recommend(profile):
+        async with rec_sem:
+            t0 = time.perf_counter()
+            try:
+                r = await http.post("/policy/recommend", json=profile)
+                if r.status_code != 200:
+                    rec.fail("recommend", f"{r.status_code} {r.text}")
+                    return
+            except Exception as e:
+                rec.fail("recommend", repr(e))
+                return
+            rec.ok("recommend", time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(
+        *(conversation(*c) for c in convs),
+        *(recommend(p) for p in profiles),
+    )
+    return time.perf_counter() - t0
+
+# --- 집계 ---
+def percentile(values: List[float], q: float) -> float:
+    """최근접 순위 백분위(q: 0~100)."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, int(round(q / 100.0 * len(s) + 0.5)) - 1))
+    return s[k]
+
+def endpoint_report(rec: Recorder, wall: float) -> Dict[str, Dict[str, float]]:
+    out = {}
+    for ep in sorted(rec.latencies):
+        lat = rec.latencies[ep]
+        n_err = rec.errors.get(ep, 0)
+        n = len(lat) + n_err
+        out[ep] = {
+            "requests": n,
+            "errors": n_err,
+            "error_rate": round(n_err / n, 4) if n else 0.0,
+            "rps": round(len(lat) / wall, 2) if wall > 0 else 0.0,
+            "p50_ms": round(percentile(lat, 50) * 1000, 1),
+            "p95_ms": round(percentile(lat, 95) * 1000, 1),
+            "p99_ms": round(percentile(lat, 99) * 1000, 1),
+        }
+    if rec.ttft:
+        out["chat_stream"]["ttft_p50_ms"] = round(percentile(rec.ttft, 50) * 1000, 1)
+        out["chat_stream"]["ttft_p95_ms"] = round(percentile(rec.ttft, 95) * 1000, 1)
+    return out
+
+def snapshot_metrics(text: str) -> Dict[str, Dict[str, Any]]:
+    """/metrics 텍스트 → {stage 키: {count, sum, buckets{le: 누적}}} (jamjam_ 히스토그램/카운터만)."""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    snap: Dict[str, Dict[str, Any]] = {}
+    for fam in text_string_to_metric_families(text):
+        if not fam.name.startswith("jamjam_") or fam.type not in ("histogram", "counter"):
+            continue
+        for s in fam.samples:
+            labels = {k: v for k, v in s.labels.items() if k != "le"}
+            key = fam.name[len("jamjam_"):] + "".join(f"[{v}]" for _, v in sorted(labels.items()))
+            entry = snap.setdefault(key, {"type": fam.type, "count": 0.0, "sum": 0.0, "buckets": {}})
+            if s.name.endswith("_bucket"):
+                entry["buckets"][float(s.labels["le"])] = s.value
+            elif s.name.endswith("_count"):
+                entry["count"] = s.value
+            elif s.name.endswith("_sum"):
+                entry["sum"] = s.value
+            elif fam.type == "counter" and s.name.endswith("_total"):
+                entry["count"] = s.value
+    return snap
+
+def _bucket_quantile(buckets: Dict[float, float], count: float, q: float) -> float:
+    """누적 버킷에서 선형 보간한 분위수(Prometheus histogram_quantile과 같은 방식)."""
+    if count <= 0:
+        return 0.0
+    rank = q * count
+    prev_le, prev_cum = 0.0, 0.0
+    for le in sorted(buckets):
+        cum = buckets[le]
+        if cum >= rank:
+            if le == float("inf"):
+                return prev_le
+            span = cum - prev_cum
+            return prev_le + (le - prev_le) * ((rank - prev_cum) / span if span else 0.0)
+        prev_le, prev_cum = le, cum
+    return prev_le
+
+def stage_report(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]):
+    """측정 구간 동안의 차이. 반환: (히스토그램 단계별 분해, 카운터 증가분)."""
+    stages: Dict[str, Dict[str, float]] = {}
+    counters: Dict[str, float] = {}
+    for key, a in after.items():
+        b = before.get(key, {"count": 0.0, "sum": 0.0, "buckets": {}})
+        n = a["count"] - b["count"]
+        if n <= 0:
+            continue
+        if a["type"] == "counter":
+            counters[key] = n
+            continue
+        if key.startswith("emotion_batch_size"):
+            stages[key] = {"count": n, "mean": round((a["sum"] - b["sum"]) / n, 2)}
+            continue
+        buckets = {le: v - b["buckets"].get(le, 0.0) for le, v in a["buckets"].items()}
+        total = a["sum"] - b["sum"]
+        stages[key] = {
+            "count": n,
+            "total_s": round(total, 3),
+            "mean_ms": round(total / n * 1000, 2),
+            "p95_ms": round(_bucket_quantile(buckets, n, 0.95) * 1000, 2),
+        }
+    return dict(sorted(stages.items())), dict(sorted(counters.items()))
+
+# --- 임계값 ---
+def check_thresholds(report: Dict[str, Any], thresholds: Dict[str, Any]) -> List[str]:
+    violations = []
+    for ep, limits in thresholds.get("endpoints", {}).items():
+        got = report["endpoints"].get(ep)
+        if got is None:
+            violations.append(f"{ep}: no requests measured")
+            continue
+        for name, limit in limits.items():
+            if name.startswith("min_"):
+                value = got.get(name[4:], 0.0)
+                if value < limit:
+                    violations.append(f"{ep}.{name[4:]} = {value} < {limit}")
+            elif name.startswith("max_"):
+                value = got.get(name[4:], 0.0)
+                if value > limit:
+                    violations.append(f"{ep}.{name[4:]} = {value} > {limit}")
+            elif got.get(name, 0.0) > limit:
+                violations.append(f"{ep}.{name} = {got.get(name)} > {limit}")
+    for stage, limits in thresholds.get("stages", {}).items():
+        got = report["stages"].get(stage)
+        if got is None:
+            continue   # 이번 실행에서 해당 단계가 호출되지 않음(스크립트/캐시에 따라 달라질 수 있음)
+        for name, limit in limits.items():
+            if got.get(name, 0.0) > limit:
+                violations.append(f"stage {stage}.{name} = {got.get(name)} > {limit}")
+    return violations
+
+def print_report(report: Dict[str, Any]) -> None:
+    p = report["profile"]
+    print(f"\n=== bench: {p['conversations']} conversations x {p['turns']} turns (concurrency {p['concurrency']}), "
+          f"{p['recommend_requests']} recommend (concurrency {p['recommend_concurrency']}), wall {report['wall_s']:.2f}s")
+    print(f"{'endpoint':<14}{'n':>6}{'err%':>7}{'rps':>8}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}")
+    for ep, r in report["endpoints"].items():
+        print(f"{ep:<14}{r['requests']:>6}{r['error_rate'] * 100:>7.1f}{r['rps']:>8.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+    if "ttft_p50_ms" in report["endpoints"].get("chat_stream", {}):
+        s = report["endpoints"]["chat_stream"]
+        print(f"{'  ttft':<14}{'':>6}{'':>7}{'':>8}{s['ttft_p50_ms']:>9.1f}{s['ttft_p95_ms']:>9.1f}")
+    print(f"\n{'stage':<52}{'n':>7}{'mean ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for key, s in report["stages"].items():
+        if "mean_ms" in s:
+            print(f"{key:<52}{int(s['count']):>7}{s['mean_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['total_s']:>10.3f}")
+        else:
+            print(f"{key:<52}{int(s['count']):>7}{s['mean']:>10.2f}")
+    if report["counters"]:
+        print(f"\n{'counter':<52}{'delta':>7}")
+        for key, n in report["counters"].items():
+            print(f"{key:<52}{int(n):>7}")
+    for ep, errs in report["error_samples"].items():
+        for e in errs:
+            print(f"[error] {ep}: {e}")
+
+# --- 실행 ---
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    import uvicorn
+
+    rng = random.Random(args.seed)
+    from bench import fakes
+    seed_policies(fakes.clients.qdrant_client(), args.policies, rng)
+    seed_members(args.members)
+
+    from app.main import app
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           access_log=False, lifespan="on"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve.done():
+            serve.result()   # 기동 실패 예외를 그대로 올린다
+            raise RuntimeError("server exited during startup")
+        await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=args.concurrency + args.recommend_concurrency + 4)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60.0, limits=limits) as http:
+            # 워밍업(그래프/캐시/커넥션 첫 사용 비용 제외). 집계에는 넣지 않는다.
+            warm = Recorder()
+            for i in range(args.warmup):
+                body = {"member_id": 1, "input": DAILY_TURNS[i % len(DAILY_TURNS)], "session_id": f"bench-warmup-{i}"}
+                await _chat(http, warm, body)
+                await _chat_stream(http, warm, body)
+                await http.post("/policy/recommend", json={"region": REGIONS[0], "current_status": [STATUSES[0]]})
+            if any(warm.errors.values()):
+                raise RuntimeError(f"warmup failed: {warm.samples}")
+
+            before = snapshot_metrics((await http.get("/metrics")).text)
+            rec = Recorder()
+            wall = await drive(http, args, rec, rng)
+            after = snapshot_metrics((await http.get("/metrics")).text)
+    finally:
+        server.should_exit = True
+        await serve
+
+    stages, counters = stage_report(before, after)
+    return {
+        "profile": {k: getattr(args, k) for k in PROFILE_KEYS},
+        "wall_s": round(wall, 3),
+        "endpoints": endpoint_report(rec, wall),
+        "stages": stages,
+        "counters": counters,
+        "error_samples": rec.samples,
+    }
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m bench.run", description="JAMJAM 부하/벤치마크(로컬 대역)")
+    ap.add_argument("--conversations", type=int, default=24, help="동시 진행할 합성 대화 수")
+    ap.add_argument("--turns", type=int, default=5, help="대화당 턴 수")
+    ap.add_argument("--concurrency", type=int, default=8, help="동시에 진행 중인 대화 수 상한")
+    ap.add_argument("--stream-ratio", type=float, default=0.25, help="/chat/stream으로 보낼 턴 비율")
+    ap.add_argument("--members", type=int, default=12, help="시드할 회원 수(대화는 회원을 순환 배정)")
+    ap.add_argument("--recommend-requests", type=int, default=60)
+    ap.add_argument("--recommend-concurrency", type=int, default=4)
+    ap.add_argument("--policies", type=int, default=300, help="시드할 정책 포인트 수")
+    ap.add_argument("--llm-first-token-ms", type=float, default=150.0)
+    ap.add_argument("--llm-token-ms", type=float, default=5.0)
+    ap.add_argument("--answer-tokens", type=int, default=24)
+    ap.add_argument("--embed-ms", type=float, default=20.0, help="임베딩 호출 1회 지연(캐시 미스만)")
+    ap.add_argument("--emotion-ms", type=float, default=8.0, help="감정 배치 추론 1회 지연")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="턴 사이 대기(사용자 입력 시간)")
+    ap.add_argument("--warmup", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    ap.add_argument("--check", action="store_true", help="임계값 위반 시 exit 1(프로필 불일치 시 exit 2)")
+    ap.add_argument("--output", help="리포트 JSON 저장 경로")
+    ap.add_argument("--verbose", action="store_true", help="앱 INFO 로그 출력")
+    return ap.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="jamjam-bench-") as workdir:
+        setup_env(workdir)
+        configure_fakes(args)
+        import app.main  # noqa: F401  (로깅 설정 적용 후 소음 억제)
+        if not args.verbose:
+            logging.disable(logging.INFO)
+        report = asyncio.run(run(args))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.check:
+        return 0
+    with open(args.thresholds, encoding="utf-8") as f:
+        thresholds = json.load(f)
+    expected = thresholds.get("profile", {})
+    mismatch = {k: (report["profile"].get(k), v) for k, v in expected.items() if report["profile"].get(k) != v}
+    if mismatch:
+        print(f"\n[check] profile differs from thresholds ({args.thresholds}): {mismatch}")
+        return 2
+    violations = check_thresholds(report, thresholds)
+    for v in violations:
+        print(f"[check] FAIL {v}")
+    print(f"\n[check] {'FAIL' if violations else 'OK'} ({len(violations)} violations)")
+    return 1 if violations else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+# tests/conftest.py
+# 앱 모듈은 임포트 시점에 settings/엔진을 만든다 → 임포트 전에 테스트용 환경변수(임시 SQLite) 세팅.
+import os
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="jamjam-test-")
+for _k, _v in {
+    "OPENAI_API_KEY": "sk-test",
+    "QDRANT_URL": "http://127.0.0.1:1",
+    "QDRANT_API_KEY": "test",
+    "MYSQL_HOST": "127.0.0.1",
+    "MYSQL_PORT": "3306",
+    "MYSQL_USER": "test",
+    "MYSQL_PASSWORD": "test",
+    "MYSQL_DB": "test",
+}.items():
+    os.environ.setdefault(_k, _v)
+os.environ["DATABASE_URL_OVERRIDE"] = f"sqlite:///{_TMP}/test.sqlite"
+os.environ["ASYNC_DATABASE_URL_OVERRIDE"] = f"sqlite+aiosqlite:///{_TMP}/test.sqlite"
+os.environ["CHECKPOINT_SQLITE_PATH"] = f"{_TMP}/checkpoints.sqlite"
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+@pytest.fixture
+def db():
+    """빈 스키마 + 회원 1명(member_id=1)이 있는 동기 세션. 테스트 끝나면 테이블 삭제."""
+    from app.core.db import SessionLocal, engine
+    from app.models.base import Base
+    from app.models.user import User
+    import app.models.chat_log  # noqa: F401
+    import app.models.conversation_summary  # noqa: F401
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    session.add(User(member_id=1, provider=1, provider_user_id="test-1"))
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
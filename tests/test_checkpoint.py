@@ -0,0 +1,41 @@
+# tests/test_checkpoint.py
+import asyncio
+from datetime import timedelta
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.graph.checkpoint import TrackedSqliteSaver, cleanup_expired_threads
+
+def _config(tid: str):
+    return {"configurable": {"thread_id": tid, "checkpoint_ns": ""}}
+
+def test_cleanup_deletes_only_threads_past_ttl(tmp_path):
+    async def run():
+        async with TrackedSqliteSaver.from_conn_string(str(tmp_path / "cp.sqlite")) as saver:
+            await saver.setup()
+            for tid in ("old", "new"):
+                await saver.aput(_config(tid), empty_checkpoint(), {}, {})
+            await saver.conn.execute("UPDATE checkpoint_threads SET updated_at = updated_at - 7200 WHERE thread_id = 'old'")
+            await saver.conn.commit()
+
+            deleted = await cleanup_expired_threads(saver, timedelta(hours=1))
+            left = {tup.config["configurable"]["thread_id"] async for tup in saver.alist(None)}
+            tracked = await saver.expired_threads(float("inf"), 10)
+            return deleted, left, tracked
+
+    deleted, left, tracked = asyncio.run(run())
+    assert deleted == 1
+    assert left == {"new"} and tracked == ["new"]
+
+def test_existing_threads_are_tracked_on_setup(tmp_path):
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    path = str(tmp_path / "cp.sqlite")
+
+    async def run():
+        async with AsyncSqliteSaver.from_conn_string(path) as plain:   # 추적 테이블 도입 전 파일
+            await plain.aput(_config("legacy"), empty_checkpoint(), {}, {})
+        async with TrackedSqliteSaver.from_conn_string(path) as saver:
+            await saver.setup()
+            return await saver.expired_threads(float("inf"), 10)
+
+    assert asyncio.run(run()) == ["legacy"]
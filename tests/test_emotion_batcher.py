@@ -0,0 +1,77 @@
+# tests/test_emotion_batcher.py
+import asyncio
+import threading
+
+import pytest
+
+from app.services import emotion_service
+from app.services.emotion_service import EmotionBatcher
+
+def _result(text: str):
+    return {"label": f"L:{text}", "confidence": 1.0, "logits": []}
+
+@pytest.fixture
+def gated(monkeypatch):
+    """첫 배치('gate')에서 워커를 멈춰 두고, 그동안 쌓인 요청이 다음 배치로 묶이는지 본다."""
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def predict_batch(texts):
+        calls.append(list(texts))
+        if texts == ["gate"]:
+            started.set()
+            release.wait(5)
+        return [_result(t) for t in texts]
+
+    monkeypatch.setattr(emotion_service, "_predict_batch", predict_batch)
+    b = EmotionBatcher(max_batch_size=8, max_wait_ms=20)
+    gate = b.submit("gate")
+    assert started.wait(5)
+    yield b, release, calls
+    release.set()
+    gate.result(5)
+
+def test_queued_requests_form_one_batch_with_duplicates_computed_once(gated):
+    b, release, calls = gated
+    futs = [b.submit(t) for t in ("a", "b", "a")]
+    release.set()
+    assert [f.result(5)["label"] for f in futs] == ["L:a", "L:b", "L:a"]
+    assert calls == [["gate"], ["a", "b"]]
+
+def test_batch_size_cap_splits_batches(gated):
+    b, release, calls = gated
+    b.max_batch_size = 2
+    futs = [b.submit(t) for t in ("a", "b", "c")]
+    release.set()
+    assert [f.result(5)["label"] for f in futs] == ["L:a", "L:b", "L:c"]
+    assert calls[1:] == [["a", "b"], ["c"]]
+
+def test_cancelled_requests_are_not_computed(gated):
+    b, release, calls = gated
+
+    async def run():
+        task = asyncio.create_task(b.apredict("cancelled"))
+        await asyncio.sleep(0.01)
+        task.cancel()                       # 대기 측 취소 → 큐의 Future도 취소
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        kept = b.submit("kept")
+        release.set()
+        return await asyncio.wrap_future(kept)
+
+    assert asyncio.run(run())["label"] == "L:kept"
+    assert calls == [["gate"], ["kept"]]
+
+def test_predict_error_reaches_every_request_in_batch(monkeypatch):
+    def boom(texts):
+        raise RuntimeError("model gone")
+
+    monkeypatch.setattr(emotion_service, "_predict_batch", boom)
+    b = EmotionBatcher(max_batch_size=8, max_wait_ms=20)
+    futs = [b.submit(t) for t in ("a", "b")]
+    for f in futs:
+        with pytest.raises(RuntimeError):
+            f.result(5)
+    monkeypatch.setattr(emotion_service, "_predict_batch", lambda texts: [_result(t) for t in texts])
+    assert b.predict("c")["label"] == "L:c"   # 워커는 계속 동작
@@ -0,0 +1,17 @@
+# tests/test_emotion_export.py
+from app.services import emotion_export
+
+def _parity(rates):
+    def check(model_path, quantized=False, texts=None):
+        agree = rates[quantized]
+        return agree, 12, [("문장", "기쁨", "평온")] * (12 - agree)
+    return check
+
+def test_int8_parity_allows_one_mismatch_but_fp32_does_not(monkeypatch):
+    monkeypatch.setattr(emotion_export, "export_onnx", lambda path, quantize=False: [])
+
+    monkeypatch.setattr(emotion_export, "check_parity", _parity({False: 12, True: 11}))
+    assert emotion_export.main(["--quantize"]) == 0
+
+    monkeypatch.setattr(emotion_export, "check_parity", _parity({False: 11, True: 12}))
+    assert emotion_export.main(["--quantize"]) == 1
@@ -0,0 +1,60 @@
+# tests/test_graph_nodes.py
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.graph import nodes
+
+def _call(id_: str, name: str = "summarize_tool"):
+    return {"name": name, "args": {"member_id": 1}, "id": id_}
+
+def test_history_all_drops_tool_calls_without_results():
+    messages = [
+        HumanMessage(content="안녕"),
+        AIMessage(content="Final: 안녕!", tool_calls=[_call("a")]),   # 결과 없이 체크포인트된 호출
+        ToolMessage(content="orphan", tool_call_id="x"),
+        HumanMessage(content="오늘 뭐 했어?"),
+        AIMessage(content="", tool_calls=[_call("b")]),
+        ToolMessage(content="요약", tool_call_id="b"),
+        AIMessage(content="Final: 놀았어"),
+    ]
+    history = nodes._history_all(messages)
+
+    assert all(not (isinstance(m, AIMessage) and any(tc["id"] == "a" for tc in m.tool_calls)) for m in history)
+    assert [m.tool_call_id for m in history if isinstance(m, ToolMessage)] == ["x", "b"]
+    assert len(history) == 6
+
+def test_call_agent_drops_tool_calls_after_tool_pass(monkeypatch):
+    class Model:
+        async def ainvoke(self, msgs):
+            return AIMessage(content="Final: 응", tool_calls=[_call("late")],
+                             additional_kwargs={"tool_calls": [{"id": "late"}]})
+
+    monkeypatch.setattr(nodes, "LLM_WITH_TOOLS", Model())
+    state = {
+        "messages": [   # 도구 1회 실행 직후(tools_to_prompt → agent)
+            HumanMessage(content="응"),
+            AIMessage(content="", tool_calls=[_call("first")]),
+            ToolMessage(content="요약", tool_call_id="first"),
+        ],
+        "member_id": 1,
+        "base_system_text": "ROLE",
+        "tool_pass_done": True,
+        "executed_tools": ["summarize_tool"],
+    }
+    out = asyncio.run(nodes.call_agent(state))
+    last = out["messages"][-1]
+
+    assert last.content == "Final: 응"
+    assert last.tool_calls == [] and "tool_calls" not in last.additional_kwargs
+    assert nodes.should_call_tools({**state, "messages": out["messages"]}) == "finalize"
+
+def test_preload_memo_carries_the_text_not_a_pointer():
+    memo = nodes._preload_tool_memo(
+        1, "지난번 공룡 기억나?", {"summary": "s", "recall": ("r", None), "emotion": {}},
+        summary="공룡을 좋아함", recall_ctx="[USER] 공룡 그림 그렸어", emotion="기쁨",
+    )
+    joined = "\n".join(v["content"] for v in memo.values())
+
+    assert "공룡을 좋아함" in joined and "[USER] 공룡 그림 그렸어" in joined
+    assert "선주입 컨텍스트" not in joined
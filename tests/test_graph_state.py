@@ -0,0 +1,50 @@
+# tests/test_graph_state.py
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.graph.state import HISTORY_SUMMARY_ID, add_messages_trimmed, trim_turns
+
+def _turn(i: int, with_tool: bool = False):
+    msgs = [HumanMessage(content=f"질문{i}", id=f"h{i}")]
+    if with_tool:
+        msgs += [
+            AIMessage(content="", tool_calls=[{"name": "summarize_tool", "args": {}, "id": f"c{i}"}], id=f"t{i}"),
+            ToolMessage(content="요약", tool_call_id=f"c{i}", id=f"r{i}"),
+        ]
+    msgs.append(AIMessage(content=f"Final: 답{i}", id=f"a{i}"))
+    return msgs
+
+def test_within_limit_is_unchanged():
+    msgs = _turn(1) + _turn(2)
+    assert trim_turns(msgs, max_turns=2, max_chars=1000) is msgs
+
+def test_old_turns_fold_into_summary_without_splitting_tool_pairs():
+    msgs = _turn(1) + _turn(2, with_tool=True) + _turn(3)
+    out = trim_turns(msgs, max_turns=2, max_chars=1000)
+
+    assert out[0].id == HISTORY_SUMMARY_ID
+    assert out[0].content.split("\n")[1:] == ["- 사용자: 질문1 / 봇: 답1"]   # 'Final:' 제거
+    assert [m.id for m in out[1:]] == ["h2", "t2", "r2", "a2", "h3", "a3"]
+
+def test_existing_summary_is_extended_and_capped_oldest_first():
+    out = trim_turns(_turn(1) + _turn(2) + _turn(3), max_turns=2, max_chars=1000)
+    out = trim_turns(out + _turn(4), max_turns=2, max_chars=1000)
+    assert out[0].content.split("\n")[1:] == ["- 사용자: 질문1 / 봇: 답1", "- 사용자: 질문2 / 봇: 답2"]
+    assert [m.id for m in out[1:]] == ["h3", "a3", "h4", "a4"]
+
+    capped = trim_turns(out + _turn(5), max_turns=2, max_chars=len("- 사용자: 질문3 / 봇: 답3") + 1)
+    assert capped[0].content.split("\n")[1:] == ["- 사용자: 질문3 / 봇: 답3"]
+
+def test_zero_max_turns_keeps_everything():
+    msgs = _turn(1) + _turn(2) + _turn(3)
+    assert trim_turns(msgs, max_turns=0, max_chars=10) is msgs
+
+def test_reducer_merges_then_trims(monkeypatch):
+    from app.graph import state
+    monkeypatch.setattr(state.settings, "checkpoint_max_turns", 1)
+    left = _turn(1)
+    out = add_messages_trimmed(left, _turn(2))
+    assert out[0].id == HISTORY_SUMMARY_ID and [m.id for m in out[1:]] == ["h2", "a2"]
+
+    # 같은 id는 교체(add_messages) → 턴 수가 늘지 않아 자르지 않음
+    same = add_messages_trimmed(_turn(2), [AIMessage(content="Final: 고친 답", id="a2")])
+    assert [m.content for m in same] == ["질문2", "Final: 고친 답"]
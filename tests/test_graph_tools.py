@@ -0,0 +1,76 @@
+# tests/test_graph_tools.py
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from app.graph import preload, tools
+
+def test_emotion_tool_waits_for_pending_preload(monkeypatch):
+    calls = []
+
+    async def predict(text):
+        calls.append(text)
+        return "슬픔"
+
+    monkeypatch.setattr(tools, "apredict_emotion", predict)
+
+    async def run():
+        async def preload_emotion():
+            await asyncio.sleep(0.05)
+            return {"label": "기쁨", "confidence": 0.9, "logits": []}
+
+        preload.register("k-emotion", {"emotion": asyncio.create_task(preload_emotion())})
+        state = {"messages": [HumanMessage(content="공룡 봤어")], "user_emotion": None, "preload_key": "k-emotion"}
+        out = await tools.classify_emotion_tool.ainvoke({"text": "공룡 봤어", "state": state})
+        # 작업은 finalize가 API 응답용으로 가져갈 수 있게 그대로 남는다
+        late = await preload.consume("k-emotion", "emotion", "used_late")
+        other = await tools.classify_emotion_tool.ainvoke({"text": "다른 문장", "state": state})
+        return out, late, other
+
+    out, late, other = asyncio.run(run())
+    assert out == "emotion=기쁨"
+    assert late["label"] == "기쁨"
+    assert other == "emotion=슬픔" and calls == ["다른 문장"]   # 이번 턴 발화는 다시 추론하지 않음
+
+def test_stale_preload_tasks_are_swept_without_new_registrations(monkeypatch):
+    monkeypatch.setattr(preload.settings, "preload_pending_ttl_s", 0.0)
+
+    async def run():
+        abandoned = asyncio.create_task(asyncio.sleep(10))   # finalize 전에 끊긴 턴의 추측 회상
+        preload.register("k-abandoned", {"recall": abandoned})
+        await asyncio.sleep(0.01)
+        preload.cancel_rest("k-other")   # 다른 턴 종료만으로도 정리된다
+        await asyncio.sleep(0)
+        return abandoned
+
+    abandoned = asyncio.run(run())
+    assert abandoned.cancelled()
+    assert "k-abandoned" not in preload._pending
+
+def test_rag_tool_stops_waiting_for_hung_preload_recall(monkeypatch):
+    from langchain_core.documents import Document
+
+    monkeypatch.setattr(tools.settings, "preload_recall_wait_s", 0.05)
+
+    async def direct(query, top_k, member_id):
+        return [(Document(page_content="직접 검색", metadata={}), 1.0)]
+
+    async def context(user_input, member_id, db, top_k, hits):
+        return hits[0][0].page_content
+
+    monkeypatch.setattr(tools, "retrieve_memory_hits_async", direct)
+    monkeypatch.setattr(tools, "recall_or_general_context_async", context)
+
+    async def run():
+        hung = asyncio.create_task(asyncio.Event().wait())
+        preload.register("k-hung", {"recall": hung})
+        state = {"member_id": 1, "recall_query": "공룡 얘기", "recall_top_k": 3, "recall_hits": None,
+                 "preload_key": "k-hung", "messages": [HumanMessage(content="공룡 얘기")]}
+        out = await asyncio.wait_for(
+            tools.rag_search_tool.ainvoke({"query": "공룡 얘기", "member_id": 1, "state": state}), 2.0,
+        )
+        return out, hung
+
+    out, hung = asyncio.run(run())
+    assert out.endswith("직접 검색")
+    assert hung.cancelled()
@@ -0,0 +1,82 @@
+# tests/test_memory_recall.py
+from datetime import datetime, timedelta
+
+from app.models.chat_log import ChatLog
+from app.services.memory import _expand_context_windows_by_time_async
+
+def _add_logs(db, start: datetime, n: int, step: timedelta, tag: str):
+    for i in range(n):
+        db.add(ChatLog(member_id=1, user_text=f"{tag}-{i}", bot_text="응", created_at=start + i * step))
+    db.commit()
+
+def test_windows_limit_applies_per_window(db):
+    import asyncio
+    from app.core.db import AsyncSessionLocal, async_engine
+
+    base = datetime(2025, 5, 1, 10, 0)
+    _add_logs(db, base, 40, timedelta(minutes=1), "dense")                     # 10:00~10:39
+    _add_logs(db, base + timedelta(hours=5), 3, timedelta(minutes=1), "sparse")  # 15:00~15:02
+
+    async def run():
+        try:
+            async with AsyncSessionLocal() as adb:
+                return await _expand_context_windows_by_time_async(
+                    adb, 1, [base + timedelta(minutes=20), base + timedelta(hours=5)], minutes=30, limit=10,
+                )
+        finally:
+            await async_engine.dispose()
+
+    blocks = asyncio.run(run())
+
+    assert len(blocks) == 2
+    dense, sparse = blocks
+    assert dense.count("[USER]") == 10
+    assert sparse.count("[USER]") == 3 and "sparse-0" in sparse
+
+def test_recall_fuses_db_loaded_lexical_hits_with_dense_hits(db, monkeypatch):
+    import asyncio
+    from langchain_core.documents import Document
+    from app.core.db import AsyncSessionLocal, async_engine
+    from app.services import memory
+    from app.services.lexical_index import LexicalIndex
+
+    # DB에는 tz 없는 KST 벽시계 시각으로 저장된다(MySQL DATETIME과 같음)
+    db.add(ChatLog(member_id=1, user_text="공룡 그림 그렸어", bot_text="우와", created_at=datetime(2025, 5, 1, 10, 0)))
+    db.add(ChatLog(member_id=1, user_text="놀이터 갔어", bot_text="좋아", created_at=datetime(2025, 5, 1, 15, 0)))
+    db.commit()
+    later = db.query(ChatLog).filter(ChatLog.user_text == "놀이터 갔어").one()
+
+    async def dense(vec, top_k, member_id):
+        # 벡터 메모리 payload는 tz 있는 ISO 문자열
+        return [(Document(page_content="놀이터 갔어", metadata={
+            "member_id": "1", "role": "user", "chat_id": later.chat_id, "created_at": "2025-05-01T15:00:00+09:00",
+        }), 0.9)]
+
+    monkeypatch.setattr(memory, "search_memory_hits_async", dense)
+    monkeypatch.setattr(memory, "lexical_index", LexicalIndex(max_members=10, max_docs=100))   # 색인은 DB에서 새로 적재
+
+    query = "지난번에 공룡 기억나?"
+
+    async def run():
+        try:
+            hits = await memory.retrieve_memory_hits_async(query, top_k=3, member_id=1, query_vector=[0.0])
+            async with AsyncSessionLocal() as adb:
+                return await memory.recall_or_general_context_async(query, 1, adb, top_k=3, hits=hits)
+        finally:
+            await async_engine.dispose()
+
+    context = asyncio.run(run())
+    assert "공룡 그림 그렸어" in context and "놀이터 갔어" in context
+    assert context.count("\n---\n") == 1   # 두 시간창
+
+def test_recall_index_is_added_to_existing_table(db):
+    from sqlalchemy import inspect, text
+    from app.core.db import engine
+    from app.models.chat_log import ensure_chat_log_indexes
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_chat_log_member_created"))   # 인덱스 도입 전에 만든 테이블
+        ensure_chat_log_indexes(conn)
+        ensure_chat_log_indexes(conn)                                 # 두 번째는 no-op
+    names = {ix["name"] for ix in inspect(engine).get_indexes("chat_log")}
+    assert "ix_chat_log_member_created" in names
@@ -0,0 +1,95 @@
+# tests/test_memory_writer.py
+import threading
+
+from app.services import memory
+from app.services.memory import MemoryWriter
+
+def _enqueue(w: MemoryWriter, chat_id: int):
+    w.enqueue(1, f"text-{chat_id}", "user", chat_id, memory.datetime.now(memory.timezone.utc))
+
+def test_close_keeps_worker_when_join_times_out(monkeypatch, caplog):
+    release = threading.Event()
+    written = []
+
+    def slow_write(records):
+        release.wait(5)
+        written.extend(pid for pid, _, _ in records)
+
+    w = MemoryWriter(batch_size=1, flush_ms=0)
+    monkeypatch.setattr(w, "_write", slow_write)
+    _enqueue(w, 1)
+    _enqueue(w, 2)
+    first = w._worker
+
+    w.close(timeout=0.05)
+    assert first.is_alive() and w._worker is first   # 아직 쓰는 중 → 워커 유지
+    assert "close timed out" in caplog.text
+
+    _enqueue(w, 3)
+    assert w._worker is first                          # 두 번째 워커를 띄우지 않는다
+    release.set()
+    first.join(5)
+    assert not first.is_alive()
+
+def test_failed_batch_is_retried_then_written(monkeypatch):
+    attempts = []
+
+    def flaky_write(records):
+        attempts.append([pid for pid, _, _ in records])
+        if len(attempts) < 3:
+            raise RuntimeError("qdrant busy")
+
+    monkeypatch.setattr(memory.time, "sleep", lambda s: None)   # 백오프 생략
+    w = MemoryWriter(batch_size=8, flush_ms=10_000, max_retries=3)
+    monkeypatch.setattr(w, "_write", flaky_write)
+    _enqueue(w, 1)
+    _enqueue(w, 2)
+    w.close(timeout=5)
+
+    assert len(attempts) == 3 and attempts[0] == attempts[2]   # 같은 배치(같은 point id) 재시도
+    assert len(attempts[0]) == 2
+
+def test_batch_dropped_after_max_retries(monkeypatch, caplog):
+    attempts = []
+
+    def failing_write(records):
+        attempts.append(len(records))
+        raise RuntimeError("qdrant down")
+
+    monkeypatch.setattr(memory.time, "sleep", lambda s: None)
+    w = MemoryWriter(batch_size=8, flush_ms=10_000, max_retries=1)
+    monkeypatch.setattr(w, "_write", failing_write)
+    _enqueue(w, 1)
+    w.close(timeout=5)
+
+    assert attempts == [1, 1]
+    assert "drop 1 records after 2 tries" in caplog.text
+
+def test_close_flushes_queue_and_restarts_on_enqueue(monkeypatch):
+    written = []
+    w = MemoryWriter(batch_size=32, flush_ms=10_000)   # flush 주기 전에 close
+    monkeypatch.setattr(w, "_write", lambda records: written.append(len(records)))
+    for chat_id in (1, 2, 3):
+        _enqueue(w, chat_id)
+    first = w._worker
+    w.close(timeout=5)
+
+    assert written == [3] and not first.is_alive() and w._worker is None
+    _enqueue(w, 4)
+    assert w._worker is not None and w._worker is not first
+    w.close(timeout=5)
+    assert written == [3, 1]
+
+def test_member_filter_matches_legacy_metadata_key():
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    client = QdrantClient(":memory:")
+    client.create_collection("m", vectors_config=qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+    client.upsert("m", points=[
+        qmodels.PointStruct(id=1, vector=[1.0, 0.0], payload={"metadata": {"member_id": "7"}}),          # 벡터스토어로 저장된 예전 점
+        qmodels.PointStruct(id=2, vector=[1.0, 0.1], payload={"member_id": "7", "metadata": {"member_id": "7"}}),
+        qmodels.PointStruct(id=3, vector=[1.0, 0.2], payload={"member_id": "8", "metadata": {"member_id": "8"}}),
+    ])
+    res = client.query_points("m", query=[1.0, 0.0], query_filter=memory._member_filter(7), limit=10)
+    assert sorted(p.id for p in res.points) == [1, 2]
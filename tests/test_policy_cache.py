@@ -0,0 +1,84 @@
+# tests/test_policy_cache.py
+import asyncio
+
+import pytest
+
+from app.services.policy_cache import PolicyResultCache
+
+def _cache(**kw) -> PolicyResultCache:
+    return PolicyResultCache(**{"ttl_s": 60, "max_entries": 10, "version_check_s": 30, **kw})
+
+def test_concurrent_misses_load_once():
+    cache = _cache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return ["p1"]
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+
+    assert asyncio.run(run()) == [["p1"]] * 5
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 4
+
+def test_loader_error_reaches_waiters_and_is_not_cached():
+    cache = _cache()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("qdrant down")
+
+    async def ok():
+        return ["p1"]
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_load("k", failing) for _ in range(3)), return_exceptions=True)
+        return results, await cache.get_or_load("k", ok)
+
+    results, after = asyncio.run(run())
+    assert len(calls) == 1 and all(isinstance(r, RuntimeError) for r in results)
+    assert after == ["p1"]
+
+def test_waiter_recomputes_when_leader_is_cancelled():
+    cache = _cache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == 2   # 대기자가 직접 다시 계산
+    assert len(calls) == 2
+
+def test_version_change_invalidates():
+    version = {"v": 1}
+
+    async def version_fn():
+        return version["v"]
+
+    cache = _cache(version_check_s=0, version_fn=version_fn)
+
+    async def run():
+        first = await cache.get_or_load("k", lambda: asyncio.sleep(0, result="old"))
+        version["v"] = 2
+        second = await cache.get_or_load("k", lambda: asyncio.sleep(0, result="new"))
+        return first, second
+
+    assert asyncio.run(run()) == ("old", "new")
+    assert cache.stats()["invalidations"] == 1
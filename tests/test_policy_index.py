@@ -0,0 +1,64 @@
+# tests/test_policy_index.py
+import asyncio
+
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.services.policy_index import LocalPolicyIndex
+
+def _index(tmp_path) -> LocalPolicyIndex:
+    return LocalPolicyIndex("policies", str(tmp_path / "index"), max_age_s=900, refresh_s=300)
+
+async def _client(vectors_config, points):
+    client = AsyncQdrantClient(location=":memory:")
+    await client.create_collection("policies", vectors_config=vectors_config)
+    if points:
+        await client.upsert("policies", points=points)
+    return client
+
+def test_snapshot_with_skipped_points_is_not_usable(tmp_path):
+    async def run():
+        client = await _client(
+            qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE),
+            [
+                qmodels.PointStruct(id=1, vector=[1.0, 0.0], payload={"policy_id": 1, "title": "a", "region": "서울"}),
+                qmodels.PointStruct(id=2, vector=[0.0, 1.0], payload={"title": "no policy id"}),
+            ],
+        )
+        idx = _index(tmp_path)
+        assert await idx.refresh(client) == 1
+        return idx
+
+    idx = asyncio.run(run())
+    assert not idx.usable
+    assert idx.stats()["skipped"] == 1
+
+def test_complete_snapshot_is_usable(tmp_path):
+    async def run():
+        client = await _client(
+            qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE),
+            [qmodels.PointStruct(id=1, vector=[1.0, 0.0], payload={"policy_id": 7, "title": "a", "region": "서울"})],
+        )
+        idx = _index(tmp_path)
+        await idx.refresh(client)
+        return idx
+
+    idx = asyncio.run(run())
+    assert idx.usable
+    assert idx.search([1.0, 0.0], [("region", "서울")], 3) == [(7, "a")]
+
+@pytest.mark.parametrize("vectors_config", [
+    {"dense": qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE)},
+    qmodels.VectorParams(size=2, distance=qmodels.Distance.DOT),
+])
+def test_refuses_named_or_non_cosine_collections(tmp_path, vectors_config):
+    async def run():
+        client = await _client(vectors_config, [])
+        idx = _index(tmp_path)
+        with pytest.raises(ValueError):
+            await idx.refresh(client)
+        return idx
+
+    idx = asyncio.run(run())
+    assert not idx.usable
@@ -0,0 +1,59 @@
+# tests/test_prompt_budget.py
+import asyncio
+
+from app.graph import nodes, prompt_budget
+from app.graph.prompts import load_prompt_template
+
+def test_role_prompt_is_not_truncated_on_byte_estimate(monkeypatch):
+    async def gender(member_id):
+        return 2
+
+    monkeypatch.setattr(prompt_budget, "get_encoder", lambda: None)   # 오프라인: 인코딩 다운로드 실패
+    monkeypatch.setattr(nodes, "get_member_gender", gender)
+    role = load_prompt_template("role").strip()
+    assert prompt_budget.count_tokens(role) > prompt_budget.settings.prompt_role_tokens   # 근사치로는 예산 초과
+
+    text = asyncio.run(nodes._ensure_role_text(7))
+    assert text.startswith(role)
+    assert "'엄마'" in text and "member_id=7" in text
+
+    role_text, _, _ = prompt_budget.budget_prompt(text, "", "없음", "", [])
+    assert role_text == text
+
+def _turns(n: int):
+    from langchain_core.messages import AIMessage, HumanMessage
+    out = []
+    for i in range(1, n + 1):
+        out += [HumanMessage(content=f"{i}" + "가" * 100, id=f"h{i}"), AIMessage(content="나" * 100, id=f"a{i}")]
+    return out
+
+def _tokens(msgs):
+    return sum(prompt_budget.message_tokens(m) for m in msgs)
+
+def test_fit_history_keeps_newest_turns_and_compacts_oldest(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "get_encoder", lambda: None)   # 바이트 근사치(결정적)
+    history = _turns(5)
+    assert prompt_budget.fit_history(history, 10_000) == history
+
+    out = prompt_budget.fit_history(history, 700)
+    assert out[0].id == prompt_budget.HISTORY_SUMMARY_ID
+    assert out[0].content.split("\n")[-1].startswith("- 사용자: 3")   # 넘치면 오래된 요약 줄부터 버림
+    assert [m.id for m in out[1:]] == ["h4", "a4", "h5", "a5"]
+    assert _tokens(out) <= 700
+
+def test_fit_history_always_keeps_current_turn(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "get_encoder", lambda: None)
+    out = prompt_budget.fit_history(_turns(3), 50)
+    assert [m.id for m in out] == ["h3", "a3"]
+
+def test_budget_prompt_caps_tool_context_and_gives_history_the_rest(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "get_encoder", lambda: None)
+    monkeypatch.setattr(prompt_budget.settings, "prompt_tool_tokens", 5)
+    monkeypatch.setattr(prompt_budget.settings, "prompt_token_budget", 800)
+
+    role, tool, history = prompt_budget.budget_prompt("역할", "지침", "없음", "다" * 50, _turns(5))
+    assert tool == "다" * 5 + " …"
+    assert prompt_budget.budget_prompt("역할", "", "없음", "", [])[1] == "없음"
+
+    used = sum(prompt_budget.count_tokens(t) + 4 for t in (role, "지침", "없음", tool))
+    assert _tokens(history) <= 800 - used and history[-1].id == "a5"
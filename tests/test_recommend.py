@@ -0,0 +1,34 @@
+# tests/test_recommend.py
+from app.api.recommend import RecommendRequest, canonical_request
+
+def _req(**kw) -> RecommendRequest:
+    return RecommendRequest(**{"region": "서울", "current_status": ["임신"], **kw})
+
+def test_income_kept_as_is_by_default():
+    assert canonical_request(_req(income=73)).income == 73
+
+def test_income_bucketed_when_enabled(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "policy_income_bucket", 10)
+    assert canonical_request(_req(income=73)).income == 70
+
+def test_equivalent_requests_share_a_key():
+    from app.api.recommend import request_cache_key
+    a = _req(region=" 서울 ", current_status=["임신", "육아", " 임신 ", ""], childbirth_status=None)
+    b = _req(current_status=["육아", "임신"], childbirth_status=0)
+    assert canonical_request(a).current_status == ["육아", "임신"]
+    assert request_cache_key(canonical_request(a)) == request_cache_key(canonical_request(b))
+
+def test_different_requests_do_not_collide():
+    from app.api.recommend import request_cache_key
+    reqs = [
+        _req(),
+        _req(current_status=["임신,육아"]),          # 구분자를 품은 값 ≠ 두 값
+        _req(current_status=["임신", "육아"]),
+        _req(income=0),                              # 0% ≠ 미입력
+        _req(children_count=0),
+        _req(region="서울시"),
+        _req(marriage_status=1),
+    ]
+    keys = {request_cache_key(canonical_request(r)) for r in reqs}
+    assert len(keys) == len(reqs)
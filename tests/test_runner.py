@@ -0,0 +1,25 @@
+# tests/test_runner.py
+from app.graph.runner import _FinalTextFilter
+
+def _feed(chunks):
+    f = _FinalTextFilter()
+    out = [f.feed(c) for c in chunks]
+    return out, f.flush()
+
+def test_marker_split_across_chunks_is_stripped():
+    out, rest = _feed(["Fi", "nal", ": ", "안녕", "하세요"])
+    assert out == ["", "", "", "안녕", "하세요"] and rest == ""
+
+def test_whitespace_after_marker_dropped_until_first_text():
+    out, _ = _feed(["  Final:", " ", "\n", " 답", " 이야"])
+    assert out == ["", "", "", "답", " 이야"]   # 본문 시작 뒤 공백은 유지
+
+def test_text_without_marker_passes_through_once_decided():
+    out, rest = _feed(["Fi", "ne", " day"])
+    assert out == ["", "Fine", " day"] and rest == ""
+    out, _ = _feed(["안녕", "!"])
+    assert out == ["안녕", "!"]
+
+def test_undecided_prefix_is_flushed_at_run_end():
+    out, rest = _feed(["Fin"])
+    assert out == [""] and rest == "Fin"
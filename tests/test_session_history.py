@@ -0,0 +1,42 @@
+# tests/test_session_history.py
+import sys
+import types
+
+from app.services.session_history import RedisSessionHistoryStore
+
+class _Client:
+    def __init__(self, keys):
+        self.keys = keys
+        self.scans = 0
+        self.memory_usage_calls = 0
+
+    def scan_iter(self, match=None, count=None):
+        self.scans += 1
+        return iter(self.keys)
+
+    def memory_usage(self, key):
+        self.memory_usage_calls += 1
+        return 100
+
+def _store(monkeypatch, client, interval_s):
+    redis = types.ModuleType("redis")
+    redis.Redis = types.SimpleNamespace(from_url=lambda url: client)
+    monkeypatch.setitem(sys.modules, "redis", redis)
+    return RedisSessionHistoryStore("redis://stub", idle_ttl_s=60, max_messages=10, stats_interval_s=interval_s)
+
+def test_redis_stats_scan_once_per_interval(monkeypatch):
+    client = _Client([b"jamjam:history:a", b"jamjam:history:b"])
+    store = _store(monkeypatch, client, interval_s=300)
+
+    for _ in range(5):   # 연속 스크랩
+        stats = store.stats()
+
+    assert stats["sessions"] == 2
+    assert client.scans == 1 and client.memory_usage_calls == 0
+
+def test_redis_stats_disabled(monkeypatch):
+    client = _Client([b"jamjam:history:a"])
+    store = _store(monkeypatch, client, interval_s=0)
+
+    assert store.stats() == {"backend": "redis"}
+    assert client.scans == 0
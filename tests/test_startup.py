@@ -0,0 +1,34 @@
+# tests/test_startup.py
+import asyncio
+
+import pytest
+
+from app import main
+
+def _run_lifespan():
+    async def run():
+        async with main.lifespan(main.app):
+            pass
+    asyncio.run(run())
+
+def test_required_phase_failure_aborts_startup(monkeypatch):
+    async def broken_graph(stack):
+        raise RuntimeError("checkpoint db locked")
+
+    monkeypatch.setattr(main, "_open_graph", broken_graph)
+    with pytest.raises(RuntimeError, match="checkpoint db locked"):
+        _run_lifespan()
+
+def test_optional_phase_failure_is_logged_only(monkeypatch, caplog):
+    async def fine_graph(stack):
+        return None
+
+    def broken_qdrant():
+        raise ConnectionError("qdrant down")
+
+    monkeypatch.setattr(main, "_open_graph", fine_graph)
+    monkeypatch.setattr(main, "ensure_collection_and_indexes", broken_qdrant)
+    monkeypatch.setattr(main.recommend, "ensure_policy_indexes", lambda: None)
+    monkeypatch.setattr(main, "get_encoder", lambda: None)
+    _run_lifespan()
+    assert "qdrant_memory" in caplog.text and "qdrant down" in caplog.text
@@ -0,0 +1,27 @@
+# tests/test_trace_callback.py
+import logging
+import uuid
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.graph import callbacks
+from app.graph.callbacks import ReactTraceCallback
+
+def _start_llm(cb: ReactTraceCallback):
+    run_id = uuid.uuid4()
+    cb.on_chat_model_start({}, [[SystemMessage(content="역할" * 5000), HumanMessage(content="안녕")]],
+                           run_id=run_id, invocation_params={"model": "m"})
+    return cb._open[run_id]
+
+def test_prompt_not_kept_without_jsonl_sink(monkeypatch):
+    monkeypatch.setattr(callbacks.settings, "trace_jsonl_path", None)
+    span = _start_llm(ReactTraceCallback(logging.getLogger("test.trace")))
+    assert "prompt" not in span and "params" not in span
+
+def test_prompt_truncated_for_jsonl_sink(monkeypatch, tmp_path):
+    monkeypatch.setattr(callbacks.settings, "trace_jsonl_path", str(tmp_path / "trace.jsonl"))
+    monkeypatch.setattr(callbacks.settings, "trace_prompt_chars", 100)
+    span = _start_llm(ReactTraceCallback(logging.getLogger("test.trace")))
+    system, human = span["prompt"]
+    assert system["content"].startswith("역할" * 50) and len(system["content"]) < 120
+    assert human["content"] == "안녕"